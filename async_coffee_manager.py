@@ -0,0 +1,479 @@
+"""
+Async Coffee Data Manager - An asyncio version of CoffeeDataManager built on the Motor driver.
+"""
+
+import time
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Iterable, AsyncIterable, AsyncIterator, Union
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure, PyMongoError
+from bson import ObjectId
+
+from coffee_manager import (
+    CoffeeDocumentMixin,
+    BACKFILL_PROJECTION,
+    COFFEE_INDEXES,
+    DEFAULT_CURSOR_BATCH_SIZE,
+    DEFAULT_POOL_OPTIONS,
+    META_COLLECTION,
+    MatchSpec,
+    SortSpec,
+    TEXT_SCORE_SORT,
+)
+from sammy_metrics import timed
+
+
+class AsyncCoffeeDataManager(CoffeeDocumentMixin):
+    """
+    A class to manage coffee data using MongoDB without blocking the event loop.
+
+    Mirrors CoffeeDataManager: every database method is a coroutine and the
+    streaming methods are async iterators. Use it as an async context manager
+    to check the connection on entry and close it on exit.
+    """
+
+    def __init__(self, connection_string: str = "mongodb://localhost:27017/",
+                 database_name: str = "coffee_db", collection_name: str = "coffees",
+                 pool_options: Optional[Dict[str, Any]] = None, client: Optional[AsyncIOMotorClient] = None):
+        """
+        Initialize the AsyncCoffeeDataManager. No I/O happens until the first query.
+
+        Args:
+            connection_string: MongoDB connection string
+            database_name: Name of the database
+            collection_name: Name of the collection
+            pool_options: MongoClient options such as maxPoolSize and timeouts,
+                          overriding DEFAULT_POOL_OPTIONS
+            client: Optional existing Motor (or Motor-compatible) client to use instead
+                    of creating one; it is not closed by close()
+        """
+        self._owns_client = client is None
+        self.client = client or AsyncIOMotorClient(connection_string, **{**DEFAULT_POOL_OPTIONS, **(pool_options or {})})
+        self.db = self.client[database_name]
+        self.collection = self.db[collection_name]
+        self.meta_collection = self.db[META_COLLECTION]
+
+    async def __aenter__(self) -> "AsyncCoffeeDataManager":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.close()
+
+    async def connect(self):
+        """
+        Check that MongoDB is reachable.
+
+        Raises:
+            ConnectionError: If the server cannot be reached
+        """
+        try:
+            await self.client.admin.command('ping')  # Test connection
+            print(f"Connected to MongoDB: {self.db.name}.{self.collection.name}")
+        except ConnectionFailure:
+            raise ConnectionError("Could not connect to MongoDB. Make sure MongoDB is running.")
+
+    @timed("db.ensure_indexes")
+    async def ensure_indexes(self) -> Dict[str, Any]:
+        """
+        Create (if missing) and verify the indexes used by the query methods.
+
+        Returns:
+            Dictionary with the verified index keys, plus any missing indexes
+        """
+        await self.collection.create_indexes(COFFEE_INDEXES)
+        existing = await self.collection.index_information()
+        missing = [index.document["name"] for index in COFFEE_INDEXES if index.document["name"] not in existing]
+
+        if missing:
+            print(f"Warning: missing indexes after build: {', '.join(missing)}")
+
+        return {
+            "indexes": {
+                index.document["name"]: {"keys": existing[index.document["name"]]["key"]}
+                for index in COFFEE_INDEXES if index.document["name"] in existing
+            },
+            "missing": missing
+        }
+
+    @timed("db.data_version")
+    async def data_version(self) -> int:
+        """
+        Get the collection's change version (see CoffeeDataManager.data_version()).
+
+        Returns:
+            int: Monotonic version number (0 if the collection was never written)
+        """
+        meta = await self.meta_collection.find_one({"_id": self.collection.name}, {"version": 1})
+        return meta["version"] if meta else 0
+
+    async def _bump_data_version(self) -> int:
+        """Record that the collection changed, returning the new version."""
+        meta = await self.meta_collection.find_one_and_update(
+            *self._version_bump(), projection={"version": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return meta["version"]
+
+    @timed("db.add_coffee")
+    async def add_coffee(self, coffee_name: str, roasting_level: str, grinding_level: str,
+                         brewing_ratio: str, tasting_notes: str) -> str:
+        """
+        Add a new coffee entry.
+
+        Args:
+            coffee_name: Name of the coffee
+            roasting_level: Roasting level (Light, Medium, Dark, etc.)
+            grinding_level: Grinding level (Coarse, Medium, Fine, etc.)
+            brewing_ratio: Coffee to water ratio (e.g., "1:15")
+            tasting_notes: Tasting notes and description
+
+        Returns:
+            str: The inserted document's ID
+        """
+        coffee_data = self._build_coffee_document(
+            coffee_name, roasting_level, grinding_level, brewing_ratio, tasting_notes
+        )
+
+        result = await self.collection.insert_one(coffee_data)
+        await self._bump_data_version()
+        return str(result.inserted_id)
+
+    @timed("db.bulk_add_coffees")
+    async def bulk_add_coffees(self, coffees: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                               batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Add many coffee entries using batched, unordered inserts.
+
+        Args:
+            coffees: Iterable or async iterable of dictionaries with the same fields as add_coffee()
+            batch_size: Number of documents sent per insert_many call
+
+        Returns:
+            Dictionary with inserted IDs, counts, per-batch errors and throughput stats
+            (see CoffeeDataManager.bulk_add_coffees())
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        report = self._new_bulk_report()
+        start_time = time.perf_counter()
+
+        async for chunk in _chunks(coffees, batch_size):
+            documents = self._prepare_bulk_batch(chunk, report)
+            if not documents:
+                continue
+
+            inserted_before = len(report["inserted_ids"])
+            try:
+                await self.collection.insert_many(documents, ordered=False)
+                self._record_bulk_batch(report, documents)
+            except PyMongoError as e:
+                self._record_bulk_batch(report, documents, e)
+            if len(report["inserted_ids"]) > inserted_before:
+                await self._bump_data_version()
+
+        return self._finish_bulk_report(report, start_time)
+
+    @timed("db.backfill_derived_fields")
+    async def backfill_derived_fields(self, batch_size: int = 1000) -> int:
+        """
+        Recompute derived fields for every existing document, in batches
+        (see CoffeeDataManager.backfill_derived_fields()).
+
+        Args:
+            batch_size: Number of updates sent per bulk_write call
+
+        Returns:
+            int: Number of documents updated
+        """
+        updated = 0
+        operations = []
+
+        async for document in self.collection.find({}, BACKFILL_PROJECTION).batch_size(batch_size):
+            operation = self._backfill_update(document)
+            if operation is not None:
+                operations.append(operation)
+            if len(operations) >= batch_size:
+                updated += (await self.collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            updated += (await self.collection.bulk_write(operations, ordered=False)).modified_count
+
+        if updated:
+            await self._bump_data_version()
+        return updated
+
+    @timed("db.get_all_coffees")
+    async def get_all_coffees(self, projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                              skip: int = 0, sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
+        """
+        Get all coffee entries.
+
+        Args:
+            projection: Optional MongoDB projection
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
+
+        Returns:
+            List of coffee dictionaries
+        """
+        return [coffee async for coffee in self.iter_coffees(projection=projection, limit=limit,
+                                                             skip=skip, sort=sort)]
+
+    def iter_coffees(self, batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+                     projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                     skip: int = 0, sort: Optional[SortSpec] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream all coffee entries from a server-side cursor.
+
+        Args:
+            batch_size: Number of documents fetched per cursor round trip
+            projection: Optional MongoDB projection
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
+
+        Yields:
+            Coffee dictionaries with "_id" converted to str
+        """
+        return self._iter_cursor({}, batch_size=batch_size, projection=projection,
+                                 limit=limit, skip=skip, sort=sort)
+
+    async def _iter_cursor(self, query: Dict[str, Any], batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+                           projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                           skip: int = 0, sort: Optional[SortSpec] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield documents matching query one at a time, converting "_id" to str."""
+        cursor = self.collection.find(query, projection).batch_size(batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        try:
+            async for coffee in cursor:
+                if "_id" in coffee:
+                    coffee["_id"] = str(coffee["_id"])
+                yield coffee
+        finally:
+            await cursor.close()
+
+    @timed("db.get_coffees_by_ids")
+    async def get_coffees_by_ids(self, coffee_ids: Iterable[str],
+                                 projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Get the coffees whose IDs are listed, in a single query.
+
+        Args:
+            coffee_ids: Coffee IDs; strings that are not valid ObjectIds are ignored
+            projection: Optional MongoDB projection
+
+        Returns:
+            List of matching coffee dictionaries
+        """
+        object_ids = [ObjectId(coffee_id) for coffee_id in coffee_ids if ObjectId.is_valid(coffee_id)]
+        if not object_ids:
+            return []
+        return [coffee async for coffee in self._iter_cursor({"_id": {"$in": object_ids}}, projection=projection)]
+
+    @timed("db.get_coffee_by_id")
+    async def get_coffee_by_id(self, coffee_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a coffee by its ID.
+
+        Args:
+            coffee_id: The coffee's ID
+
+        Returns:
+            Coffee dictionary or None if not found
+        """
+        coffee = await self.collection.find_one({"_id": ObjectId(coffee_id)})
+        if coffee:
+            coffee["_id"] = str(coffee["_id"])
+        return coffee
+
+    @timed("db.get_coffee_by_name")
+    async def get_coffee_by_name(self, coffee_name: str,
+                                 projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a coffee by its name.
+
+        Args:
+            coffee_name: Name of the coffee
+            projection: Optional MongoDB projection
+
+        Returns:
+            Coffee dictionary or None if not found
+        """
+        coffee = await self.collection.find_one({"coffee_name": coffee_name}, projection)
+        if coffee:
+            coffee["_id"] = str(coffee["_id"])
+        return coffee
+
+    @timed("db.get_coffee_with_query")
+    async def get_coffee_with_query(self, query_dict: Dict[str, Any],
+                                    case_sensitive: bool = False, match: Optional[MatchSpec] = None,
+                                    ratio_min: Optional[float] = None, ratio_max: Optional[float] = None,
+                                    projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                                    skip: int = 0, sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
+        """
+        Get coffees using a flexible query dictionary with multiple key-value filters.
+
+        Accepts the same arguments as CoffeeDataManager.get_coffee_with_query().
+
+        Returns:
+            List of matching coffee dictionaries
+        """
+        return [coffee async for coffee in self.iter_query(
+            query_dict, case_sensitive=case_sensitive, match=match, ratio_min=ratio_min,
+            ratio_max=ratio_max, projection=projection, limit=limit, skip=skip, sort=sort
+        )]
+
+    def iter_query(self, query_dict: Dict[str, Any], case_sensitive: bool = False,
+                   match: Optional[MatchSpec] = None,
+                   ratio_min: Optional[float] = None, ratio_max: Optional[float] = None,
+                   batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+                   projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                   skip: int = 0, sort: Optional[SortSpec] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream coffees matching a query dictionary from a server-side cursor.
+
+        Accepts the same arguments as CoffeeDataManager.iter_query().
+
+        Yields:
+            Matching coffee dictionaries with "_id" converted to str
+        """
+        return self._iter_cursor(self._build_query(query_dict, case_sensitive, match, ratio_min, ratio_max),
+                                 batch_size=batch_size, projection=projection,
+                                 limit=limit, skip=skip, sort=sort)
+
+    @timed("db.text_search")
+    async def text_search(self, query: str, limit: int = 10,
+                          projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Ranked keyword search over coffee names and tasting notes (see CoffeeDataManager.text_search()).
+
+        Returns:
+            List of coffee dictionaries, most relevant first, each with a "score"
+        """
+        text_query, text_projection = self._text_search_query(query, projection)
+        return [coffee async for coffee in self._iter_cursor(text_query, projection=text_projection,
+                                                             limit=limit, sort=TEXT_SCORE_SORT)]
+
+    @timed("db.search_coffees")
+    async def search_coffees(self, roasting_level: Optional[str] = None,
+                             grinding_level: Optional[str] = None, match: str = "contains",
+                             ratio_min: Optional[float] = None, ratio_max: Optional[float] = None,
+                             projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                             skip: int = 0, sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
+        """
+        Search for coffees by roasting level and/or grinding level.
+
+        Accepts the same arguments as CoffeeDataManager.search_coffees().
+
+        Returns:
+            List of matching coffee dictionaries
+        """
+        query = self._build_query({
+            "roasting_level": roasting_level or None,
+            "grinding_level": grinding_level or None
+        }, case_sensitive=False, match=match, ratio_min=ratio_min, ratio_max=ratio_max)
+
+        return [coffee async for coffee in self._iter_cursor(query, projection=projection, limit=limit,
+                                                             skip=skip, sort=sort)]
+
+    @timed("db.update_coffee")
+    async def update_coffee(self, coffee_id: str, **updates) -> bool:
+        """
+        Update a coffee entry.
+
+        Args:
+            coffee_id: The coffee's ID
+            **updates: Fields to update
+
+        Returns:
+            True if updated successfully, False otherwise
+        """
+        updates.update(self._derived_fields(updates))
+        updates["updated_at"] = datetime.now()
+        result = await self.collection.update_one(
+            {"_id": ObjectId(coffee_id)},
+            {"$set": updates}
+        )
+        if result.modified_count:
+            await self._bump_data_version()
+        return result.modified_count > 0
+
+    @timed("db.delete_coffee")
+    async def delete_coffee(self, coffee_id: str) -> bool:
+        """
+        Delete a coffee entry.
+
+        Args:
+            coffee_id: The coffee's ID
+
+        Returns:
+            True if deleted successfully, False otherwise
+        """
+        result = await self.collection.delete_one({"_id": ObjectId(coffee_id)})
+        if result.deleted_count:
+            await self._bump_data_version()
+        return result.deleted_count > 0
+
+    @timed("db.get_stats")
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Get basic statistics about the coffee collection.
+
+        Returns:
+            Dictionary with collection statistics
+        """
+        return self._get_stats_summary(await self.aggregate_stats(group_by=["roasting_level", "grinding_level"]))
+
+    @timed("db.aggregate_stats")
+    async def aggregate_stats(self, query_dict: Optional[Dict[str, Any]] = None,
+                              group_by: Optional[List[str]] = None, case_sensitive: bool = False,
+                              match: Optional[MatchSpec] = None,
+                              include_total: bool = False) -> Dict[str, Any]:
+        """
+        Compute counts and value distributions on the server in one aggregation.
+
+        Accepts the same arguments as CoffeeDataManager.aggregate_stats().
+
+        Returns:
+            Dictionary with "matching_coffees", plus "distributions" and "percentages"
+        """
+        group_by = group_by or []
+        pipeline = self._stats_pipeline(query_dict, group_by, case_sensitive, match)
+        results = await self.collection.aggregate(pipeline).to_list(length=1)
+        stats = self._parse_stats_result(results[0] if results else {}, group_by)
+        if include_total:
+            stats["total_coffees"] = await self.collection.estimated_document_count()
+        return stats
+
+    def close(self):
+        """Close the MongoDB client if this manager created it."""
+        if self._owns_client:
+            self.client.close()
+
+
+async def _chunks(records: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                  size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Group a sync or async iterable into lists of at most size items."""
+    chunk = []
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    else:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,32 @@
+"""
+Backfill Coffee Fields - One-shot migration that adds derived fields to existing coffee entries.
+
+Computes the lowercase "normalized" fields, the "profile" attributes parsed from
+tasting_notes and the numeric ratio_water_per_gram for documents written before those
+fields existed, then builds the indexes.
+
+Usage: python3 backfill_coffee_fields.py [batch_size]
+"""
+
+import sys
+
+from coffee_manager import CoffeeDataManager
+
+
+def main():
+    """Run the derived-field backfill over the coffee collection."""
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    
+    print("Connecting to coffee database...")
+    manager = CoffeeDataManager()
+    
+    try:
+        manager.backfill_derived_fields(batch_size=batch_size)
+        manager.ensure_indexes()
+    
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Index benchmark - Measures query latency on the coffees collection before and after ensure_indexes().
+
+Usage: python3 benchmark_indexes.py [document_count ...]   (default: 100000 1000000)
+
+The benchmark uses a scratch collection that is dropped when it finishes.
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from coffee_manager import CoffeeDataManager
+
+
+BENCHMARK_COLLECTION = "coffees_index_benchmark"
+REPEATS = 20
+
+ORIGINS = ["Ethiopian Yirgacheffe", "Colombian Supremo", "Sumatra Mandheling", "Kenya AA", "Brazilian Santos"]
+ROASTING_LEVELS = ["Light", "Medium-Light", "Medium", "Medium-Dark", "Dark"]
+GRINDING_LEVELS = ["Coarse", "Medium", "Medium-Fine", "Fine"]
+BREWING_RATIOS = ["1:14", "1:15", "1:16", "1:17", "1:18"]
+FLAVORS = ["caramel", "jasmine", "blueberry", "dark chocolate", "cedar", "lemon", "hazelnut", "spice"]
+
+
+def generate_records(count):
+    """Yield count synthetic coffee records."""
+    for i in range(count):
+        yield {
+            "coffee_name": f"{random.choice(ORIGINS)} - Batch {i:07d}",
+            "roasting_level": random.choice(ROASTING_LEVELS),
+            "grinding_level": random.choice(GRINDING_LEVELS),
+            "brewing_ratio": random.choice(BREWING_RATIOS),
+            "tasting_notes": f"Notes of {random.choice(FLAVORS)} and {random.choice(FLAVORS)}. "
+                             "Bitterness: Medium. Sourness: Low."
+        }
+
+
+def time_query(query):
+    """Return the median latency of query() in milliseconds."""
+    timings = []
+    for _ in range(REPEATS):
+        start_time = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(timings)
+
+
+def run_queries(manager, count):
+    """Run the benchmark query set and return latencies keyed by query label."""
+    target_name = f"{ORIGINS[0]} - Batch {count // 2:07d}"
+    return {
+        "get_coffee_by_name": time_query(lambda: manager.get_coffee_by_name(target_name)),
+        "roasting_level equality (limit 10)": time_query(
+            lambda: manager.get_coffee_with_query({"roasting_level": "Medium"}, case_sensitive=True, limit=10)
+        ),
+        "brewing_ratio equality (limit 10)": time_query(
+            lambda: manager.get_coffee_with_query({"brewing_ratio": "1:16"}, case_sensitive=True, limit=10)
+        ),
+        "newest 10 by created_at": time_query(
+            lambda: manager.get_all_coffees(limit=10, sort=[("created_at", -1)])
+        ),
+        "distinct roasting_level": time_query(lambda: manager.collection.distinct("roasting_level")),
+    }
+
+
+def benchmark(count):
+    """Load count documents, then time the query set without and with indexes."""
+    manager = CoffeeDataManager(collection_name=BENCHMARK_COLLECTION)
+
+    try:
+        manager.collection.drop()
+        print(f"\nLoading {count} documents...")
+        manager.bulk_add_coffees(generate_records(count), batch_size=10000)
+
+        before = run_queries(manager, count)
+
+        print("Building indexes...")
+        report = manager.ensure_indexes()
+
+        after = run_queries(manager, count)
+
+        print("\n" + "=" * 72)
+        print(f"QUERY LATENCY AT {count} DOCUMENTS (median of {REPEATS} runs)")
+        print("=" * 72)
+        print(f"{'Query':<40}{'Before (ms)':>14}{'After (ms)':>14}")
+        for label in before:
+            print(f"{label:<40}{before[label]:>14.2f}{after[label]:>14.2f}")
+
+        print("\nFree-text lookup for 'jasmine' (limit 10):")
+        regex_ms = time_query(lambda: manager.get_coffee_with_query({"tasting_notes": "jasmine"}, limit=10))
+        text_ms = time_query(lambda: manager.text_search("jasmine", limit=10))
+        print(f"  contains match (regex scan): {regex_ms:.2f} ms")
+        print(f"  text_search (ranked, indexed): {text_ms:.2f} ms")
+        
+        print("\nIndex sizes:")
+        for name, info in report["indexes"].items():
+            size = info.get("size_bytes")
+            size_text = f"{size / 1024:.0f} KiB" if size is not None else "unknown"
+            print(f"  {name}: {size_text} (built in {info['build_seconds']:.2f}s)")
+
+    finally:
+        manager.collection.drop()
+        manager.close()
+
+
+def main():
+    """Run the benchmark for each requested collection size."""
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    for count in counts:
+        benchmark(count)
+
+
+if __name__ == "__main__":
+    main()
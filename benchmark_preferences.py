@@ -0,0 +1,97 @@
+"""
+Preference extraction benchmark - Times extract_preferences() over the logged query corpus.
+
+Usage: python3 benchmark_preferences.py [log_file ...]   (default: logs/*.jsonl*, logs/*.log)
+
+Queries are read from the "user_query" field of Sammy's JSONL query logs
+(rotated .jsonl.gz files included) and the "USER QUERY:" lines of older text logs; a small
+built-in corpus is used when there are no logs. Each run compares the old
+substring scan, the compiled matcher with an empty memo, and the memoized matcher.
+"""
+
+import glob
+import gzip
+import json
+import statistics
+import sys
+import time
+
+import preference_matcher
+from preference_matcher import PREFERENCE_VOCABULARY, extract_preferences
+
+
+REPEATS = 5
+
+SAMPLE_QUERIES = [
+    "I want medium roast coffee recommendations",
+    "What's the best brewing method for Colombian coffee?",
+    "My coffee is too sour, how can I fix it?",
+    "Analyze the profile of Ethiopian Yirgacheffe",
+    "How fine should I grind for a V60 pour over?",
+    "Something smooth and chocolatey for my french press",
+    "My espresso tastes watery, I want it stronger",
+    "Any fruity, bright Kenyan light roasts with berry notes?",
+]
+
+
+def load_queries(paths):
+    """Return the user queries logged in paths, or the sample corpus if there are none."""
+    queries = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as log_file:
+            if ".jsonl" in path:
+                events = (json.loads(line) for line in log_file if line.strip())
+                queries.extend(event["user_query"] for event in events if event.get("user_query"))
+            else:
+                queries.extend(line[len("USER QUERY: "):].strip() for line in log_file
+                               if line.startswith("USER QUERY: "))
+    return queries or SAMPLE_QUERIES
+
+
+def substring_extract(user_query):
+    """The previous implementation: substring tests for every keyword on every call."""
+    query_lower = user_query.lower()
+    preferences = {}
+    for preference, rules in PREFERENCE_VOCABULARY:
+        for value, keywords, _ in rules:
+            if any(word in query_lower for word in keywords):
+                preferences[preference] = value
+                break
+    return preferences
+
+
+def time_batch(extract, queries, before_each=None):
+    """Return the median microseconds per query of extract() over queries."""
+    timings = []
+    for _ in range(REPEATS):
+        if before_each:
+            before_each()
+        start_time = time.perf_counter()
+        for query in queries:
+            extract(query)
+        timings.append((time.perf_counter() - start_time) / len(queries) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    """Run the benchmark over the logged queries."""
+    paths = sys.argv[1:] or sorted(glob.glob("logs/*.jsonl*") + glob.glob("logs/*.log"))
+    queries = load_queries(paths)
+    distinct = len(set(query.lower() for query in queries))
+    print(f"Corpus: {len(queries)} queries ({distinct} distinct) from {len(paths) or 'built-in'} files")
+
+    results = {
+        "substring scan (previous)": time_batch(substring_extract, queries),
+        "compiled matcher, cold memo": time_batch(extract_preferences, queries, preference_matcher.clear_cache),
+        "compiled matcher, memoized": time_batch(extract_preferences, queries),
+    }
+
+    print(f"{'Method':<32}{'us/query':>12}")
+    for label, micros in results.items():
+        print(f"{label:<32}{micros:>12.2f}")
+    print(f"Memo: {preference_matcher.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
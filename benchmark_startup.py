@@ -0,0 +1,106 @@
+"""
+CLI startup benchmark - Measures import time of sammy_cli.py entry points with `python -X importtime`.
+
+Usage: python3 benchmark_startup.py [--update-baseline]
+
+Each scenario imports what one kind of command loads before doing any work, in a
+fresh interpreter, and reports the median total import time plus the slowest
+top-level imports. The run fails (exit 1) when a scenario imports one of the
+modules it must not load, or is more than BASELINE_TOLERANCE slower than the
+times recorded in BASELINE_FILE. Use --update-baseline after an intended change.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+REPEATS = 5
+
+# Allowed slowdown over the recorded baseline before the benchmark fails
+BASELINE_TOLERANCE = 0.5
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+# Modules that pull in the LLM stack or NumPy
+HEAVY_MODULES = ("sammy_agent", "crewai", "langchain_openai", "langchain", "numpy")
+
+# Scenario name -> (statement run under -X importtime, modules it must not import)
+SCENARIOS = {
+    # What every invocation pays, including --help
+    "cli": ("import sammy_cli", HEAVY_MODULES + ("pymongo", "sammy_server", "asyncio")),
+    # stats, find and export: the CLI plus the database layer
+    "db_commands": ("import sammy_cli, coffee_manager", HEAVY_MODULES),
+}
+
+
+def measure(statement):
+    """
+    Import statement in a fresh interpreter and parse its -X importtime report.
+
+    Returns:
+        (total import microseconds, {top-level module: cumulative microseconds})
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the module that triggered them
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative)
+    return sum(modules.values()), modules
+
+
+def loaded_modules(statement):
+    """Return the names of every module loaded by statement in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", f"{statement}; import sys; print(' '.join(sys.modules))"],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return set(result.stdout.split())
+
+
+def main():
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    failures = []
+    for name, (statement, forbidden) in SCENARIOS.items():
+        runs = [measure(statement) for _ in range(REPEATS)]
+        total_ms = statistics.median(total for total, _ in runs) / 1000
+        results[name] = round(total_ms, 1)
+
+        print(f"{name:<12} {total_ms:8.1f} ms   ({statement})")
+        slowest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:5]
+        for module, microseconds in slowest:
+            print(f"    {module:<24} {microseconds / 1000:8.1f} ms")
+
+        imported = sorted(module for module in loaded_modules(statement)
+                          if module.split(".")[0] in forbidden)
+        if imported:
+            failures.append(f"{name} imports {', '.join(imported)}")
+        if name in baseline and total_ms > baseline[name] * (1 + BASELINE_TOLERANCE):
+            failures.append(f"{name} took {total_ms:.1f} ms, baseline {baseline[name]:.1f} ms")
+
+    if "--update-baseline" in sys.argv[1:]:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {BASELINE_FILE}")
+        return
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Catalog Cache - An in-memory, self-refreshing snapshot of the coffee catalog.
+
+The snapshot is loaded once, then kept current in a background thread by
+tailing a MongoDB change stream. Change streams need a replica set or sharded
+cluster; against a standalone server the cache falls back to polling the
+updated_at watermark instead.
+"""
+
+import copy
+import threading
+import time
+from typing import List, Dict, Optional, Any, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+# Seconds between polls when change streams are unavailable (and before retrying a broken stream)
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Milliseconds the change stream waits for a change before checking for shutdown
+CHANGE_STREAM_WAIT_MS = 1000
+
+# Change stream events that invalidate the whole snapshot
+_RELOAD_EVENTS = ("drop", "rename", "dropDatabase", "invalidate")
+
+
+def _sort_key(value: Any) -> Tuple[bool, Any]:
+    """Sort key placing missing values first, as MongoDB does for ascending sorts."""
+    return (value is not None, value)
+
+
+def _sort_documents(documents: List[Dict[str, Any]],
+                    sort: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """Sort documents by a list of (field, direction) pairs."""
+    ordered = list(documents)
+    for field, direction in reversed(sort):
+        ordered.sort(key=lambda document: _sort_key(document.get(field)), reverse=direction < 0)
+    return ordered
+
+
+def _projected_fields(document: Dict[str, Any], projection: Dict[str, Any]) -> List[str]:
+    """
+    Resolve a MongoDB-style top-level projection against one document.
+
+    Args:
+        document: Cached document
+        projection: Inclusion ({"coffee_name": 1}) or exclusion ({"tasting_notes": 0})
+                    projection; "_id" is included unless set to 0
+
+    Returns:
+        Names of the fields to return
+
+    Raises:
+        ValueError: If the projection mixes inclusions and exclusions
+    """
+    include_id = bool(projection.get("_id", 1))
+    fields = {field: bool(include) for field, include in projection.items() if field != "_id"}
+    if len(set(fields.values())) > 1:
+        raise ValueError("projection cannot mix inclusions and exclusions (other than _id)")
+    if fields and next(iter(fields.values())):
+        selected = [field for field in fields if field in document]
+    else:
+        selected = [field for field in document if field != "_id" and field not in fields]
+    return (["_id"] if include_id and "_id" in document else []) + selected
+
+
+class CatalogCache:
+    """
+    In-memory copy of a coffee collection, restricted to a projection.
+
+    Reads never touch the database. Each document is stored with "_id" as str.
+    Projections are limited to top-level fields.
+    """
+
+    def __init__(self, collection, projection: Optional[Dict[str, Any]] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, use_change_stream: bool = True):
+        """
+        Initialize the cache. Nothing is loaded until start().
+
+        Args:
+            collection: pymongo Collection to mirror
+            projection: Fields to keep per document (None keeps whole documents)
+            poll_interval: Seconds between polls when change streams are unavailable
+            use_change_stream: Set to False to always poll
+        """
+        self.collection = collection
+        self.projection = projection
+        self.poll_interval = poll_interval
+        self.mode = "change_stream" if use_change_stream else "polling"
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._views: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._watermark = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._metrics = {"reloads": 0, "changes_applied": 0, "errors": 0}
+        self._last_refresh = None
+
+    def start(self) -> "CatalogCache":
+        """Load the snapshot and start keeping it fresh in the background."""
+        if self._thread is not None:
+            return self
+
+        # Open the stream before loading so changes made during the load are not missed
+        stream = self._open_change_stream() if self.mode == "change_stream" else None
+        self.reload()
+
+        self._thread = threading.Thread(target=self._run, args=(stream,),
+                                        name="catalog-cache", daemon=True)
+        self._thread.start()
+        print(f"Catalog cache loaded {len(self._documents)} coffees ({self.mode})")
+        return self
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get(self, limit: int = 0, sort: Optional[List[Tuple[str, int]]] = None,
+            projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Read catalog entries from memory.
+
+        Args:
+            limit: Maximum number of documents to return (0 means no limit)
+            sort: Optional list of (field, direction) pairs; fields must be in the cache projection
+            projection: Optional inclusion or exclusion projection over the cached
+                        fields, e.g. {"coffee_name": 1} or {"_id": 0, "tasting_notes": 0}
+
+        Returns:
+            List of coffee dictionaries (deep copies, safe to modify)
+
+        Raises:
+            ValueError: If the projection mixes inclusions and exclusions
+        """
+        key = tuple(sort or ())
+        with self._lock:
+            view = self._views.get(key)
+            if view is None:
+                view = _sort_documents(self._documents.values(), sort) if sort else list(self._documents.values())
+                self._views[key] = view
+            view = view[:limit] if limit else view
+
+        if projection:
+            view = [{field: coffee[field] for field in _projected_fields(coffee, projection)} for coffee in view]
+        # Nested values such as "normalized" and "profile" are shared with the snapshot
+        return copy.deepcopy(view)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the refresh mode, snapshot size and refresh counters."""
+        with self._lock:
+            return {
+                **self._metrics,
+                "mode": self.mode,
+                "documents": len(self._documents),
+                "last_refresh": self._last_refresh
+            }
+
+    def reload(self):
+        """Replace the snapshot with a fresh copy of the collection."""
+        documents = {}
+        watermark = None
+        for coffee in self.collection.find({}, self._query_projection()):
+            updated_at = coffee.get("updated_at")
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+            documents[str(coffee["_id"])] = self._project(coffee)
+
+        with self._lock:
+            self._documents = documents
+            self._views = {}
+            self._watermark = watermark
+            self._metrics["reloads"] += 1
+            self._last_refresh = time.time()
+
+    def _query_projection(self) -> Optional[Dict[str, Any]]:
+        """Projection used for reads from the database; always includes the watermark field."""
+        if self.projection is None:
+            return None
+        return {**self.projection, "updated_at": 1}
+
+    def _project(self, coffee: Dict[str, Any]) -> Dict[str, Any]:
+        """Restrict a raw document to the cache projection, converting "_id" to str."""
+        if self.projection is None:
+            document = dict(coffee)
+        else:
+            fields = [field for field, include in self.projection.items() if include]
+            document = {field: coffee[field] for field in fields if field in coffee}
+        document["_id"] = str(coffee["_id"])
+        return document
+
+    def _store(self, coffee: Dict[str, Any]):
+        """Insert or replace one document in the snapshot."""
+        document = self._project(coffee)
+        with self._lock:
+            updated_at = coffee.get("updated_at")
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+            self._last_refresh = time.time()
+            if self._documents.get(document["_id"]) == document:
+                return
+            self._documents[document["_id"]] = document
+            self._views = {}
+            self._metrics["changes_applied"] += 1
+
+    def _remove(self, coffee_id: str):
+        """Remove one document from the snapshot."""
+        with self._lock:
+            self._last_refresh = time.time()
+            if self._documents.pop(coffee_id, None) is not None:
+                self._views = {}
+                self._metrics["changes_applied"] += 1
+
+    def _open_change_stream(self):
+        """Open a change stream, switching to polling if the server does not support one."""
+        try:
+            return self.collection.watch(full_document="updateLookup", max_await_time_ms=CHANGE_STREAM_WAIT_MS)
+        except OperationFailure as e:
+            print(f"Catalog cache: change streams unavailable ({e}); polling every {self.poll_interval}s")
+            self.mode = "polling"
+            return None
+
+    def _run(self, stream):
+        """Background loop applying changes until stop() is called."""
+        while not self._stop.is_set():
+            try:
+                if stream is None:
+                    self._poll()
+                    self._stop.wait(self.poll_interval)
+                    continue
+
+                change = stream.try_next()
+                if change is not None and self._apply_change(change):
+                    stream.close()
+                    stream = self._open_change_stream()
+                    self.reload()
+            except PyMongoError as e:
+                with self._lock:
+                    self._metrics["errors"] += 1
+                print(f"Catalog cache: refresh failed ({e}); retrying in {self.poll_interval}s")
+                if stream is not None:
+                    stream.close()
+                    stream = None
+                if self._stop.wait(self.poll_interval):
+                    break
+                if self.mode == "change_stream":
+                    stream = self._open_change_stream()
+                    self.reload()
+
+        if stream is not None:
+            stream.close()
+
+    def _apply_change(self, change: Dict[str, Any]) -> bool:
+        """
+        Apply one change stream event to the snapshot.
+
+        Returns:
+            bool: True if the stream was invalidated and must be reopened
+        """
+        operation = change["operationType"]
+        if operation in ("insert", "update", "replace"):
+            coffee = change.get("fullDocument")
+            if coffee is None:
+                # Deleted again before the update lookup ran
+                self._remove(str(change["documentKey"]["_id"]))
+            else:
+                self._store(coffee)
+        elif operation == "delete":
+            self._remove(str(change["documentKey"]["_id"]))
+        elif operation in _RELOAD_EVENTS:
+            return True
+        return False
+
+    def _poll(self):
+        """Fetch documents changed since the watermark, reloading if documents were deleted."""
+        query = {"updated_at": {"$gte": self._watermark}} if self._watermark is not None else {}
+        for coffee in self.collection.find(query, self._query_projection()):
+            self._store(coffee)
+
+        # updated_at cannot reveal deletions, so compare sizes using the collection metadata count
+        if self.collection.estimated_document_count() != len(self._documents):
+            self.reload()
@@ -2,35 +2,690 @@
 Coffee Data Manager - A simple MongoDB-based class for storing and managing coffee data.
 """
 
+import re
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Optional, Any
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from itertools import islice
+from typing import TYPE_CHECKING, List, Dict, Optional, Any, Iterable, Iterator, Tuple, Union
+from pymongo import MongoClient, IndexModel, UpdateOne, ASCENDING, TEXT, ReturnDocument
+from pymongo.errors import ConnectionFailure, BulkWriteError, PyMongoError
 from bson import ObjectId
 
+from catalog_cache import CatalogCache, DEFAULT_POLL_INTERVAL
+from sammy_metrics import timed
 
-class CoffeeDataManager:
-    """A class to manage coffee data using MongoDB."""
+# semantic_index (and NumPy) is imported when the index is first enabled, so
+# database-only tools do not pay for it at startup
+if TYPE_CHECKING:
+    from semantic_index import SemanticIndex
+
+
+# Fields every coffee record must provide
+COFFEE_FIELDS = ("coffee_name", "roasting_level", "grinding_level", "brewing_ratio", "tasting_notes")
+
+# Collection holding one change-version counter document per coffee collection
+META_COLLECTION = "coffee_meta"
+
+# Number of documents fetched per cursor round trip when streaming results
+DEFAULT_CURSOR_BATCH_SIZE = 500
+
+# Sort specification accepted by the query methods, e.g. [("created_at", -1)]
+SortSpec = List[Tuple[str, int]]
+
+# Fields with a lowercase shadow copy under "normalized" for case-insensitive, index-friendly matching
+NORMALIZED_FIELDS = ("coffee_name", "roasting_level", "grinding_level")
+
+# Attributes parsed from "Attribute: Level" phrases in tasting_notes into "profile"
+PROFILE_ATTRIBUTES = ("bitterness", "sourness")
+
+_PROFILE_PATTERN = re.compile(
+    r"\b(" + "|".join(PROFILE_ATTRIBUTES) + r")\s*:\s*([a-z][a-z -]*?)\s*(?=[.,;]|$)",
+    re.IGNORECASE
+)
+
+# Top-level fields written by _derived_fields()
+DERIVED_FIELDS = ("normalized", "profile", "ratio_water_per_gram")
+
+# Fields read by backfill_derived_fields(): the sources and the current derived values
+BACKFILL_PROJECTION = {field: 1 for field in COFFEE_FIELDS + DERIVED_FIELDS}
+
+# Match modes accepted by the query methods. Only "contains" requires a collection scan.
+MATCH_MODES = ("exact", "prefix", "contains")
+
+# A single match mode, or a mode per field, e.g. {"coffee_name": "prefix", "roasting_level": "exact"}
+MatchSpec = Union[str, Dict[str, str]]
+
+# Indexes maintained on the coffees collection by ensure_indexes()
+COFFEE_INDEXES = [
+    IndexModel([("coffee_name", ASCENDING)], name="coffee_name_1"),
+    IndexModel([("roasting_level", ASCENDING)], name="roasting_level_1"),
+    IndexModel([("grinding_level", ASCENDING)], name="grinding_level_1"),
+    IndexModel([("brewing_ratio", ASCENDING)], name="brewing_ratio_1"),
+    IndexModel([("created_at", ASCENDING)], name="created_at_1"),
+    # Read by the catalog cache's polling fallback ({"updated_at": {"$gte": watermark}})
+    IndexModel([("updated_at", ASCENDING)], name="updated_at_1"),
+    IndexModel([("normalized.coffee_name", ASCENDING)], name="normalized_coffee_name_1"),
+    IndexModel([("normalized.roasting_level", ASCENDING)], name="normalized_roasting_level_1"),
+    IndexModel([("normalized.grinding_level", ASCENDING)], name="normalized_grinding_level_1"),
+    IndexModel([("profile.bitterness", ASCENDING)], name="profile_bitterness_1"),
+    IndexModel([("profile.sourness", ASCENDING)], name="profile_sourness_1"),
+    IndexModel([("ratio_water_per_gram", ASCENDING)], name="ratio_water_per_gram_1"),
+    IndexModel([("coffee_name", TEXT), ("tasting_notes", TEXT)], name="coffee_text",
+               weights={"coffee_name": 2, "tasting_notes": 1}, default_language="english"),
+]
+
+# Sort by relevance for text_search()
+TEXT_SCORE_SORT = [("score", {"$meta": "textScore"})]
+
+
+def parse_brewing_ratio(brewing_ratio: str) -> Optional[float]:
+    """
+    Parse a coffee-to-water ratio string into grams of water per gram of coffee.
+    
+    Args:
+        brewing_ratio: Ratio such as "1:15", "1:2.5" or "2:31"
+        
+    Returns:
+        Water per gram of coffee (lower means a stronger brew), or None if unparseable
+    """
+    try:
+        coffee, water = (float(part) for part in brewing_ratio.split(":"))
+    except (AttributeError, ValueError):
+        return None
+    if coffee <= 0:
+        return None
+    return water / coffee
+
+
+def parse_tasting_profile(tasting_notes: str) -> Dict[str, Optional[str]]:
+    """
+    Parse structured attributes out of free-text tasting notes.
+    
+    Args:
+        tasting_notes: Notes such as "Smooth and nutty. Bitterness: Medium-Low. Sourness: High."
+        
+    Returns:
+        Dictionary with a lowercase level (e.g. "medium-low") or None for each
+        attribute in PROFILE_ATTRIBUTES
+    """
+    profile = {attribute: None for attribute in PROFILE_ATTRIBUTES}
+    for attribute, level in _PROFILE_PATTERN.findall(tasting_notes):
+        profile[attribute.lower()] = " ".join(level.lower().split())
+    return profile
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    """Return the value at a dotted field path such as "profile.sourness", or None if absent."""
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+# Connection settings used when config.py does not provide them
+DEFAULT_DATABASE_SETTINGS = {
+    "connection_string": "mongodb://localhost:27017/",
+    "database_name": "coffee_db",
+    "collection_name": "coffees"
+}
+
+
+def database_settings() -> Dict[str, str]:
+    """
+    Get the MongoDB connection settings shared by the agent and the CLI's database commands.
+    
+    Returns:
+        Dictionary with connection_string, database_name and collection_name
+        (CoffeeDataManager keyword arguments), taken from MONGODB_URL,
+        MONGODB_DATABASE and MONGODB_COLLECTION in config.py when it defines
+        them, otherwise DEFAULT_DATABASE_SETTINGS
+    """
+    try:
+        from config import MONGODB_URL, MONGODB_DATABASE, MONGODB_COLLECTION
+    except ImportError:
+        return dict(DEFAULT_DATABASE_SETTINGS)
+    return {"connection_string": MONGODB_URL, "database_name": MONGODB_DATABASE,
+            "collection_name": MONGODB_COLLECTION}
+
+
+# Connection pool settings applied to shared clients unless overridden. No
+# socketTimeoutMS: long aggregations and backfills must not be cut off, so pass
+# one in pool_options to opt in.
+DEFAULT_POOL_OPTIONS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 0,
+    "serverSelectionTimeoutMS": 5000,
+    "connectTimeoutMS": 5000
+}
+
+
+def _options_key(value: Any) -> Any:
+    """Turn MongoClient options (which may hold dicts or lists) into a hashable registry key."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _options_key(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_options_key(item) for item in value)
+    return value
+
+
+class MongoClientRegistry:
+    """
+    Process-wide registry of pooled MongoClients shared between CoffeeDataManager instances.
+    
+    Clients are keyed by connection string and pool options and reference counted:
+    the first acquire creates and pings the client, later acquires reuse it, and
+    the client is closed when the last holder releases it. The ping runs outside
+    the registry lock, so a slow server does not block acquires of other clients.
+    """
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._entries = {}
+    
+    def acquire(self, connection_string: str, pool_options: Optional[Dict[str, Any]] = None) -> MongoClient:
+        """
+        Get the shared client for a connection string, creating it if needed.
+        
+        Args:
+            connection_string: MongoDB connection string
+            pool_options: MongoClient keyword options overriding DEFAULT_POOL_OPTIONS,
+                          e.g. {"maxPoolSize": 100, "minPoolSize": 10}
+            
+        Returns:
+            MongoClient: The shared, connected client
+            
+        Raises:
+            ConnectionFailure: If a new client cannot reach the server
+        """
+        options = {**DEFAULT_POOL_OPTIONS, **(pool_options or {})}
+        key = (connection_string, _options_key(options))
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["refcount"] += 1
+                return entry["client"]
+        
+        client = MongoClient(connection_string, **options)
+        try:
+            client.admin.command('ping')  # Test connection once per client
+        except ConnectionFailure:
+            client.close()
+            raise
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"client": client, "options": options, "refcount": 0}
+                self._entries[key] = entry
+                client = None
+            entry["refcount"] += 1
+            shared = entry["client"]
+        if client is not None:
+            # Another thread registered a client for this key while we pinged
+            client.close()
+        return shared
+    
+    def release(self, client: MongoClient) -> bool:
+        """
+        Release one reference to a shared client.
+        
+        Args:
+            client: A client returned by acquire()
+            
+        Returns:
+            True if this was the last reference and the client was closed
+        """
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["client"] is client:
+                    entry["refcount"] -= 1
+                    if entry["refcount"] > 0:
+                        return False
+                    del self._entries[key]
+                    break
+            else:
+                return False
+        client.close()
+        return True
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Return the connection string and reference count of each shared client."""
+        with self._lock:
+            return [
+                {"connection_string": key[0], "options": dict(entry["options"]), "refcount": entry["refcount"]}
+                for key, entry in self._entries.items()
+            ]
+
+
+# Registry used by every CoffeeDataManager in this process
+client_registry = MongoClientRegistry()
+
+
+class CoffeeDocumentMixin:
+    """
+    Document building, query translation and result shaping shared by the
+    synchronous and asynchronous coffee managers. Nothing here performs I/O.
+    """
+    
+    def _build_coffee_document(self, coffee_name: str, roasting_level: str, grinding_level: str,
+                               brewing_ratio: str, tasting_notes: str) -> Dict[str, Any]:
+        """Build the document stored for a single coffee entry."""
+        now = datetime.now()
+        document = {
+            "coffee_name": coffee_name,
+            "roasting_level": roasting_level,
+            "grinding_level": grinding_level,
+            "brewing_ratio": brewing_ratio,
+            "tasting_notes": tasting_notes,
+            "created_at": now,
+            "updated_at": now
+        }
+        
+        # Derived fields are computed as dotted paths; nest them for the insert
+        for path, value in self._derived_fields(document).items():
+            parent, _, child = path.partition(".")
+            if child:
+                document.setdefault(parent, {})[child] = value
+            else:
+                document[parent] = value
+        return document
+    
+    def _derived_fields(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compute the fields derived from the given source fields.
+        
+        Args:
+            fields: Source field values (a full document or a partial update)
+            
+        Returns:
+            Dictionary of dotted field paths to derived values
+        """
+        derived = {}
+        for field in NORMALIZED_FIELDS:
+            if isinstance(fields.get(field), str):
+                derived[f"normalized.{field}"] = fields[field].lower()
+        if isinstance(fields.get("tasting_notes"), str):
+            for attribute, level in parse_tasting_profile(fields["tasting_notes"]).items():
+                derived[f"profile.{attribute}"] = level
+        if "brewing_ratio" in fields:
+            derived["ratio_water_per_gram"] = parse_brewing_ratio(fields["brewing_ratio"])
+        return derived
+    
+    def _backfill_update(self, document: Dict[str, Any]) -> Optional[UpdateOne]:
+        """
+        Build the update bringing one stored document's derived fields up to date.
+        
+        Only changed fields are written, together with a new updated_at so
+        updated_at watermarks (the catalog cache's polling fallback) see them.
+        
+        Args:
+            document: Stored document read with BACKFILL_PROJECTION
+            
+        Returns:
+            UpdateOne, or None if the derived fields are already current
+        """
+        changed = {path: value for path, value in self._derived_fields(document).items()
+                   if _get_path(document, path) != value}
+        if not changed:
+            return None
+        changed["updated_at"] = datetime.now()
+        return UpdateOne({"_id": document["_id"]}, {"$set": changed})
+    
+    def _version_bump(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Filter and update on the meta collection that advance data_version().
+        
+        Every write path of both managers bumps the version through this, so the
+        response cache and semantic index see async and sync writes alike.
+        """
+        return {"_id": self.collection.name}, {"$inc": {"version": 1}}
+    
+    def _build_query(self, query_dict: Dict[str, Any], case_sensitive: bool = False,
+                     match: Optional[MatchSpec] = None, ratio_min: Optional[float] = None,
+                     ratio_max: Optional[float] = None) -> Dict[str, Any]:
+        """Translate a field/value dictionary into a MongoDB filter."""
+        default_match = "exact" if case_sensitive else "contains"
+        field_matches = match if isinstance(match, dict) else {}
+        if isinstance(match, str):
+            default_match = match
+        
+        query = {}
+        
+        for key, value in query_dict.items():
+            if value is not None:
+                field_match = field_matches.get(key, default_match)
+                if field_match not in MATCH_MODES:
+                    raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+                query.update(self._match_condition(key, value, case_sensitive, field_match))
+        
+        # Range predicates on the numeric brewing ratio
+        ratio_range = {}
+        if ratio_min is not None:
+            ratio_range["$gte"] = ratio_min
+        if ratio_max is not None:
+            ratio_range["$lte"] = ratio_max
+        if ratio_range:
+            query["ratio_water_per_gram"] = ratio_range
+        
+        return query
+    
+    def _match_condition(self, field: str, value: Any, case_sensitive: bool, match: str) -> Dict[str, Any]:
+        """Build the filter for one field, using the normalized shadow field where possible."""
+        is_profile_field = field in PROFILE_ATTRIBUTES or field.startswith("profile.")
+        if is_profile_field and isinstance(value, str):
+            # Profile levels are stored lowercase, so matching is always on the indexed field
+            field, value = f"profile.{field.split('.')[-1]}", value.lower()
+            case_sensitive = True
+        
+        if match == "contains":
+            # Unanchored regex, cannot use an index
+            if case_sensitive:
+                return {field: {"$regex": str(value)}}
+            return {field: {"$regex": str(value), "$options": "i"}}
+        
+        if not isinstance(value, str):
+            return {field: value}
+        
+        if not case_sensitive and field in NORMALIZED_FIELDS:
+            # Compare against the lowercase shadow field so the index is used
+            field, value = f"normalized.{field}", value.lower()
+            case_sensitive = True
+        
+        if match == "exact":
+            if case_sensitive:
+                return {field: value}
+            return {field: {"$regex": f"^{re.escape(value)}$", "$options": "i"}}
+        
+        # Anchored, case-sensitive prefix regexes are answered from the index
+        if case_sensitive:
+            return {field: {"$regex": f"^{re.escape(value)}"}}
+        return {field: {"$regex": f"^{re.escape(value)}", "$options": "i"}}
+    
+    def _text_search_query(self, query: str,
+                           projection: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Build the filter and projection (with the relevance score) for text_search()."""
+        return {"$text": {"$search": query}}, {**(projection or {}), "score": {"$meta": "textScore"}}
+    
+    def _new_bulk_report(self) -> Dict[str, Any]:
+        """
+        Create the running totals for a bulk insert.
+        
+        "positions" holds, for the current batch, the position in the caller's
+        chunk of each built document, so every error reports a chunk index.
+        """
+        return {"inserted_ids": [], "errors": [], "failed_count": 0, "batches": 0, "positions": []}
+    
+    def _prepare_bulk_batch(self, chunk: List[Dict[str, Any]], report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build documents for one batch, reporting malformed records instead of aborting."""
+        report["batches"] += 1
+        documents = []
+        report["positions"] = []
+        for position, record in enumerate(chunk):
+            try:
+                documents.append(self._build_coffee_document(*(record[field] for field in COFFEE_FIELDS)))
+                report["positions"].append(position)
+            except (KeyError, TypeError) as e:
+                report["failed_count"] += 1
+                report["errors"].append({"batch": report["batches"], "index": position,
+                                         "error": f"Invalid record: {e}"})
+        return documents
+    
+    def _record_bulk_batch(self, report: Dict[str, Any], documents: List[Dict[str, Any]],
+                           error: Optional[PyMongoError] = None):
+        """Add the outcome of one insert_many call to the bulk report."""
+        batch = report["batches"]
+        if error is None:
+            report["inserted_ids"].extend(str(doc["_id"]) for doc in documents)
+        elif isinstance(error, BulkWriteError):
+            # With ordered=False every document without a write error was still inserted
+            write_errors = error.details.get("writeErrors", [])
+            failed_indexes = {err["index"] for err in write_errors}
+            for err in write_errors:
+                # err["index"] counts built documents only; report the position in the chunk
+                report["errors"].append({"batch": batch, "index": report["positions"][err["index"]],
+                                         "error": err.get("errmsg", "Write error")})
+            report["inserted_ids"].extend(
+                str(doc["_id"]) for i, doc in enumerate(documents) if i not in failed_indexes
+            )
+            report["failed_count"] += len(failed_indexes)
+            print(f"Batch {batch}: {len(failed_indexes)} of {len(documents)} documents failed")
+        else:
+            report["failed_count"] += len(documents)
+            report["errors"].append({"batch": batch, "index": None, "error": str(error)})
+            print(f"Batch {batch} failed: {error}")
+    
+    def _finish_bulk_report(self, report: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        """Add counts and throughput to a completed bulk report."""
+        elapsed = time.perf_counter() - start_time
+        inserted_count = len(report["inserted_ids"])
+        print(f"Bulk added {inserted_count} coffees in {report['batches']} batches ({elapsed:.2f}s)")
+        
+        return {
+            "inserted_ids": report["inserted_ids"],
+            "inserted_count": inserted_count,
+            "failed_count": report["failed_count"],
+            "errors": report["errors"],
+            "batches": report["batches"],
+            "elapsed_seconds": elapsed,
+            "docs_per_second": inserted_count / elapsed if elapsed > 0 else 0.0
+        }
+    
+    def _stats_pipeline(self, query_dict: Optional[Dict[str, Any]], group_by: List[str],
+                        case_sensitive: bool, match: Optional[MatchSpec]) -> List[Dict[str, Any]]:
+        """Build the $match/$facet pipeline used by aggregate_stats()."""
+        # Facet names cannot contain dots, so each group is keyed by position
+        facets = {"matching": [{"$count": "count"}]}
+        for position, field in enumerate(group_by):
+            facets[f"group_{position}"] = [
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ]
+        
+        pipeline = []
+        query = self._build_query(query_dict or {}, case_sensitive, match)
+        if query:
+            pipeline.append({"$match": query})
+        pipeline.append({"$facet": facets})
+        return pipeline
+    
+    def _parse_stats_result(self, result: Dict[str, Any], group_by: List[str]) -> Dict[str, Any]:
+        """Turn the $facet output of _stats_pipeline() into counts, distributions and percentages."""
+        matching = result.get("matching") or [{"count": 0}]
+        matching_coffees = matching[0]["count"]
+        
+        distributions = {}
+        percentages = {}
+        for position, field in enumerate(group_by):
+            groups = result.get(f"group_{position}", [])
+            distributions[field] = {group["_id"]: group["count"] for group in groups}
+            percentages[field] = {
+                group["_id"]: group["count"] / matching_coffees * 100 if matching_coffees else 0.0
+                for group in groups
+            }
+        
+        return {
+            "matching_coffees": matching_coffees,
+            "distributions": distributions,
+            "percentages": percentages
+        }
+    
+    def _get_stats_summary(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape aggregate_stats() output into the get_stats() result."""
+        distributions = stats["distributions"]
+        return {
+            "total_coffees": stats["matching_coffees"],
+            "roasting_levels": [level for level in distributions["roasting_level"] if level is not None],
+            "grinding_levels": [level for level in distributions["grinding_level"] if level is not None]
+        }
+
+
+class CoffeeDataManager(CoffeeDocumentMixin):
+    """
+    A class to manage coffee data using MongoDB.
+    
+    Each operation is timed as a "db.<method>" span in sammy_metrics.metrics.
+    """
     
     def __init__(self, connection_string: str = "mongodb://localhost:27017/", 
-                 database_name: str = "coffee_db", collection_name: str = "coffees"):
+                 database_name: str = "coffee_db", collection_name: str = "coffees",
+                 create_indexes: bool = False, pool_options: Optional[Dict[str, Any]] = None):
         """
         Initialize the CoffeeDataManager.
         
+        Managers with the same connection string and pool options share one pooled
+        MongoClient from client_registry.
+        
         Args:
             connection_string: MongoDB connection string
             database_name: Name of the database
             collection_name: Name of the collection
+            create_indexes: If True, run ensure_indexes() after connecting
+            pool_options: MongoClient options such as maxPoolSize, minPoolSize and
+                          timeouts, overriding DEFAULT_POOL_OPTIONS
         """
+        self._closed = False
+        self.catalog_cache = None
+        self.semantic_index = None
         try:
-            self.client = MongoClient(connection_string)
-            self.client.admin.command('ping')  # Test connection
+            self.client = client_registry.acquire(connection_string, pool_options)
             self.db = self.client[database_name]
             self.collection = self.db[collection_name]
+            self.meta_collection = self.db[META_COLLECTION]
             print(f"Connected to MongoDB: {database_name}.{collection_name}")
         except ConnectionFailure:
             raise ConnectionError("Could not connect to MongoDB. Make sure MongoDB is running.")
+        
+        if create_indexes:
+            self.ensure_indexes()
+    
+    @timed("db.ensure_indexes")
+    def ensure_indexes(self) -> Dict[str, Any]:
+        """
+        Create (if missing) and verify the indexes used by the query methods.
+        
+        Building an index that already exists is a no-op on the server, so this
+        is safe to call on every startup.
+        
+        Returns:
+            Dictionary with per-index build time and size, plus any indexes
+            that could not be verified
+        """
+        existing = self.collection.index_information()
+        report = {}
+        
+        for position, index in enumerate(COFFEE_INDEXES, 1):
+            name = index.document["name"]
+            if name in existing:
+                print(f"Index {position}/{len(COFFEE_INDEXES)} {name}: already present")
+                report[name] = {"created": False, "build_seconds": 0.0}
+                continue
+            
+            print(f"Index {position}/{len(COFFEE_INDEXES)} {name}: building...")
+            start_time = time.perf_counter()
+            self.collection.create_indexes([index])
+            elapsed = time.perf_counter() - start_time
+            print(f"Index {position}/{len(COFFEE_INDEXES)} {name}: built in {elapsed:.2f}s")
+            report[name] = {"created": True, "build_seconds": elapsed}
+        
+        # Verify every expected index exists and report its size
+        existing = self.collection.index_information()
+        index_sizes = self._get_index_sizes()
+        missing = []
+        for index in COFFEE_INDEXES:
+            name = index.document["name"]
+            if name not in existing:
+                missing.append(name)
+                continue
+            report[name]["keys"] = existing[name]["key"]
+            report[name]["size_bytes"] = index_sizes.get(name)
+        
+        if missing:
+            print(f"Warning: missing indexes after build: {', '.join(missing)}")
+        
+        return {"indexes": report, "missing": missing}
+    
+    @timed("db.data_version")
+    def data_version(self) -> int:
+        """
+        Get the collection's change version.
+        
+        The counter is bumped by every write made through a coffee manager
+        (add, update, delete, bulk insert and backfill), so callers can cache
+        anything derived from the collection until the version changes. Costs
+        one _id lookup.
+        
+        Returns:
+            int: Monotonic version number (0 if the collection was never written)
+        """
+        meta = self.meta_collection.find_one({"_id": self.collection.name}, {"version": 1})
+        return meta["version"] if meta else 0
     
+    def _bump_data_version(self) -> int:
+        """Record that the collection changed, returning the new version."""
+        meta = self.meta_collection.find_one_and_update(
+            *self._version_bump(), projection={"version": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return meta["version"]
+    
+    @timed("db.enable_semantic_index")
+    def enable_semantic_index(self, path: Optional[str] = None,
+                              dimensions: Optional[int] = None) -> "SemanticIndex":
+        """
+        Open the on-disk semantic index used by semantic_search(), building it if needed.
+        
+        The index is rebuilt from the collection when its recorded data_version()
+        does not match the database. Afterwards add, update, delete and bulk
+        insert calls on this manager keep it current, and semantic_search()
+        catches up with writes made elsewhere.
+        
+        Args:
+            path: Directory holding the index files (default: semantic_index.DEFAULT_INDEX_PATH)
+            dimensions: Vector length (default: semantic_index.DEFAULT_DIMENSIONS)
+            
+        Returns:
+            The open SemanticIndex
+        """
+        if self.semantic_index is None:
+            from semantic_index import SemanticIndex, DEFAULT_INDEX_PATH, DEFAULT_DIMENSIONS
+            index = SemanticIndex(path or DEFAULT_INDEX_PATH, dimensions or DEFAULT_DIMENSIONS)
+            self.semantic_index = self._sync_semantic_index(index)
+        return self.semantic_index
+    
+    def _sync_semantic_index(self, index: "SemanticIndex") -> "SemanticIndex":
+        """Bring index up to data_version(): reload it from disk, and rebuild it if that is not enough."""
+        from semantic_index import INDEXED_FIELDS, coffee_text
+        version = self.data_version()
+        if index.data_version != version:
+            # Another process sharing the index files may already have caught up
+            index.refresh()
+        if index.data_version != version:
+            print(f"Building semantic index in {index.path}...")
+            coffees = self.iter_coffees(projection={field: 1 for field in INDEXED_FIELDS})
+            index.rebuild(((coffee["_id"], coffee_text(coffee)) for coffee in coffees), version,
+                          capacity=self.collection.estimated_document_count())
+            print(f"Semantic index built with {len(index)} coffees")
+        return index
+    
+    def _index_coffees(self, coffees: Iterable[Dict[str, Any]], version: int):
+        """Add or refresh coffees in the semantic index, if it is enabled."""
+        if self.semantic_index is not None:
+            from semantic_index import coffee_text
+            self.semantic_index.upsert_many(((str(coffee["_id"]), coffee_text(coffee)) for coffee in coffees), version)
+    
+    def _get_index_sizes(self) -> Dict[str, int]:
+        """Return index sizes in bytes keyed by index name, or {} if unavailable."""
+        try:
+            stats = self.db.command("collStats", self.collection.name)
+            return dict(stats.get("indexSizes", {}))
+        except PyMongoError:
+            return {}
+    
+    @timed("db.add_coffee")
     def add_coffee(self, coffee_name: str, roasting_level: str, grinding_level: str, 
                    brewing_ratio: str, tasting_notes: str) -> str:
         """
@@ -46,32 +701,227 @@ class CoffeeDataManager:
         Returns:
             str: The inserted document's ID
         """
-        coffee_data = {
-            "coffee_name": coffee_name,
-            "roasting_level": roasting_level,
-            "grinding_level": grinding_level,
-            "brewing_ratio": brewing_ratio,
-            "tasting_notes": tasting_notes,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        }
+        coffee_data = self._build_coffee_document(
+            coffee_name, roasting_level, grinding_level, brewing_ratio, tasting_notes
+        )
         
         result = self.collection.insert_one(coffee_data)
+        self._index_coffees([coffee_data], self._bump_data_version())
         print(f"Added coffee: {coffee_name}")
         return str(result.inserted_id)
     
-    def get_all_coffees(self) -> List[Dict[str, Any]]:
+    @timed("db.backfill_derived_fields")
+    def backfill_derived_fields(self, batch_size: int = 1000) -> int:
+        """
+        Recompute derived fields for every existing document, in batches.
+        
+        One-shot migration for documents written before a derived field existed
+        (the "normalized" shadow fields, the "profile" attributes parsed from
+        tasting_notes and the numeric ratio_water_per_gram). Documents whose
+        derived fields change get a new updated_at, so the catalog cache's
+        polling fallback picks them up.
+        
+        Args:
+            batch_size: Number of updates sent per bulk_write call
+            
+        Returns:
+            int: Number of documents updated
+        """
+        cursor = self.collection.find({}, BACKFILL_PROJECTION).batch_size(batch_size)
+        updated = 0
+        operations = []
+        
+        try:
+            for document in cursor:
+                operation = self._backfill_update(document)
+                if operation is not None:
+                    operations.append(operation)
+                if len(operations) >= batch_size:
+                    updated += self.collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+                    print(f"Backfilled {updated} documents...")
+            if operations:
+                updated += self.collection.bulk_write(operations, ordered=False).modified_count
+        finally:
+            cursor.close()
+        
+        if updated:
+            version = self._bump_data_version()
+            if self.semantic_index is not None:
+                # Derived fields are not indexed, so the vectors are still current
+                self.semantic_index.record_version(version)
+        print(f"Backfill complete: {updated} documents updated")
+        return updated
+    
+    @timed("db.bulk_add_coffees")
+    def bulk_add_coffees(self, coffees: Iterable[Dict[str, Any]], batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Add many coffee entries using batched, unordered inserts.
+        
+        Records are consumed lazily, so any iterable (including generators) can be
+        streamed in without being held in memory. A failing batch or record is
+        reported and skipped; the rest of the run continues.
+        
+        Args:
+            coffees: Iterable of dictionaries with the same fields as add_coffee()
+            batch_size: Number of documents sent per insert_many call
+            
+        Returns:
+            Dictionary with inserted IDs, counts, per-batch errors and throughput stats
+            
+        Example:
+            result = manager.bulk_add_coffees(read_roastery_export(path), batch_size=5000)
+            print(f"{result['inserted_count']} added at {result['docs_per_second']:.0f} docs/s")
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        
+        report = self._new_bulk_report()
+        start_time = time.perf_counter()
+        records = iter(coffees)
+        
+        while True:
+            chunk = list(islice(records, batch_size))
+            if not chunk:
+                break
+            
+            documents = self._prepare_bulk_batch(chunk, report)
+            if not documents:
+                continue
+            
+            inserted_before = len(report["inserted_ids"])
+            try:
+                self.collection.insert_many(documents, ordered=False)
+                self._record_bulk_batch(report, documents)
+            except PyMongoError as e:
+                self._record_bulk_batch(report, documents, e)
+            if len(report["inserted_ids"]) > inserted_before:
+                inserted = set(report["inserted_ids"][inserted_before:])
+                self._index_coffees([doc for doc in documents if str(doc["_id"]) in inserted],
+                                    self._bump_data_version())
+        
+        return self._finish_bulk_report(report, start_time)
+    
+    @timed("db.get_all_coffees")
+    def get_all_coffees(self, projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                        skip: int = 0, sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
         """
         Get all coffee entries.
         
+        Prefer iter_coffees() for large collections, this materializes every document.
+        
+        Args:
+            projection: Optional MongoDB projection, e.g. {"coffee_name": 1}
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
+            
         Returns:
             List of coffee dictionaries
         """
-        coffees = list(self.collection.find())
-        for coffee in coffees:
-            coffee["_id"] = str(coffee["_id"])
-        return coffees
+        return list(self.iter_coffees(projection=projection, limit=limit, skip=skip, sort=sort))
+    
+    def iter_coffees(self, batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+                     projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                     skip: int = 0, sort: Optional[SortSpec] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all coffee entries from a server-side cursor.
+        
+        Args:
+            batch_size: Number of documents fetched per cursor round trip
+            projection: Optional MongoDB projection, e.g. {"coffee_name": 1}
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
+            
+        Yields:
+            Coffee dictionaries with "_id" converted to str
+        """
+        return self._iter_cursor({}, batch_size=batch_size, projection=projection,
+                                 limit=limit, skip=skip, sort=sort)
+    
+    def _iter_cursor(self, query: Dict[str, Any], batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+                     projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                     skip: int = 0, sort: Optional[SortSpec] = None) -> Iterator[Dict[str, Any]]:
+        """Yield documents matching query one at a time, converting "_id" to str."""
+        cursor = self.collection.find(query, projection).batch_size(batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        try:
+            for coffee in cursor:
+                if "_id" in coffee:
+                    coffee["_id"] = str(coffee["_id"])
+                yield coffee
+        finally:
+            cursor.close()
     
+    def enable_catalog_cache(self, projection: Optional[Dict[str, Any]] = None,
+                             poll_interval: float = DEFAULT_POLL_INTERVAL,
+                             use_change_stream: bool = True) -> CatalogCache:
+        """
+        Keep an in-memory snapshot of the collection for get_catalog().
+        
+        The snapshot is loaded once and refreshed in the background from a change
+        stream, or by polling the updated_at watermark when the server does not
+        support change streams (e.g. a standalone mongod).
+        
+        Args:
+            projection: Top-level fields to keep per coffee (None keeps whole documents)
+            poll_interval: Seconds between polls when change streams are unavailable
+            use_change_stream: Set to False to always poll
+            
+        Returns:
+            The running CatalogCache
+        """
+        if self.catalog_cache is None:
+            self.catalog_cache = CatalogCache(self.collection, projection, poll_interval, use_change_stream).start()
+        return self.catalog_cache
+    
+    @timed("db.get_catalog")
+    def get_catalog(self, projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                    sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
+        """
+        Get catalog entries, from the in-memory snapshot when enable_catalog_cache() was called.
+        
+        Without a catalog cache this is the same as get_all_coffees().
+        
+        Args:
+            projection: Optional projection; with a cache, an inclusion or exclusion
+                        projection over the cached fields
+            limit: Maximum number of documents to return (0 means no limit)
+            sort: Optional list of (field, direction) pairs; with a cache, the
+                  fields must be in the cached projection
+            
+        Returns:
+            List of coffee dictionaries
+        """
+        if self.catalog_cache is not None:
+            return self.catalog_cache.get(limit=limit, sort=sort, projection=projection)
+        return self.get_all_coffees(projection=projection, limit=limit, sort=sort)
+    
+    @timed("db.get_coffees_by_ids")
+    def get_coffees_by_ids(self, coffee_ids: Iterable[str],
+                           projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Get the coffees whose IDs are listed, in a single query.
+        
+        Args:
+            coffee_ids: Coffee IDs; strings that are not valid ObjectIds are ignored
+            projection: Optional MongoDB projection
+            
+        Returns:
+            List of matching coffee dictionaries
+        """
+        object_ids = [ObjectId(coffee_id) for coffee_id in coffee_ids if ObjectId.is_valid(coffee_id)]
+        if not object_ids:
+            return []
+        return list(self._iter_cursor({"_id": {"$in": object_ids}}, projection=projection))
+    
+    @timed("db.get_coffee_by_id")
     def get_coffee_by_id(self, coffee_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a coffee by its ID.
@@ -87,30 +937,47 @@ class CoffeeDataManager:
             coffee["_id"] = str(coffee["_id"])
         return coffee
     
-    def get_coffee_by_name(self, coffee_name: str) -> Optional[Dict[str, Any]]:
+    @timed("db.get_coffee_by_name")
+    def get_coffee_by_name(self, coffee_name: str,
+                           projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         Get a coffee by its name.
         
         Args:
             coffee_name: Name of the coffee
+            projection: Optional MongoDB projection
             
         Returns:
             Coffee dictionary or None if not found
         """
-        coffee = self.collection.find_one({"coffee_name": coffee_name})
+        coffee = self.collection.find_one({"coffee_name": coffee_name}, projection)
         if coffee:
             coffee["_id"] = str(coffee["_id"])
         return coffee
     
+    @timed("db.get_coffee_with_query")
     def get_coffee_with_query(self, query_dict: Dict[str, Any], 
-                            case_sensitive: bool = False) -> List[Dict[str, Any]]:
+                            case_sensitive: bool = False, match: Optional[MatchSpec] = None,
+                            ratio_min: Optional[float] = None, ratio_max: Optional[float] = None,
+                            projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                            skip: int = 0, sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
         """
         Get coffees using a flexible query dictionary with multiple key-value filters.
         
         Args:
             query_dict: Dictionary with field names as keys and target values as values
                        Example: {"roasting_level": "Medium", "grinding_level": "Fine"}
-            case_sensitive: If False, uses case-insensitive regex matching
+            case_sensitive: If False, values are matched case-insensitively
+            match: "exact", "prefix" or "contains", or a dictionary of modes per
+                   field. Defaults to "exact" when case_sensitive is True and
+                   "contains" otherwise. "exact" and "prefix" use indexes;
+                   "contains" scans the collection.
+            ratio_min: Minimum grams of water per gram of coffee (e.g. 15 for "1:15")
+            ratio_max: Maximum grams of water per gram of coffee
+            projection: Optional MongoDB projection, applied on the server
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
             
         Returns:
             List of matching coffee dictionaries
@@ -130,46 +997,110 @@ class CoffeeDataManager:
             
             # Find coffees with high bitterness in tasting notes
             manager.get_coffee_with_query({"tasting_notes": "Bitterness: High"})
+            
+            # Indexed lookup on the parsed tasting profile
+            manager.get_coffee_with_query({"sourness": "Low"}, match="exact")
+            
+            # Index-friendly lookup of names starting with "ethiopian" (any case)
+            manager.get_coffee_with_query({"coffee_name": "ethiopian"}, match="prefix")
+            
+            # Strongest brews between 1:15 and 1:17
+            manager.get_coffee_with_query({}, ratio_min=15, ratio_max=17,
+                                          sort=[("ratio_water_per_gram", 1)])
+            
+            # Fetch only names of the 10 newest medium roasts
+            manager.get_coffee_with_query({"roasting_level": "Medium"},
+                                          projection={"coffee_name": 1},
+                                          limit=10, sort=[("created_at", -1)])
         """
-        query = {}
+        return list(self.iter_query(query_dict, case_sensitive=case_sensitive, match=match,
+                                    ratio_min=ratio_min, ratio_max=ratio_max,
+                                    projection=projection, limit=limit, skip=skip, sort=sort))
+    
+    def iter_query(self, query_dict: Dict[str, Any], case_sensitive: bool = False,
+                   match: Optional[MatchSpec] = None,
+                   ratio_min: Optional[float] = None, ratio_max: Optional[float] = None,
+                   batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+                   projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                   skip: int = 0, sort: Optional[SortSpec] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream coffees matching a query dictionary from a server-side cursor.
         
-        for key, value in query_dict.items():
-            if value is not None:
-                if case_sensitive:
-                    # Exact match
-                    query[key] = value
-                else:
-                    # Case-insensitive regex match
-                    query[key] = {"$regex": str(value), "$options": "i"}
+        Accepts the same filters as get_coffee_with_query() without materializing
+        the result list.
         
-        coffees = list(self.collection.find(query))
-        for coffee in coffees:
-            coffee["_id"] = str(coffee["_id"])
-        return coffees
+        Args:
+            query_dict: Dictionary with field names as keys and target values as values
+            case_sensitive: If False, values are matched case-insensitively
+            match: "exact", "prefix" or "contains" (see get_coffee_with_query())
+            ratio_min: Minimum grams of water per gram of coffee
+            ratio_max: Maximum grams of water per gram of coffee
+            batch_size: Number of documents fetched per cursor round trip
+            projection: Optional MongoDB projection
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
+            
+        Yields:
+            Matching coffee dictionaries with "_id" converted to str
+        """
+        return self._iter_cursor(self._build_query(query_dict, case_sensitive, match, ratio_min, ratio_max),
+                                 batch_size=batch_size, projection=projection,
+                                 limit=limit, skip=skip, sort=sort)
     
+    @timed("db.text_search")
+    def text_search(self, query: str, limit: int = 10,
+                    projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Ranked keyword search over coffee names and tasting notes.
+        
+        Uses the "coffee_text" index from ensure_indexes(), so unlike "contains"
+        matching it does not scan the collection. Words are stemmed and matched
+        case-insensitively; any word may match, and "quoted phrases" or -excluded
+        words are supported. Name matches weigh twice as much as tasting notes.
+        
+        Args:
+            query: Search words, e.g. "caramel and spice"
+            limit: Maximum number of documents to return (0 means no limit)
+            projection: Optional MongoDB projection
+            
+        Returns:
+            List of coffee dictionaries, most relevant first, each with a "score"
+        """
+        text_query, text_projection = self._text_search_query(query, projection)
+        return list(self._iter_cursor(text_query, projection=text_projection, limit=limit, sort=TEXT_SCORE_SORT))
+    
+    @timed("db.search_coffees")
     def search_coffees(self, roasting_level: Optional[str] = None, 
-                      grinding_level: Optional[str] = None) -> List[Dict[str, Any]]:
+                      grinding_level: Optional[str] = None, match: str = "contains",
+                      ratio_min: Optional[float] = None, ratio_max: Optional[float] = None,
+                      projection: Optional[Dict[str, Any]] = None, limit: int = 0,
+                      skip: int = 0, sort: Optional[SortSpec] = None) -> List[Dict[str, Any]]:
         """
         Search for coffees by roasting level and/or grinding level.
         
         Args:
             roasting_level: Filter by roasting level
             grinding_level: Filter by grinding level
+            match: "exact", "prefix" or "contains" (case-insensitive in every mode)
+            ratio_min: Minimum grams of water per gram of coffee
+            ratio_max: Maximum grams of water per gram of coffee
+            projection: Optional MongoDB projection
+            limit: Maximum number of documents to return (0 means no limit)
+            skip: Number of documents to skip
+            sort: Optional list of (field, direction) pairs
             
         Returns:
             List of matching coffee dictionaries
         """
-        query = {}
-        if roasting_level:
-            query["roasting_level"] = {"$regex": roasting_level, "$options": "i"}
-        if grinding_level:
-            query["grinding_level"] = {"$regex": grinding_level, "$options": "i"}
+        query = self._build_query({
+            "roasting_level": roasting_level or None,
+            "grinding_level": grinding_level or None
+        }, case_sensitive=False, match=match, ratio_min=ratio_min, ratio_max=ratio_max)
         
-        coffees = list(self.collection.find(query))
-        for coffee in coffees:
-            coffee["_id"] = str(coffee["_id"])
-        return coffees
+        return list(self._iter_cursor(query, projection=projection, limit=limit, skip=skip, sort=sort))
     
+    @timed("db.update_coffee")
     def update_coffee(self, coffee_id: str, **updates) -> bool:
         """
         Update a coffee entry.
@@ -181,13 +1112,25 @@ class CoffeeDataManager:
         Returns:
             True if updated successfully, False otherwise
         """
+        updates.update(self._derived_fields(updates))
         updates["updated_at"] = datetime.now()
         result = self.collection.update_one(
             {"_id": ObjectId(coffee_id)},
             {"$set": updates}
         )
+        if result.modified_count:
+            version = self._bump_data_version()
+            if self.semantic_index is not None:
+                from semantic_index import INDEXED_FIELDS
+                if any(field in updates for field in INDEXED_FIELDS):
+                    coffee = self.collection.find_one({"_id": ObjectId(coffee_id)},
+                                                      {field: 1 for field in INDEXED_FIELDS})
+                    self._index_coffees([coffee] if coffee else [], version)
+                else:
+                    self.semantic_index.record_version(version)
         return result.modified_count > 0
     
+    @timed("db.delete_coffee")
     def delete_coffee(self, coffee_id: str) -> bool:
         """
         Delete a coffee entry.
@@ -199,8 +1142,48 @@ class CoffeeDataManager:
             True if deleted successfully, False otherwise
         """
         result = self.collection.delete_one({"_id": ObjectId(coffee_id)})
+        if result.deleted_count:
+            version = self._bump_data_version()
+            if self.semantic_index is not None:
+                self.semantic_index.remove(coffee_id, version)
         return result.deleted_count > 0
     
+    @timed("db.semantic_search")
+    def semantic_search(self, text: str, k: int = 10, projection: Optional[Dict[str, Any]] = None,
+                        min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Find the coffees whose name and tasting notes are most similar to free text.
+        
+        Unlike get_coffee_with_query(), which matches substrings, this ranks by
+        cosine similarity, so "something like a jammy berry cup" finds coffees
+        with notes such as "blueberry jam". Opens the semantic index on first use,
+        and refreshes or rebuilds it whenever data_version() has moved on (for
+        example after writes from another process).
+        
+        Args:
+            text: Free-text description
+            k: Maximum number of coffees to return
+            projection: Optional MongoDB projection
+            min_score: Only return coffees with a similarity above this
+            
+        Returns:
+            List of coffee dictionaries, most similar first, each with a "similarity" score
+        """
+        if self.semantic_index is None:
+            self.enable_semantic_index()
+        else:
+            self._sync_semantic_index(self.semantic_index)
+        hits = self.semantic_index.search(text, k, min_score)
+        coffees = {coffee["_id"]: coffee for coffee in self.get_coffees_by_ids([coffee_id for coffee_id, _ in hits],
+                                                                                projection=projection)}
+        results = []
+        for coffee_id, score in hits:
+            if coffee_id in coffees:
+                coffees[coffee_id]["similarity"] = score
+                results.append(coffees[coffee_id])
+        return results
+    
+    @timed("db.get_stats")
     def get_stats(self) -> Dict[str, Any]:
         """
         Get basic statistics about the coffee collection.
@@ -208,20 +1191,53 @@ class CoffeeDataManager:
         Returns:
             Dictionary with collection statistics
         """
-        total = self.collection.count_documents({})
-        roasting_levels = self.collection.distinct("roasting_level")
-        grinding_levels = self.collection.distinct("grinding_level")
+        return self._get_stats_summary(self.aggregate_stats(group_by=["roasting_level", "grinding_level"]))
+    
+    @timed("db.aggregate_stats")
+    def aggregate_stats(self, query_dict: Optional[Dict[str, Any]] = None,
+                        group_by: Optional[List[str]] = None, case_sensitive: bool = False,
+                        match: Optional[MatchSpec] = None,
+                        include_total: bool = False) -> Dict[str, Any]:
+        """
+        Compute counts and value distributions on the server in one aggregation.
         
-        return {
-            "total_coffees": total,
-            "roasting_levels": roasting_levels,
-            "grinding_levels": grinding_levels
-        }
+        The filter runs as a leading $match (so it can use indexes), then a $facet
+        counts the matching documents and groups them by each requested field.
+        
+        Args:
+            query_dict: Optional filters, in the same form as get_coffee_with_query()
+            group_by: Fields to build distributions for, e.g. ["roasting_level", "profile.sourness"]
+            case_sensitive: If False, values are matched case-insensitively
+            match: Match mode(s), see get_coffee_with_query()
+            include_total: If True, also report the collection size (from collection metadata)
+            
+        Returns:
+            Dictionary with "matching_coffees", plus "distributions" and "percentages"
+            keyed by field and value (largest groups first)
+            
+        Example:
+            # Roast distribution of Ethiopian coffees
+            manager.aggregate_stats({"coffee_name": "Ethiopian"}, group_by=["roasting_level"],
+                                    match="prefix")
+        """
+        group_by = group_by or []
+        pipeline = self._stats_pipeline(query_dict, group_by, case_sensitive, match)
+        stats = self._parse_stats_result(next(self.collection.aggregate(pipeline), {}), group_by)
+        if include_total:
+            stats["total_coffees"] = self.collection.estimated_document_count()
+        return stats
     
     def close(self):
-        """Close the MongoDB connection."""
-        self.client.close()
-        print("Connection closed")
+        """Release the shared MongoDB client, closing it if no other manager uses it."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.catalog_cache is not None:
+            self.catalog_cache.stop()
+        if client_registry.release(self.client):
+            print("Connection closed")
+        else:
+            print("Connection released")
 
 
 # Example usage
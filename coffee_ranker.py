@@ -0,0 +1,169 @@
+"""
+Coffee Ranker - Scores catalog entries against extracted user preferences, locally.
+
+Replaces the LLM round trip that used to pick relevant experiments from the
+catalog: each preference found by SammyTheSpartanBarista._extract_preferences_from_query()
+adds a weighted amount to a coffee's score, and the top-k coffees are returned.
+"""
+
+import heapq
+from typing import List, Dict, Optional, Any, Tuple
+
+
+# Points a coffee earns for a full match on each preference
+RANKING_WEIGHTS = {
+    "origin": 3.0,
+    "roasting_level": 3.0,
+    "grinding_level": 2.0,
+    "bitterness": 2.0,
+    "sourness": 2.0,
+    "flavor_notes": 2.0,
+    "brewing_method": 1.0,
+    "brew_strength": 1.0
+}
+
+# Fields a catalog entry needs for scoring
+RANKING_PROJECTION = {
+    "coffee_name": 1,
+    "roasting_level": 1,
+    "grinding_level": 1,
+    "tasting_notes": 1,
+    "profile": 1,
+    "ratio_water_per_gram": 1
+}
+
+# Name fragments identifying each origin preference
+ORIGIN_KEYWORDS = {
+    "Ethiopian": ("ethiopia", "yirgacheffe", "sidamo", "guji"),
+    "Colombian": ("colombia",),
+    "Kenyan": ("kenya",)
+}
+
+# Tasting note words identifying each flavor preference
+FLAVOR_KEYWORDS = {
+    "Chocolate/Nutty": ("chocolate", "cocoa", "nut", "caramel"),
+    "Fruity/Citrus": ("fruit", "citrus", "berry", "lemon", "orange", "bright"),
+    "Floral": ("floral", "jasmine", "flower", "delicate")
+}
+
+# Grinding level suited to each brewing method preference
+BREWING_METHOD_GRINDS = {
+    "Espresso": "fine",
+    "Pour Over": "medium",
+    "French Press": "coarse"
+}
+
+# Ordered tasting profile levels, for partial credit on neighbouring levels
+PROFILE_LEVELS = ("low", "medium", "high")
+
+
+def _level_score(preferred: str, actual: Optional[str]) -> float:
+    """1.0 for the same level, 0.5 when actual only contains it (e.g. "Medium-Dark" for "Dark")."""
+    if not actual:
+        return 0.0
+    preferred = preferred.lower()
+    actual = actual.lower()
+    if actual == preferred:
+        return 1.0
+    if preferred in actual.replace("-", " ").split():
+        return 0.5
+    return 0.0
+
+
+def _profile_score(preferred: str, actual: Optional[str]) -> float:
+    """1.0 for the same profile level, 0.5 for a neighbouring one."""
+    preferred = preferred.lower()
+    if actual not in PROFILE_LEVELS or preferred not in PROFILE_LEVELS:
+        return 0.0
+    distance = abs(PROFILE_LEVELS.index(actual) - PROFILE_LEVELS.index(preferred))
+    return max(0.0, 1.0 - distance / 2)
+
+
+def _ratio_bounds(coffees: List[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    """Smallest and largest water-per-gram ratio in the catalog, or None if there are none."""
+    ratios = [coffee["ratio_water_per_gram"] for coffee in coffees
+              if coffee.get("ratio_water_per_gram") is not None]
+    return (min(ratios), max(ratios)) if ratios else None
+
+
+def score_coffee(preferences: Dict[str, str], coffee: Dict[str, Any],
+                 ratio_bounds: Optional[Tuple[float, float]] = None) -> float:
+    """
+    Score one coffee against the extracted preferences.
+
+    Args:
+        preferences: Preferences from _extract_preferences_from_query()
+        coffee: Catalog entry with the RANKING_PROJECTION fields
+        ratio_bounds: (min, max) water-per-gram ratio across the catalog, for brew strength
+
+    Returns:
+        float: Weighted match score (0 means no preference matched)
+    """
+    score = 0.0
+    name = (coffee.get("coffee_name") or "").lower()
+    notes = (coffee.get("tasting_notes") or "").lower()
+    profile = coffee.get("profile") or {}
+
+    if "origin" in preferences:
+        keywords = ORIGIN_KEYWORDS.get(preferences["origin"], (preferences["origin"].lower(),))
+        if any(keyword in name for keyword in keywords):
+            score += RANKING_WEIGHTS["origin"]
+
+    if "roasting_level" in preferences:
+        score += RANKING_WEIGHTS["roasting_level"] * _level_score(preferences["roasting_level"],
+                                                                  coffee.get("roasting_level"))
+
+    if "grinding_level" in preferences:
+        score += RANKING_WEIGHTS["grinding_level"] * _level_score(preferences["grinding_level"],
+                                                                  coffee.get("grinding_level"))
+
+    for attribute in ("bitterness", "sourness"):
+        if attribute in preferences:
+            score += RANKING_WEIGHTS[attribute] * _profile_score(preferences[attribute], profile.get(attribute))
+
+    if "flavor_notes" in preferences:
+        if any(keyword in notes for keyword in FLAVOR_KEYWORDS.get(preferences["flavor_notes"], ())):
+            score += RANKING_WEIGHTS["flavor_notes"]
+
+    if "brewing_method" in preferences and preferences["brewing_method"] in BREWING_METHOD_GRINDS:
+        score += RANKING_WEIGHTS["brewing_method"] * _level_score(BREWING_METHOD_GRINDS[preferences["brewing_method"]],
+                                                                  coffee.get("grinding_level"))
+
+    ratio = coffee.get("ratio_water_per_gram")
+    if "brew_strength" in preferences and ratio is not None and ratio_bounds and ratio_bounds[1] > ratio_bounds[0]:
+        # 1.0 at the strongest (least water) end of the catalog for "Strong", at the mildest for "Mild"
+        position = (ratio - ratio_bounds[0]) / (ratio_bounds[1] - ratio_bounds[0])
+        strength = 1.0 - position if preferences["brew_strength"] == "Strong" else position
+        score += RANKING_WEIGHTS["brew_strength"] * strength
+
+    return score
+
+
+def rank_coffees(preferences: Dict[str, str], coffees: List[Dict[str, Any]],
+                 k: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Pick the k coffees that best match the preferences.
+
+    Coffees scoring 0 are never returned. Ties are broken by coffee name and
+    then ID, so the ranking is deterministic.
+
+    Args:
+        preferences: Preferences from _extract_preferences_from_query()
+        coffees: Catalog entries with the RANKING_PROJECTION fields
+        k: Maximum number of coffees to return
+
+    Returns:
+        List of (score, coffee) pairs, best first
+    """
+    if not preferences:
+        return []
+
+    ratio_bounds = _ratio_bounds(coffees) if "brew_strength" in preferences else None
+    scored = []
+    for coffee in coffees:
+        score = score_coffee(preferences, coffee, ratio_bounds)
+        if score > 0:
+            scored.append((score, coffee))
+
+    return heapq.nsmallest(k, scored, key=lambda item: (-item[0], item[1].get("coffee_name") or "",
+                                                        str(item[1].get("_id", ""))))
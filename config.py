@@ -13,4 +13,3 @@ DEFAULT_MODEL = "openai/gpt-3.5-turbo"
 MONGODB_URL = "mongodb://localhost:27017/"
 MONGODB_DATABASE = "coffee_db"
 MONGODB_COLLECTION = "coffees"
-ß
\ No newline at end of file
@@ -18,36 +18,41 @@ def check_ethiopian_medium_roast():
     manager = CoffeeDataManager()
     
     try:
-        # Get all coffees from the database
-        print("Retrieving all coffee entries...")
-        all_coffees = manager.get_all_coffees()
+        # Count and group Ethiopian coffees on the server in a single aggregation
+        print("Aggregating Ethiopian coffee statistics...")
+        stats = manager.aggregate_stats(
+            {"coffee_name": "Ethiopian"},
+            group_by=["roasting_level"],
+            case_sensitive=True,
+            match="prefix",
+            include_total=True
+        )
+        total_coffees = stats["total_coffees"]
+        ethiopian_coffees = stats["matching_coffees"]
+        roasting_levels = stats["distributions"]["roasting_level"]
         
-        # Filter for Ethiopian coffees
-        print("Filtering for Ethiopian coffees...")
-        ethiopian_coffees = [
-            coffee for coffee in all_coffees 
-            if "Ethiopian" in coffee['coffee_name']
-        ]
-        
-        # Filter for medium roast Ethiopian coffees
-        print("Filtering for medium roast Ethiopian coffees...")
-        ethiopian_medium_roast = [
-            coffee for coffee in ethiopian_coffees 
-            if coffee['roasting_level'] == "Medium"
-        ]
+        # Fetch details only for the medium roast Ethiopian coffees
+        print("Retrieving Ethiopian medium roast coffees...")
+        ethiopian_medium_roast = manager.get_coffee_with_query(
+            {"coffee_name": "Ethiopian", "roasting_level": "Medium"},
+            case_sensitive=True,
+            match={"coffee_name": "prefix", "roasting_level": "exact"},
+            projection={"coffee_name": 1, "roasting_level": 1, "grinding_level": 1,
+                        "brewing_ratio": 1, "tasting_notes": 1}
+        )
         
         # Display results
         print("\n" + "="*60)
         print("ETHIOPIAN COFFEE ANALYSIS")
         print("="*60)
         
-        print(f"Total coffees in database: {len(all_coffees)}")
-        print(f"Total Ethiopian coffees: {len(ethiopian_coffees)}")
+        print(f"Total coffees in database: {total_coffees}")
+        print(f"Total Ethiopian coffees: {ethiopian_coffees}")
         print(f"Ethiopian medium roast coffees: {len(ethiopian_medium_roast)}")
         
         if ethiopian_medium_roast:
             print(f"\nPercentage of Ethiopian coffees that are medium roasted: "
-                  f"{(len(ethiopian_medium_roast) / len(ethiopian_coffees) * 100):.1f}%")
+                  f"{(len(ethiopian_medium_roast) / ethiopian_coffees * 100):.1f}%")
         
         # Show details of Ethiopian medium roast coffees
         if ethiopian_medium_roast:
@@ -70,22 +75,17 @@ def check_ethiopian_medium_roast():
             print("ROASTING LEVEL DISTRIBUTION FOR ETHIOPIAN COFFEES:")
             print("-" * 50)
             
-            roasting_levels = {}
-            for coffee in ethiopian_coffees:
-                level = coffee['roasting_level']
-                roasting_levels[level] = roasting_levels.get(level, 0) + 1
-            
-            for level, count in sorted(roasting_levels.items()):
-                percentage = (count / len(ethiopian_coffees)) * 100
+            for level, count in sorted(roasting_levels.items(), key=lambda item: str(item[0])):
+                percentage = stats["percentages"]["roasting_level"][level]
                 print(f"{level}: {count} coffees ({percentage:.1f}%)")
         
         # Return summary data
         return {
-            "total_coffees": len(all_coffees),
-            "ethiopian_coffees": len(ethiopian_coffees),
+            "total_coffees": total_coffees,
+            "ethiopian_coffees": ethiopian_coffees,
             "ethiopian_medium_roast": len(ethiopian_medium_roast),
-            "ethiopian_medium_roast_percentage": (len(ethiopian_medium_roast) / len(ethiopian_coffees) * 100) if ethiopian_coffees else 0,
-            "roasting_distribution": roasting_levels if ethiopian_coffees else {},
+            "ethiopian_medium_roast_percentage": (len(ethiopian_medium_roast) / ethiopian_coffees * 100) if ethiopian_coffees else 0,
+            "roasting_distribution": roasting_levels,
             "ethiopian_medium_roast_details": ethiopian_medium_roast
         }
         
@@ -122,44 +122,40 @@ def generate_coffee_examples(manager):
         "with creamy coconut milk", "with fresh peach notes", "with rich dark chocolate cake"
     ]
     
+    def coffee_records():
+        """Yield 400 generated coffee records."""
+        for i in range(400):
+            # Select random coffee type
+            coffee_type = random.choice(coffee_types)
+            
+            # Generate variant name
+            variant_num = (i // 40) + 1
+            coffee_name = f"{coffee_type['name']} - Batch {variant_num:03d}"
+            
+            # Create tasting notes with bitterness and sourness
+            flavor_enhancer = random.choice(flavor_enhancers)
+            tasting_notes = f"{coffee_type['base_notes']}, {flavor_enhancer}. "
+            tasting_notes += f"Bitterness: {coffee_type['bitterness_level']}. "
+            tasting_notes += f"Sourness: {coffee_type['sourness_level']}."
+            
+            yield {
+                "coffee_name": coffee_name,
+                "roasting_level": random.choice(coffee_type['roasting_levels']),
+                "grinding_level": random.choice(coffee_type['grinding_levels']),
+                "brewing_ratio": random.choice(coffee_type['brewing_ratios']),
+                "tasting_notes": tasting_notes
+            }
+    
     print("=== Adding 400 Coffee Examples ===")
     
-    for i in range(400):
-        # Select random coffee type
-        coffee_type = random.choice(coffee_types)
-        
-        # Generate variant name
-        variant_num = (i // 40) + 1
-        coffee_name = f"{coffee_type['name']} - Batch {variant_num:03d}"
-        
-        # Select random attributes
-        roasting_level = random.choice(coffee_type['roasting_levels'])
-        grinding_level = random.choice(coffee_type['grinding_levels'])
-        brewing_ratio = random.choice(coffee_type['brewing_ratios'])
-        
-        # Create tasting notes with bitterness and sourness
-        flavor_enhancer = random.choice(flavor_enhancers)
-        tasting_notes = f"{coffee_type['base_notes']}, {flavor_enhancer}. "
-        tasting_notes += f"Bitterness: {coffee_type['bitterness_level']}. "
-        tasting_notes += f"Sourness: {coffee_type['sourness_level']}."
-        
-        # Add the coffee
-        try:
-            manager.add_coffee(
-                coffee_name=coffee_name,
-                roasting_level=roasting_level,
-                grinding_level=grinding_level,
-                brewing_ratio=brewing_ratio,
-                tasting_notes=tasting_notes
-            )
-            
-            if (i + 1) % 50 == 0:
-                print(f"Added {i + 1} coffees...")
-                
-        except Exception as e:
-            print(f"Error adding coffee {i + 1}: {e}")
+    # Stream the generated records into the database in batches
+    result = manager.bulk_add_coffees(coffee_records(), batch_size=100)
+    
+    for error in result['errors']:
+        print(f"Error in batch {error['batch']}: {error['error']}")
     
-    print(f"Successfully added 400 coffee examples!")
+    print(f"Successfully added {result['inserted_count']} coffee examples "
+          f"({result['docs_per_second']:.0f} docs/s)")
 
 
 def main():
@@ -175,8 +171,8 @@ def main():
         
         # Display sample of coffees (first 10)
         print("\n=== Sample of Coffees in Database (First 10) ===")
-        all_coffees = manager.get_all_coffees()
-        for i, coffee in enumerate(all_coffees[:10], 1):
+        sample_coffees = manager.get_all_coffees(limit=10)
+        for i, coffee in enumerate(sample_coffees, 1):
             print(f"{i}. {coffee['coffee_name']}")
             print(f"   Roasting Level: {coffee['roasting_level']}")
             print(f"   Grinding Level: {coffee['grinding_level']}")
@@ -192,20 +188,20 @@ def main():
         
         # Search for high bitterness coffees
         print("\n=== High Bitterness Coffees (Sample) ===")
-        high_bitter_coffees = [coffee for coffee in all_coffees if "Bitterness: High" in coffee['tasting_notes']]
-        for coffee in high_bitter_coffees[:5]:  # Show first 5
+        high_bitter_coffees = manager.get_coffee_with_query({"bitterness": "High"}, match="exact", limit=5)
+        for coffee in high_bitter_coffees:
             print(f"- {coffee['coffee_name']}: {coffee['tasting_notes'][:100]}...")
         
         # Search for high sourness coffees
         print("\n=== High Sourness Coffees (Sample) ===")
-        high_sour_coffees = [coffee for coffee in all_coffees if "Sourness: High" in coffee['tasting_notes']]
-        for coffee in high_sour_coffees[:5]:  # Show first 5
+        high_sour_coffees = manager.get_coffee_with_query({"sourness": "High"}, match="exact", limit=5)
+        for coffee in high_sour_coffees:
             print(f"- {coffee['coffee_name']}: {coffee['tasting_notes'][:100]}...")
         
         # Search for low bitterness and low sourness coffees
         print("\n=== Low Bitterness & Low Sourness Coffees (Sample) ===")
-        mild_coffees = [coffee for coffee in all_coffees if "Bitterness: Low" in coffee['tasting_notes'] and "Sourness: Low" in coffee['tasting_notes']]
-        for coffee in mild_coffees[:5]:  # Show first 5
+        mild_coffees = manager.get_coffee_with_query({"bitterness": "Low", "sourness": "Low"}, match="exact", limit=5)
+        for coffee in mild_coffees:
             print(f"- {coffee['coffee_name']}: {coffee['tasting_notes'][:100]}...")
         
         # Get a specific coffee by name
@@ -240,31 +236,15 @@ def main():
         
         # Additional statistics about bitterness and sourness
         print("\n=== Bitterness & Sourness Analysis ===")
-        bitterness_counts = {}
-        sourness_counts = {}
-        
-        for coffee in all_coffees:
-            # Extract bitterness level
-            if "Bitterness: Very Low" in coffee['tasting_notes']:
-                bitterness_counts["Very Low"] = bitterness_counts.get("Very Low", 0) + 1
-            elif "Bitterness: Low" in coffee['tasting_notes']:
-                bitterness_counts["Low"] = bitterness_counts.get("Low", 0) + 1
-            elif "Bitterness: Medium-Low" in coffee['tasting_notes']:
-                bitterness_counts["Medium-Low"] = bitterness_counts.get("Medium-Low", 0) + 1
-            elif "Bitterness: Medium" in coffee['tasting_notes']:
-                bitterness_counts["Medium"] = bitterness_counts.get("Medium", 0) + 1
-            elif "Bitterness: High" in coffee['tasting_notes']:
-                bitterness_counts["High"] = bitterness_counts.get("High", 0) + 1
-            
-            # Extract sourness level
-            if "Sourness: Low" in coffee['tasting_notes']:
-                sourness_counts["Low"] = sourness_counts.get("Low", 0) + 1
-            elif "Sourness: Medium" in coffee['tasting_notes']:
-                sourness_counts["Medium"] = sourness_counts.get("Medium", 0) + 1
-            elif "Sourness: Medium-High" in coffee['tasting_notes']:
-                sourness_counts["Medium-High"] = sourness_counts.get("Medium-High", 0) + 1
-            elif "Sourness: High" in coffee['tasting_notes']:
-                sourness_counts["High"] = sourness_counts.get("High", 0) + 1
+        profile_stats = manager.aggregate_stats(group_by=["profile.bitterness", "profile.sourness"])
+        bitterness_counts = {
+            (level or "unknown").title(): count
+            for level, count in profile_stats["distributions"]["profile.bitterness"].items()
+        }
+        sourness_counts = {
+            (level or "unknown").title(): count
+            for level, count in profile_stats["distributions"]["profile.sourness"].items()
+        }
         
         print("Bitterness distribution:")
         for level, count in sorted(bitterness_counts.items()):
@@ -0,0 +1,158 @@
+"""
+Preference Matcher - Extracts coffee preferences from free-text questions.
+
+The keyword vocabulary below is compiled once into a single regular expression
+that finds every keyword occurring as a whole word ("press" no longer matches
+inside "espresso"), optionally inflected ("darker", "finer", "chocolatey").
+Results are memoized per lowercased query.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Dict, FrozenSet, Tuple
+
+
+# Number of distinct queries whose extracted preferences are memoized
+PREFERENCE_CACHE_SIZE = 4096
+
+# Endings accepted after a keyword: comparatives, superlatives and adjectives
+# ("darker", "boldest", "chocolatey"), with a bare "r"/"st" after a final "e" ("finer")
+INFLECTION_SUFFIX = r"(?:er|est|(?<=e)r|(?<=e)st|y)?"
+
+# For each preference, rules in priority order: (value, keywords, reasoning).
+# The first rule with a keyword in the query sets the preference.
+PREFERENCE_VOCABULARY = (
+    ("roasting_level", (
+        ("Light", ("light roast", "light", "blonde"),
+         "User mentioned 'light roast' or 'light' - indicating preference for light roasting level"),
+        ("Medium", ("medium roast", "medium"),
+         "User mentioned 'medium roast' or 'medium' - indicating preference for medium roasting level"),
+        ("Dark", ("dark roast", "dark", "bold"),
+         "User mentioned 'dark roast' or 'dark' - indicating preference for dark roasting level"),
+    )),
+    ("bitterness", (
+        ("Low", ("low bitterness", "not bitter", "smooth", "mild"),
+         "User mentioned 'low bitterness', 'smooth', or 'mild' - indicating preference for low bitterness"),
+        ("High", ("high bitterness", "bitter", "bitterness", "strong"),
+         "User mentioned 'high bitterness' or 'bitter' - indicating preference for high bitterness"),
+    )),
+    ("sourness", (
+        ("Low", ("low sourness", "not sour", "smooth", "mild"),
+         "User mentioned 'low sourness' or 'not sour' - indicating preference for low sourness"),
+        ("High", ("high sourness", "sour", "sourness", "acidic"),
+         "User mentioned 'high sourness' or 'sour' - indicating preference for high sourness"),
+    )),
+    ("grinding_level", (
+        ("Fine", ("fine grind", "fine", "espresso"),
+         "User mentioned 'fine grind' or 'espresso' - indicating preference for fine grinding"),
+        ("Medium", ("medium grind", "medium grinding"),
+         "User mentioned 'medium grind' - indicating preference for medium grinding"),
+        ("Coarse", ("coarse grind", "coarse", "french press"),
+         "User mentioned 'coarse grind' or 'french press' - indicating preference for coarse grinding"),
+    )),
+    ("brewing_method", (
+        ("Pour Over", ("v60", "pour over", "chemex", "drip"),
+         "User mentioned 'V60', 'pour over', or 'Chemex' - indicating preference for pour over brewing"),
+        ("French Press", ("french press", "press"),
+         "User mentioned 'French press' - indicating preference for French press brewing"),
+        ("Espresso", ("espresso", "machine"),
+         "User mentioned 'espresso' - indicating preference for espresso brewing"),
+    )),
+    ("flavor_notes", (
+        ("Chocolate/Nutty", ("chocolate", "nutty", "nuts", "caramel"),
+         "User mentioned 'chocolate', 'nutty', or 'caramel' - indicating preference for chocolate/nutty flavors"),
+        ("Fruity/Citrus", ("fruity", "citrus", "berry", "berries", "bright"),
+         "User mentioned 'fruity', 'citrus', or 'berry' - indicating preference for fruity/citrus flavors"),
+        ("Floral", ("floral", "jasmine", "delicate"),
+         "User mentioned 'floral' or 'jasmine' - indicating preference for floral flavors"),
+    )),
+    ("brew_strength", (
+        ("Strong", ("stronger", "strong brew", "more concentrated", "watery"),
+         "User mentioned 'stronger' or 'watery' - indicating preference for a lower water-to-coffee ratio"),
+        ("Mild", ("weaker", "milder brew", "less strong", "too strong"),
+         "User mentioned 'weaker' or 'too strong' - indicating preference for a higher water-to-coffee ratio"),
+    )),
+    ("origin", (
+        ("Ethiopian", ("ethiopian", "ethiopia", "yirgacheffe"),
+         "User mentioned 'Ethiopian' or 'Yirgacheffe' - indicating preference for Ethiopian coffee"),
+        ("Colombian", ("colombian", "colombia"),
+         "User mentioned 'Colombian' - indicating preference for Colombian coffee"),
+        ("Kenyan", ("kenyan", "kenya"),
+         "User mentioned 'Kenyan' - indicating preference for Kenyan coffee"),
+    )),
+)
+
+
+def _compile_vocabulary(vocabulary) -> Tuple["re.Pattern", Dict[str, FrozenSet[Tuple[int, int]]]]:
+    """
+    Compile the vocabulary into one keyword regex plus, per keyword, the rules it triggers.
+
+    The regex reports the longest keyword starting at each word boundary,
+    allowing an INFLECTION_SUFFIX before the closing boundary. Each
+    keyword maps to the (preference, rule) positions of every keyword inside it
+    (e.g. "french press" also means "press"), so every keyword present as a
+    whole word is accounted for.
+    """
+    keywords = sorted({keyword for _, rules in vocabulary for _, words, _ in rules for keyword in words},
+                      key=len, reverse=True)
+    pattern = re.compile(r"\b(?=(" + "|".join(re.escape(keyword) for keyword in keywords) + r")"
+                         + INFLECTION_SUFFIX + r"\b)")
+    rules_by_keyword = {}
+    for preference_position, (_, rules) in enumerate(vocabulary):
+        for rule_position, (_, words, _) in enumerate(rules):
+            for word in words:
+                rules_by_keyword.setdefault(word, set()).add((preference_position, rule_position))
+
+    triggered = {}
+    for keyword in keywords:
+        contained = [other for other in keywords if re.search(r"\b" + re.escape(other) + r"\b", keyword)]
+        triggered[keyword] = frozenset(rule for other in contained for rule in rules_by_keyword[other])
+    return pattern, triggered
+
+
+_KEYWORD_PATTERN, _TRIGGERED_RULES = _compile_vocabulary(PREFERENCE_VOCABULARY)
+
+
+@lru_cache(maxsize=PREFERENCE_CACHE_SIZE)
+def _match_preferences(query_lower: str) -> Tuple[Tuple[Tuple[str, str], ...], Tuple[str, ...]]:
+    """Memoized extraction on a lowercased query, returning immutable results."""
+    # Earliest matching rule per preference
+    chosen = {}
+    for match in _KEYWORD_PATTERN.finditer(query_lower):
+        for preference_position, rule_position in _TRIGGERED_RULES[match.group(1)]:
+            if rule_position < chosen.get(preference_position, len(PREFERENCE_VOCABULARY[preference_position][1])):
+                chosen[preference_position] = rule_position
+
+    preferences = []
+    reasoning = []
+    for preference_position in sorted(chosen):
+        preference, rules = PREFERENCE_VOCABULARY[preference_position]
+        value, _, reason = rules[chosen[preference_position]]
+        preferences.append((preference, value))
+        reasoning.append(reason)
+    return tuple(preferences), tuple(reasoning)
+
+
+def extract_preferences(user_query: str) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Extract coffee preferences from a user query and explain each one.
+
+    Args:
+        user_query: Free-text question
+
+    Returns:
+        (preferences, reasoning): preference values keyed by name, e.g.
+        {"roasting_level": "Light"}, and one explanation per preference
+    """
+    preferences, reasoning = _match_preferences(user_query.lower())
+    return dict(preferences), list(reasoning)
+
+
+def cache_info():
+    """Return hit/miss statistics for the memoized extraction."""
+    return _match_preferences.cache_info()
+
+
+def clear_cache():
+    """Forget memoized extraction results."""
+    _match_preferences.cache_clear()
@@ -0,0 +1,116 @@
+"""
+Prompt Config - Loads Sammy's prompt configuration from sammy_prompts.py once per process.
+
+The file is found next to this module (not in the working directory), compiled
+and executed once, and the resulting configuration is cached. Every get() only
+stats the file; it is executed again when its modification time or size
+changes, so a resident server picks up prompt edits without restarting.
+"""
+
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+
+# Prompt file, resolved relative to this module so any working directory works
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sammy_prompts.py")
+
+# Used when the prompt file is missing, and for keys its SAMMY_PROMPTS (or DEFAULT_MODEL) does not define
+DEFAULT_PROMPTS = {
+    "role": "Expert Coffee Barista and Connoisseur",
+    "goal": "Provide expert coffee advice, recommendations, and analysis",
+    "backstory": "I am Sammy, a passionate and knowledgeable barista with years of experience in coffee roasting, brewing, and tasting. I help coffee enthusiasts find their perfect cup and understand the nuances of coffee.",
+    "system_message": "You are an expert barista with deep knowledge of coffee origins, roasting profiles, brewing methods, and flavor profiles. Always provide detailed, helpful, and accurate information about coffee.",
+    "verbose": True,
+    "max_iter": 3,
+    "DEFAULT_MODEL": "openai/gpt-3.5-turbo"
+}
+
+
+class PromptConfigLoader:
+    """
+    Thread-safe, cached loader for a prompt configuration file.
+
+    get() returns the same read-only mapping until the file changes, so callers
+    can compare results by identity to detect a reload. If an edited file fails
+    to execute, the last good configuration stays in use until the next change.
+    """
+
+    def __init__(self, path: str = PROMPTS_PATH):
+        """
+        Initialize the loader. Nothing is read until the first get().
+
+        Args:
+            path: Python file defining SAMMY_PROMPTS and DEFAULT_MODEL
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # (file stamp, configuration), replaced as a whole so get() can read it without the lock
+        self._state = None
+        self._metrics = {"loads": 0, "errors": 0}
+
+    def get(self) -> Mapping[str, Any]:
+        """
+        Return the current configuration, executing the file only if it changed.
+
+        Returns:
+            Read-only mapping of SAMMY_PROMPTS plus "DEFAULT_MODEL", over DEFAULT_PROMPTS
+        """
+        stamp = self._stamp()
+        state = self._state
+        if state is not None and state[0] == stamp:
+            return state[1]
+
+        with self._lock:
+            state = self._state
+            if state is None or state[0] != stamp:
+                state = (stamp, self._load(stamp, state[1] if state else None))
+                self._state = state
+            return state[1]
+
+    def reload(self) -> Mapping[str, Any]:
+        """Execute the file again even if it did not change, and return the new configuration."""
+        with self._lock:
+            self._state = None
+        return self.get()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return load and error counters and the stamp of the loaded file."""
+        state = self._state
+        return {**self._metrics, "path": self.path, "stamp": state[0] if state else None}
+
+    def _stamp(self) -> Optional[tuple]:
+        """(modification time, size) of the file, or None if it does not exist."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, stamp: Optional[tuple], previous: Optional[Mapping[str, Any]]) -> Mapping[str, Any]:
+        """Execute the prompt file, falling back to previous (or the defaults) on failure."""
+        if stamp is None:
+            print(f"Warning: {self.path} not found. Using default prompts.")
+            return MappingProxyType(dict(DEFAULT_PROMPTS))
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as prompt_file:
+                code = compile(prompt_file.read(), self.path, "exec")
+            namespace = {"__file__": self.path, "__name__": "sammy_prompts"}
+            exec(code, namespace)
+        except Exception as e:
+            self._metrics["errors"] += 1
+            print(f"Warning: could not load {self.path}: {e}. Keeping the previous prompts.")
+            return previous if previous is not None else MappingProxyType(dict(DEFAULT_PROMPTS))
+
+        config = {**DEFAULT_PROMPTS, **namespace.get("SAMMY_PROMPTS", {})}
+        config["DEFAULT_MODEL"] = namespace.get("DEFAULT_MODEL", DEFAULT_PROMPTS["DEFAULT_MODEL"])
+        self._metrics["loads"] += 1
+        if previous is not None:
+            print(f"Reloaded prompts from {self.path}")
+        return MappingProxyType(config)
+
+
+# Process-wide loader for sammy_prompts.py, shared by every agent
+prompt_loader = PromptConfigLoader()
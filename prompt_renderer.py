@@ -0,0 +1,183 @@
+"""
+Prompt Renderer - Compact tabular encoding of coffee experiments for task prompts.
+
+Experiments used to be pasted into prompts as a Python list of dicts, repeating
+every field name on every row. render_table() writes one header line and one
+pipe-delimited line per experiment instead, replaces roast and grind levels by
+short codes explained once in a legend, and drops the lowest-priority rows when
+the table would exceed a token budget.
+
+Tokens are counted with tiktoken's cl100k_base encoding when it is available
+(it ships with langchain-openai), and estimated from word pieces otherwise.
+"""
+
+import math
+import re
+import threading
+from typing import List, Dict, Optional, Any, Callable, Iterable, Tuple
+
+
+# Default token budget for one experiments table
+DEFAULT_TABLE_TOKEN_BUDGET = 2500
+
+# Columns rendered for experiments: (header, document field)
+EXPERIMENT_COLUMNS = (
+    ("experiment_id", "_id"),
+    ("coffee_name", "coffee_name"),
+    ("roasting_level", "roasting_level"),
+    ("grinding_level", "grinding_level"),
+    ("brewing_ratio", "brewing_ratio"),
+    ("tasting_notes", "tasting_notes"),
+)
+
+# Columns rendered for the experiments selected for a chat, referenced by database ID
+SELECTED_COLUMNS = (("database_id", "_id"),) + EXPERIMENT_COLUMNS[1:]
+
+# Columns rendered for the catalog the LLM picks experiments from
+CATALOG_COLUMNS = (
+    ("database_id", "_id"),
+    ("coffee_name", "coffee_name"),
+    ("roasting_level", "roasting_level"),
+    ("grinding_level", "grinding_level"),
+)
+
+# Fields whose few distinct values are replaced by short codes
+CODED_FIELDS = ("roasting_level", "grinding_level")
+
+# Written in place of a missing value
+MISSING_VALUE = "-"
+
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """Return the tiktoken encoder, or False if tiktoken or its encoding files are unavailable."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # Not installed, or the encoding cannot be downloaded
+                    _encoder = False
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens a model will see for text.
+
+    Args:
+        text: Rendered prompt text
+
+    Returns:
+        int: Exact cl100k_base count with tiktoken, otherwise an estimate of
+        one token per word piece of up to four characters
+    """
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text))
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PIECE.findall(text))
+
+
+def _cell(value: Any) -> str:
+    """Render one value on a single line without the column delimiter."""
+    if value is None or value == "":
+        return MISSING_VALUE
+    return " ".join(str(value).replace("|", "/").split())
+
+
+def level_codes(values: Iterable[str]) -> Dict[str, str]:
+    """
+    Assign a short code to each distinct value: its initials, numbered on collision.
+
+    Example:
+        level_codes(["Light", "Medium", "Medium-Dark"]) == {"Light": "L", "Medium": "M", "Medium-Dark": "MD"}
+    """
+    codes = {}
+    used = set()
+    for value in sorted(set(values)):
+        initials = "".join(word[0].upper() for word in re.findall(r"[A-Za-z0-9]+", value)) or "X"
+        code = initials
+        suffix = 2
+        while code in used:
+            code = f"{initials}{suffix}"
+            suffix += 1
+        codes[value] = code
+        used.add(code)
+    return codes
+
+
+def render_table(rows: List[Dict[str, Any]], columns: Tuple[Tuple[str, str], ...] = EXPERIMENT_COLUMNS,
+                 token_budget: Optional[int] = DEFAULT_TABLE_TOKEN_BUDGET,
+                 coded_fields: Tuple[str, ...] = CODED_FIELDS,
+                 counter: Callable[[str], int] = count_tokens) -> Dict[str, Any]:
+    """
+    Render documents as a compact pipe-delimited table.
+
+    Rows are kept in the given order, so pass them most relevant first: when the
+    table exceeds token_budget, rows are dropped from the end.
+
+    Args:
+        rows: Coffee documents (or any dictionaries holding the column fields)
+        columns: (header, field) pairs, in output order
+        token_budget: Maximum tokens for the whole table (None for no limit)
+        coded_fields: Fields rendered as codes with a legend line
+        counter: Function counting the tokens of a text
+
+    Returns:
+        Dictionary with "text" (the table), "tokens" (its token count), "rows"
+        (rows included) and "dropped" (rows left out to fit the budget)
+    """
+    cells = [[_cell(row.get(field)) for _, field in columns] for row in rows]
+
+    # Replace coded fields by short codes: (position, header, {value: code}) per coded column
+    coded_columns = []
+    for position, (header, field) in enumerate(columns):
+        if field not in coded_fields:
+            continue
+        codes = level_codes(line[position] for line in cells if line[position] != MISSING_VALUE)
+        if codes:
+            coded_columns.append((position, header, codes))
+            for line in cells:
+                line[position] = codes.get(line[position], line[position])
+
+    column_header = " | ".join(header for header, _ in columns)
+    used_codes = [set() for _ in coded_columns]
+    legend = []
+
+    # Line counts add up (each line ends at a newline), so rows are measured once each;
+    # the legend only explains codes of included rows and is re-measured when it grows
+    header_tokens = counter(column_header + "\n")
+    row_tokens = 0
+    row_lines = []
+    for line in cells:
+        row_line = " | ".join(line)
+        row_used = [used | {line[position]} if line[position] != MISSING_VALUE else used
+                    for used, (position, _, _) in zip(used_codes, coded_columns)]
+        row_legend, row_header_tokens = legend, header_tokens
+        if row_used != used_codes:
+            row_legend = [
+                f"{header} codes: " + ", ".join(f"{code}={value}" for value, code in codes.items() if code in used)
+                for used, (_, header, codes) in zip(row_used, coded_columns) if used
+            ]
+            row_header_tokens = counter("\n".join(row_legend + [column_header]) + "\n")
+
+        line_tokens = counter(row_line + "\n")
+        if token_budget is not None and row_header_tokens + row_tokens + line_tokens > token_budget:
+            break
+        used_codes, legend, header_tokens = row_used, row_legend, row_header_tokens
+        row_tokens += line_tokens
+        row_lines.append(row_line)
+
+    return {
+        "text": "\n".join(legend + [column_header] + row_lines),
+        "tokens": header_tokens + row_tokens,
+        "rows": len(row_lines),
+        "dropped": len(cells) - len(row_lines)
+    }
@@ -41,16 +41,16 @@ def demonstrate_query_functionality():
         for coffee in ratio_coffees[:3]:  # Show first 3
             print(f"   - {coffee['coffee_name']} ({coffee['brewing_ratio']})")
         
-        # Example 4: Query by tasting notes (bitterness)
+        # Example 4: Query by parsed tasting profile (bitterness)
         print("\n4. Find coffees with high bitterness:")
-        high_bitter = manager.get_coffee_with_query({"tasting_notes": "Bitterness: High"})
+        high_bitter = manager.get_coffee_with_query({"bitterness": "High"}, match="exact")
         print(f"   Found {len(high_bitter)} high bitterness coffees")
         for coffee in high_bitter[:3]:  # Show first 3
             print(f"   - {coffee['coffee_name']}")
         
-        # Example 5: Query by tasting notes (sourness)
+        # Example 5: Query by parsed tasting profile (sourness)
         print("\n5. Find coffees with high sourness:")
-        high_sour = manager.get_coffee_with_query({"tasting_notes": "Sourness: High"})
+        high_sour = manager.get_coffee_with_query({"sourness": "High"}, match="exact")
         print(f"   Found {len(high_sour)} high sourness coffees")
         for coffee in high_sour[:3]:  # Show first 3
             print(f"   - {coffee['coffee_name']}")
@@ -80,6 +80,20 @@ def demonstrate_query_functionality():
         print(f"   Fine grinding: {len(fine_coffees)} coffees")
         print(f"   Medium-Fine grinding: {len(medium_fine_coffees)} coffees")
         
+        # Example 9: Match modes
+        print("\n9. Exact, prefix and contains matching:")
+        exact = manager.get_coffee_with_query({"roasting_level": "medium"}, match="exact")
+        prefix = manager.get_coffee_with_query({"coffee_name": "kenya"}, match="prefix")
+        contains = manager.get_coffee_with_query({"roasting_level": "medium"}, match="contains")
+        print(f"   Exact 'medium' roast (indexed): {len(exact)} results")
+        print(f"   Names starting with 'kenya' (indexed): {len(prefix)} results")
+        print(f"   Roast containing 'medium' (collection scan): {len(contains)} results")
+        
+        # Example 10: Ranked keyword search
+        print("\n10. Text search for 'caramel and spice':")
+        for coffee in manager.text_search("caramel and spice", limit=5):
+            print(f"   {coffee['score']:.2f}  {coffee['coffee_name']}")
+        
         print("\n" + "="*60)
         print("QUERY DEMONSTRATION COMPLETE")
         print("="*60)
@@ -0,0 +1,238 @@
+"""
+Query Logger - Structured JSONL query log written by a background thread.
+
+Callers only put an event on a bounded queue; a writer thread serializes events,
+writes them in batches and rotates the file by size and age, gzip-compressing
+rotated files. When the queue is full, events are dropped (or the caller waits
+briefly, with the "block" policy) instead of slowing requests down.
+
+Several processes may log to the same directory. A lock file next to the log is
+held shared while a batch is appended (in a single write) and exclusively while
+the file is rotated, and a writer reopens the path whenever another process has
+rotated the file it holds. The lock file's modification time records when the
+active file was started, so age-based rotation also works across restarts.
+"""
+
+import contextlib
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+from sammy_metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is then only serialized within one process
+    fcntl = None
+
+
+# Rotation thresholds for the active log file
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_ROTATE_SECONDS = 24 * 60 * 60
+
+# Events buffered before the overflow policy applies, and events written per batch
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+
+# Seconds a buffered event may wait before it is written
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# What log() does when the queue is full: "drop" the event, or "block" up to BLOCK_TIMEOUT seconds first
+OVERFLOW_POLICIES = ("drop", "block")
+BLOCK_TIMEOUT = 1.0
+
+_STOP = object()
+
+
+class QueryLogger:
+    """Asynchronous, rotating JSONL logger."""
+
+    def __init__(self, directory: str = "logs", name: str = "sammy_queries",
+                 max_bytes: int = DEFAULT_MAX_BYTES, rotate_seconds: float = DEFAULT_ROTATE_SECONDS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, overflow: str = "drop"):
+        """
+        Open the log and start the writer thread.
+
+        Args:
+            directory: Directory for the active and rotated log files
+            name: File name stem; the active file is <name>.jsonl
+            max_bytes: Rotate once the active file reaches this size
+            rotate_seconds: Rotate once the active file is this old (None disables)
+            queue_size: Maximum number of events waiting to be written
+            batch_size: Maximum number of events per write
+            flush_interval: Seconds between writes when the queue is not full
+            overflow: "drop" or "block", see OVERFLOW_POLICIES
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self.lock_path = self.path + ".lock"
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._metrics = {"written": 0, "dropped": 0, "rotations": 0, "errors": 0}
+        self._drop_lock = threading.Lock()
+        self._closed = False
+
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="query-logger", daemon=True)
+        self._thread.start()
+
+    def log(self, event: Dict[str, Any]) -> bool:
+        """
+        Queue an event for writing. Never touches the disk.
+
+        Args:
+            event: JSON-serializable dictionary (non-JSON values are written with str())
+
+        Returns:
+            bool: False if the event was dropped because the queue was full
+        """
+        if self._closed:
+            return False
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            with self._drop_lock:
+                self._metrics["dropped"] += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return written/dropped/rotation counters and the current queue depth."""
+        return {**self._metrics, "queued": self._queue.qsize(), "path": self.path}
+
+    def close(self):
+        """Write every queued event, then stop the writer thread and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _open(self):
+        """Open the shared active file for appending, creating the lock file with it."""
+        # Unbuffered, so each batch is one append and lines from other processes never interleave
+        self._file = open(self.path, "ab", buffering=0)
+        if not os.path.exists(self.lock_path):
+            open(self.lock_path, "a").close()
+
+    def _held_file_is_current(self) -> bool:
+        """Whether the path still names the file we hold open (another process may have rotated it)."""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        held = os.fstat(self._file.fileno())
+        return (current.st_ino, current.st_dev) == (held.st_ino, held.st_dev)
+
+    def _due_for_rotation(self) -> bool:
+        """Whether the active file has reached max_bytes or rotate_seconds."""
+        if os.fstat(self._file.fileno()).st_size >= self.max_bytes:
+            return True
+        if self.rotate_seconds is None:
+            return False
+        try:
+            started = os.stat(self.lock_path).st_mtime
+        except FileNotFoundError:
+            return False
+        return time.time() - started >= self.rotate_seconds
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Hold the cross-process lock, shared to append or exclusive to rotate; closing the lock file releases it."""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _run(self):
+        """Writer loop: collect events into batches and write each batch at once."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                event = None
+
+            if event is _STOP:
+                self._write(batch)
+                self._file.close()
+                return
+            if event is not None:
+                batch.append(event)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch):
+        """Serialize and append a batch, rotating first if the file is due."""
+        if not batch:
+            return
+        with metrics.span("log.write"):
+            try:
+                if self._file.closed:
+                    self._open()  # A failed reopen after rotation is retried with every batch
+                if self._due_for_rotation():
+                    try:
+                        self._rotate()
+                    except OSError as e:
+                        # The batch still goes to the reopened active file
+                        self._metrics["errors"] += 1
+                        print(f"Error rotating query log: {e}")
+                data = "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in batch)
+                with self._file_lock(exclusive=False):
+                    if not self._held_file_is_current():
+                        self._file.close()
+                        self._open()
+                    self._file.write(data.encode("utf-8"))
+                self._metrics["written"] += len(batch)
+            except (OSError, TypeError, ValueError) as e:
+                self._metrics["errors"] += 1
+                print(f"Error writing query log: {e}")
+
+    def _rotate(self):
+        """Move the active file aside, gzip it and start a new one; the active file is reopened even on failure."""
+        held = os.fstat(self._file.fileno())
+        self._file.close()
+        try:
+            with self._file_lock(exclusive=True):
+                try:
+                    current = os.stat(self.path)
+                except FileNotFoundError:
+                    return
+                if (current.st_ino, current.st_dev) != (held.st_ino, held.st_dev):
+                    return  # Another process rotated it while we waited for the lock
+                rotated = None
+                if current.st_size > 0:
+                    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+                    rotated = os.path.join(self.directory, f"{self.name}-{stamp}.jsonl")
+                    os.replace(self.path, rotated)
+                # Restart the age clock for the next active file
+                os.utime(self.lock_path)
+            if rotated is not None:
+                with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(rotated)
+                self._metrics["rotations"] += 1
+        finally:
+            self._open()
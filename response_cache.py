@@ -0,0 +1,268 @@
+"""
+Response Cache - Caches LLM task outputs keyed by a fingerprint of the prompt.
+
+A cached response is reused only when the model, the fully rendered task
+description and the database version token all match, so answers are never
+served for a prompt or dataset they were not produced from.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# Defaults shared by the cache backends
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Inserts between recounts of the SQLite table, which other processes may also write to
+SQLITE_RECOUNT_INTERVAL = 100
+
+
+def prompt_fingerprint(model_name: str, task_description: str, data_version: str = "") -> str:
+    """
+    Build the cache key for an LLM task.
+
+    Args:
+        model_name: Model the task runs on
+        task_description: Fully rendered task description sent to the model
+        data_version: Token that changes whenever the underlying coffee data changes
+
+    Returns:
+        str: Hex SHA-256 digest of the three inputs
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, task_description, data_version):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache(ABC):
+    """Base class for response caches, tracking hit/miss metrics."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of responses kept; least recently used entries are evicted
+            ttl_seconds: Seconds a response stays valid (None means no expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from prompt_fingerprint()
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        with self._lock:
+            value = self._get(key)
+            self._metrics["hits" if value is not None else "misses"] += 1
+            return value
+
+    def set(self, key: str, value: str):
+        """
+        Store a response.
+
+        Args:
+            key: Cache key from prompt_fingerprint()
+            value: Response text
+        """
+        with self._lock:
+            self._set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters, the current size and the hit rate."""
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                **self._metrics,
+                "entries": self._size(),
+                "hit_rate": self._metrics["hits"] / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._clear()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """Return the live value for key, or None; called with the lock held."""
+
+    @abstractmethod
+    def _set(self, key: str, value: str):
+        """Store value under key and evict over max_entries; called with the lock held."""
+
+    @abstractmethod
+    def _size(self) -> int:
+        """Return the number of stored responses; called with the lock held."""
+
+    @abstractmethod
+    def _clear(self):
+        """Remove every stored response; called with the lock held."""
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU response cache."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries = OrderedDict()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if self._is_expired(created_at):
+            del self._entries[key]
+            self._metrics["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: str):
+        self._entries[key] = (value, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def _size(self) -> int:
+        return len(self._entries)
+
+    def _clear(self):
+        self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """On-disk response cache stored in a SQLite database, shared across processes and restarts."""
+
+    def __init__(self, path: str = "sammy_response_cache.sqlite3", max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        """
+        Initialize the cache, creating the database file if needed.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of responses kept; least recently used entries are evicted
+            ttl_seconds: Seconds a response stays valid (None means no expiry)
+        """
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._connection.commit()
+        # Row count tracked in memory so inserts do not count the table
+        self._entries = self._size()
+        self._inserts_since_count = 0
+        # Last access time of keys read since the last write, saved with the next insert
+        self._pending_access: Dict[str, float] = {}
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self._is_expired(created_at):
+            self._entries -= self._connection.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+            self._connection.commit()
+            self._pending_access.pop(key, None)
+            self._metrics["expirations"] += 1
+            return None
+        # Hits stay read-only; recency only matters when _set() evicts, which saves it first
+        self._pending_access[key] = time.time()
+        return value
+
+    def _save_access_times(self):
+        """Write the pending last-access times (in the caller's transaction)."""
+        if self._pending_access:
+            self._connection.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                         [(accessed, key) for key, accessed in self._pending_access.items()])
+            self._pending_access.clear()
+
+    def _set(self, key: str, value: str):
+        now = time.time()
+        self._pending_access.pop(key, None)
+        self._save_access_times()
+        exists = self._connection.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, now, now)
+        )
+        if exists is None:
+            self._entries += 1
+            self._inserts_since_count += 1
+            if self._inserts_since_count >= SQLITE_RECOUNT_INTERVAL:
+                # Pick up rows added or removed by other processes
+                self._entries = self._size()
+                self._inserts_since_count = 0
+
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            evicted = self._connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)", (overflow,)
+            ).rowcount
+            self._entries -= evicted
+            self._metrics["evictions"] += evicted
+        self._connection.commit()
+
+    def _size(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _clear(self):
+        self._connection.execute("DELETE FROM responses")
+        self._connection.commit()
+        self._entries = 0
+        self._pending_access.clear()
+
+    def close(self):
+        """Save pending access times and close the SQLite connection."""
+        with self._lock:
+            self._save_access_times()
+            self._connection.commit()
+            self._connection.close()
+
+
+def create_response_cache(backend: str = "memory", **options) -> Optional[ResponseCache]:
+    """
+    Create a response cache by backend name.
+
+    Args:
+        backend: "memory", "sqlite" or "none"
+        **options: Backend options (max_entries, ttl_seconds, and path for sqlite)
+
+    Returns:
+        A ResponseCache, or None when caching is disabled
+    """
+    if backend == "memory":
+        return MemoryResponseCache(**options)
+    if backend == "sqlite":
+        return SQLiteResponseCache(**options)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown response cache backend: {backend}")
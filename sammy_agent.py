@@ -3,11 +3,23 @@ SammyTheSpartanBarista - A CrewAI agent for coffee expertise and recommendations
 """
 
 import os
-import json
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import List, Optional
 from crewai import Agent, Task, Crew, Process
 from langchain_openai import ChatOpenAI
-from coffee_manager import CoffeeDataManager
+from coffee_manager import CoffeeDataManager, database_settings
+from response_cache import ResponseCache, MemoryResponseCache, prompt_fingerprint
+from coffee_ranker import RANKING_PROJECTION, rank_coffees
+from preference_matcher import extract_preferences
+from query_logger import QueryLogger
+from prompt_config import prompt_loader
+from sammy_metrics import metrics, summarize_spans, timed
+from prompt_renderer import (DEFAULT_TABLE_TOKEN_BUDGET, EXPERIMENT_COLUMNS, SELECTED_COLUMNS, CATALOG_COLUMNS,
+                             count_tokens, render_table)
 
 # Import configuration
 try:
@@ -17,6 +29,37 @@ except ImportError:
     OPENROUTER_API_KEY = None
     DEFAULT_MODEL = "openai/gpt-3.5-turbo"
 
+# Fields of an experiment that are rendered into task prompts
+EXPERIMENT_PROJECTION = {
+    "coffee_name": 1,
+    "roasting_level": 1,
+    "grinding_level": 1,
+    "brewing_ratio": 1,
+    "tasting_notes": 1
+}
+
+# Fields listed in the chat catalog summary
+CATALOG_PROJECTION = {"coffee_name": 1, "roasting_level": 1, "grinding_level": 1}
+
+# Fields kept in the in-memory catalog snapshot: what local ranking scores and task prompts render
+CATALOG_CACHE_PROJECTION = {**EXPERIMENT_PROJECTION, **RANKING_PROJECTION}
+
+# Number of experiments passed to a task, and catalog entries shown for selection
+EXPERIMENT_LIMIT = 10
+CATALOG_LIMIT = 100
+
+# Minimum cosine similarity for a semantic search hit to be passed to a task
+SEMANTIC_MIN_SIMILARITY = 0.05
+
+# Default cap on concurrently running async chats
+DEFAULT_MAX_CONCURRENT_CHATS = 8
+
+# Sort on the numeric brewing ratio for each brew strength (less water per gram is stronger)
+BREW_STRENGTH_SORT = {
+    "Strong": [("ratio_water_per_gram", 1)],
+    "Mild": [("ratio_water_per_gram", -1)]
+}
+
 
 class SammyTheSpartanBarista:
     """
@@ -24,18 +67,30 @@ class SammyTheSpartanBarista:
     and analysis using CrewAI framework with OpenRouter integration.
     """
     
-    def __init__(self, openrouter_api_key: str = None, model_name: str = None):
+    def __init__(self, openrouter_api_key: str = None, model_name: str = None,
+                 max_concurrent_chats: int = DEFAULT_MAX_CONCURRENT_CHATS,
+                 response_cache: ResponseCache = None, cache_responses: bool = True,
+                 llm_selection_fallback: bool = False,
+                 prompt_token_budget: int = DEFAULT_TABLE_TOKEN_BUDGET):
         """
         Initialize SammyTheSpartanBarista agent.
         
         Args:
             openrouter_api_key: OpenRouter API key (if not set in environment)
             model_name: LLM model to use from OpenRouter
+            max_concurrent_chats: Maximum number of achat_with_sammy() calls running at once
+            response_cache: Cache for LLM task outputs (defaults to an in-memory LRU cache)
+            cache_responses: Set to False to always call the LLM
+            llm_selection_fallback: If True, chats whose preferences match no coffee
+                                    locally ask the LLM to pick experiments instead
+            prompt_token_budget: Maximum tokens for the experiments table in a task
+                                 prompt; the least relevant rows are left out to fit
+                                 (None for no limit)
         """
         self.openrouter_api_key = openrouter_api_key or OPENROUTER_API_KEY or os.getenv('OPENROUTER_API_KEY')
         
-        # Load prompt config first to get the default model
-        self.prompt_config = self._load_prompt_config()
+        # Prompt config (loaded once per process) provides the default model; the LLM is built
+        # once, so DEFAULT_MODEL edits apply on restart while persona edits apply on the next chat
         self.model_name = model_name or self.prompt_config.get('DEFAULT_MODEL', DEFAULT_MODEL)
         
         # Debug print to see what model is being used
@@ -66,194 +121,186 @@ class SammyTheSpartanBarista:
         )
         print(f"Initialized ChatOpenAI with OpenRouter, model: {self.model_name}")
         
-        # prompt_config already loaded above
+        # Initialize coffee database manager (same settings as the CLI's database commands)
+        self.coffee_manager = CoffeeDataManager(**database_settings(), create_indexes=True)
         
-        # Initialize coffee database manager
-        self.coffee_manager = CoffeeDataManager()
+        # Serve the chat catalog from memory instead of querying it on every message
+        self.coffee_manager.enable_catalog_cache(projection=CATALOG_CACHE_PROJECTION)
+        
+        # Vector index over names and tasting notes for free-text candidate selection
+        self.coffee_manager.enable_semantic_index()
         
         # Initialize logging
         self._setup_logging()
         
-        # Create the agent
-        self.agent = self._create_agent()
+        # The agent is created on first use and rebuilt when the prompts change
+        self._agent = None
+        self._agent_prompts = None
+        
+        # Cache for LLM task outputs, keyed by model, rendered prompt and data version
+        self.response_cache = (response_cache or MemoryResponseCache()) if cache_responses else None
+        
+        # Chats rank experiments locally; the LLM only selects when asked to as a fallback
+        self.llm_selection_fallback = llm_selection_fallback
+        
+        # Per-thread token usage collected for chat_with_usage()
+        self._usage = threading.local()
+        
+        # Experiments are rendered as compact tables within this many tokens
+        self.prompt_token_budget = prompt_token_budget
+        self._prompt_stats = {"rendered_prompts": 0, "rendered_prompt_tokens": 0, "rows_dropped": 0}
+        self._prompt_stats_lock = threading.Lock()
+        
+        # Worker pool for concurrent async chats
+        self._chat_executor = ThreadPoolExecutor(max_workers=max_concurrent_chats,
+                                                 thread_name_prefix="sammy-chat")
     
     def _setup_logging(self):
-        """Setup logging for coffee queries with timestamped log files."""
-        # Create logs directory if it doesn't exist
-        os.makedirs('logs', exist_ok=True)
-        
-        # Create timestamped log filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_filename = f"logs/sammy_coffee_queries_{timestamp}.log"
+        """Start the background JSONL query logger (logs/sammy_queries.jsonl, rotated and gzipped)."""
+        self.query_logger = QueryLogger("logs")
+        self.log_filename = self.query_logger.path
         
         print(f"Logging will be saved to: {self.log_filename}")
     
     def _extract_preferences_from_query(self, user_query: str) -> dict:
-        """Extract coffee preferences from user query and provide reasoning."""
-        preferences = {}
-        reasoning = []
-        
-        # Convert query to lowercase for easier matching
-        query_lower = user_query.lower()
-        
-        # Extract roasting level preferences
-        if any(word in query_lower for word in ['light roast', 'light', 'blonde']):
-            preferences['roasting_level'] = 'Light'
-            reasoning.append("User mentioned 'light roast' or 'light' - indicating preference for light roasting level")
-        elif any(word in query_lower for word in ['medium roast', 'medium']):
-            preferences['roasting_level'] = 'Medium'
-            reasoning.append("User mentioned 'medium roast' or 'medium' - indicating preference for medium roasting level")
-        elif any(word in query_lower for word in ['dark roast', 'dark', 'bold']):
-            preferences['roasting_level'] = 'Dark'
-            reasoning.append("User mentioned 'dark roast' or 'dark' - indicating preference for dark roasting level")
-        
-        # Extract bitterness preferences
-        if any(word in query_lower for word in ['low bitterness', 'not bitter', 'smooth', 'mild']):
-            preferences['bitterness'] = 'Low'
-            reasoning.append("User mentioned 'low bitterness', 'smooth', or 'mild' - indicating preference for low bitterness")
-        elif any(word in query_lower for word in ['high bitterness', 'bitter', 'strong']):
-            preferences['bitterness'] = 'High'
-            reasoning.append("User mentioned 'high bitterness' or 'bitter' - indicating preference for high bitterness")
-        
-        # Extract sourness preferences
-        if any(word in query_lower for word in ['low sourness', 'not sour', 'smooth', 'mild']):
-            preferences['sourness'] = 'Low'
-            reasoning.append("User mentioned 'low sourness' or 'not sour' - indicating preference for low sourness")
-        elif any(word in query_lower for word in ['high sourness', 'sour', 'acidic']):
-            preferences['sourness'] = 'High'
-            reasoning.append("User mentioned 'high sourness' or 'sour' - indicating preference for high sourness")
-        
-        # Extract grinding preferences
-        if any(word in query_lower for word in ['fine grind', 'fine', 'espresso']):
-            preferences['grinding_level'] = 'Fine'
-            reasoning.append("User mentioned 'fine grind' or 'espresso' - indicating preference for fine grinding")
-        elif any(word in query_lower for word in ['medium grind', 'medium grinding']):
-            preferences['grinding_level'] = 'Medium'
-            reasoning.append("User mentioned 'medium grind' - indicating preference for medium grinding")
-        elif any(word in query_lower for word in ['coarse grind', 'coarse', 'french press']):
-            preferences['grinding_level'] = 'Coarse'
-            reasoning.append("User mentioned 'coarse grind' or 'french press' - indicating preference for coarse grinding")
-        
-        # Extract brewing method preferences
-        if any(word in query_lower for word in ['v60', 'pour over', 'chemex', 'drip']):
-            preferences['brewing_method'] = 'Pour Over'
-            reasoning.append("User mentioned 'V60', 'pour over', or 'Chemex' - indicating preference for pour over brewing")
-        elif any(word in query_lower for word in ['french press', 'press']):
-            preferences['brewing_method'] = 'French Press'
-            reasoning.append("User mentioned 'French press' - indicating preference for French press brewing")
-        elif any(word in query_lower for word in ['espresso', 'machine']):
-            preferences['brewing_method'] = 'Espresso'
-            reasoning.append("User mentioned 'espresso' - indicating preference for espresso brewing")
-        
-        # Extract flavor preferences
-        if any(word in query_lower for word in ['chocolate', 'nutty', 'caramel']):
-            preferences['flavor_notes'] = 'Chocolate/Nutty'
-            reasoning.append("User mentioned 'chocolate', 'nutty', or 'caramel' - indicating preference for chocolate/nutty flavors")
-        elif any(word in query_lower for word in ['fruity', 'citrus', 'berry', 'bright']):
-            preferences['flavor_notes'] = 'Fruity/Citrus'
-            reasoning.append("User mentioned 'fruity', 'citrus', or 'berry' - indicating preference for fruity/citrus flavors")
-        elif any(word in query_lower for word in ['floral', 'jasmine', 'delicate']):
-            preferences['flavor_notes'] = 'Floral'
-            reasoning.append("User mentioned 'floral' or 'jasmine' - indicating preference for floral flavors")
-        
-        # Extract origin preferences
-        if any(word in query_lower for word in ['ethiopian', 'ethiopia', 'yirgacheffe']):
-            preferences['origin'] = 'Ethiopian'
-            reasoning.append("User mentioned 'Ethiopian' or 'Yirgacheffe' - indicating preference for Ethiopian coffee")
-        elif any(word in query_lower for word in ['colombian', 'colombia']):
-            preferences['origin'] = 'Colombian'
-            reasoning.append("User mentioned 'Colombian' - indicating preference for Colombian coffee")
-        elif any(word in query_lower for word in ['kenyan', 'kenya']):
-            preferences['origin'] = 'Kenyan'
-            reasoning.append("User mentioned 'Kenyan' - indicating preference for Kenyan coffee")
-        
-        return preferences, reasoning
+        """Extract coffee preferences from user query and provide reasoning (see preference_matcher.py)."""
+        return extract_preferences(user_query)
     
+    @timed("log.queue")
     def _log_matching_coffees(self, query_type: str, preferences: dict, matching_coffees: list, user_query: str = None):
-        """Log all matching coffees to the timestamped log file."""
-        try:
-            with open(self.log_filename, 'a', encoding='utf-8') as log_file:
-                log_file.write("\n" + "="*80 + "\n")
-                log_file.write(f"QUERY TYPE: {query_type}\n")
-                log_file.write(f"TIMESTAMP: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                
-                # Add user query if provided
-                if user_query:
-                    log_file.write(f"USER QUERY: {user_query}\n")
-                    
-                    # Extract and log preferences from user query
-                    extracted_preferences, reasoning = self._extract_preferences_from_query(user_query)
-                    if extracted_preferences:
-                        log_file.write(f"EXTRACTED PREFERENCES: {json.dumps(extracted_preferences, indent=2)}\n")
-                        log_file.write("REASONING FOR PREFERENCES:\n")
-                        for reason in reasoning:
-                            log_file.write(f"  - {reason}\n")
-                    else:
-                        log_file.write("NO PREFERENCES EXTRACTED FROM QUERY\n")
-                
-                log_file.write(f"EXPLICIT PREFERENCES: {json.dumps(preferences, indent=2)}\n")
-                log_file.write(f"TOTAL MATCHING COFFEES: {len(matching_coffees)}\n")
-                log_file.write("-"*80 + "\n")
-                
-                if matching_coffees:
-                    for i, coffee in enumerate(matching_coffees, 1):
-                        log_file.write(f"\nCOFFEE #{i}:\n")
-                        log_file.write(f"  Name: {coffee.get('coffee_name', 'Unknown')}\n")
-                        log_file.write(f"  Roasting Level: {coffee.get('roasting_level', 'N/A')}\n")
-                        log_file.write(f"  Grinding Level: {coffee.get('grinding_level', 'N/A')}\n")
-                        log_file.write(f"  Brewing Ratio: {coffee.get('brewing_ratio', 'N/A')}\n")
-                        log_file.write(f"  Tasting Notes: {coffee.get('tasting_notes', 'N/A')}\n")
-                        log_file.write(f"  Database ID: {coffee.get('_id', 'N/A')}\n")
-                        log_file.write("-"*40 + "\n")
-                else:
-                    log_file.write("NO MATCHING COFFEES FOUND\n")
-                
-                log_file.write("="*80 + "\n\n")
-                
-        except Exception as e:
-            print(f"Error writing to log file: {e}")
+        """Queue a structured log event with the matching coffees; the write happens in the background."""
+        event = {
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "query_type": query_type,
+            "explicit_preferences": preferences,
+            "total_matching_coffees": len(matching_coffees),
+            "matching_coffees": [{
+                "database_id": str(coffee.get('_id', 'N/A')),
+                "coffee_name": coffee.get('coffee_name', 'Unknown'),
+                "roasting_level": coffee.get('roasting_level', 'N/A'),
+                "grinding_level": coffee.get('grinding_level', 'N/A'),
+                "brewing_ratio": coffee.get('brewing_ratio', 'N/A'),
+                "tasting_notes": coffee.get('tasting_notes', 'N/A')
+            } for coffee in matching_coffees]
+        }
+        
+        # Add user query and the preferences extracted from it (memoized, so repeats are free)
+        if user_query:
+            extracted_preferences, reasoning = self._extract_preferences_from_query(user_query)
+            event["user_query"] = user_query
+            event["extracted_preferences"] = extracted_preferences
+            event["reasoning"] = reasoning
+        
+        self.query_logger.log(event)
     
-    def _load_prompt_config(self) -> dict:
-        """Load prompt configuration from external file."""
-        try:
-            with open('sammy_prompts.py', 'r') as f:
-                content = f.read()
-                # Execute the content to get the config dictionary
-                exec_globals = {}
-                exec(content, exec_globals)
-                config = exec_globals.get('SAMMY_PROMPTS', {})
-                # Also get the DEFAULT_MODEL
-                config['DEFAULT_MODEL'] = exec_globals.get('DEFAULT_MODEL', 'openai/gpt-3.5-turbo')
-                return config
-        except FileNotFoundError:
-            print("Warning: sammy_prompts.py not found. Using default prompts.")
-            return self._get_default_prompts()
+    @property
+    def prompt_config(self):
+        """Current prompt configuration from sammy_prompts.py (cached, reloaded when the file changes)."""
+        return self._load_prompt_config()
     
-    def _get_default_prompts(self) -> dict:
-        """Default prompts if external file is not available."""
-        return {
-            "role": "Expert Coffee Barista and Connoisseur",
-            "goal": "Provide expert coffee advice, recommendations, and analysis",
-            "backstory": "I am Sammy, a passionate and knowledgeable barista with years of experience in coffee roasting, brewing, and tasting. I help coffee enthusiasts find their perfect cup and understand the nuances of coffee.",
-            "system_message": "You are an expert barista with deep knowledge of coffee origins, roasting profiles, brewing methods, and flavor profiles. Always provide detailed, helpful, and accurate information about coffee.",
-            "verbose": True,
-            "max_iter": 3,
-            "DEFAULT_MODEL": "openai/gpt-3.5-turbo"
-        }
+    @property
+    def agent(self) -> Agent:
+        """Agent for the single-task methods, rebuilt after sammy_prompts.py changes."""
+        prompt_config = self.prompt_config
+        if self._agent is None or self._agent_prompts is not prompt_config:
+            self._agent = self._create_agent(prompt_config)
+            self._agent_prompts = prompt_config
+        return self._agent
     
-    def _create_agent(self) -> Agent:
-        """Create the SammyTheSpartanBarista agent."""
+    def _load_prompt_config(self):
+        """Load prompt configuration from the shared, cached prompt file loader."""
+        return prompt_loader.get()
+    
+    def _create_agent(self, prompt_config=None) -> Agent:
+        """Create the SammyTheSpartanBarista agent from the current (or the given) prompt configuration."""
+        prompt_config = prompt_config or self.prompt_config
         return Agent(
-            role=self.prompt_config.get("role", "Expert Coffee Barista"),
-            goal=self.prompt_config.get("goal", "Provide expert coffee advice"),
-            backstory=self.prompt_config.get("backstory", "Experienced barista"),
+            role=prompt_config.get("role", "Expert Coffee Barista"),
+            goal=prompt_config.get("goal", "Provide expert coffee advice"),
+            backstory=prompt_config.get("backstory", "Experienced barista"),
             llm=self.llm,
-            verbose=self.prompt_config.get("verbose", True),
-            max_iter=self.prompt_config.get("max_iter", 3),
-            system_message=self.prompt_config.get("system_message", ""),
+            verbose=prompt_config.get("verbose", True),
+            max_iter=prompt_config.get("max_iter", 3),
+            system_message=prompt_config.get("system_message", ""),
             allow_delegation=False
         )
     
+    def _kickoff(self, task: Task, agent: Agent, stage: str = "llm") -> str:
+        """
+        Run a single-task crew, reusing a cached response for an identical prompt.
+        
+        Args:
+            task: The task to run
+            agent: The agent executing the task
+            stage: Metrics stage timing the LLM call, e.g. "llm.chat"
+        
+        Returns:
+            The task output
+        """
+        prompt_tokens = count_tokens(task.description)
+        with self._prompt_stats_lock:
+            self._prompt_stats["rendered_prompts"] += 1
+            self._prompt_stats["rendered_prompt_tokens"] += prompt_tokens
+        usage = getattr(self._usage, "current", None)
+        if usage is not None:
+            usage["rendered_prompt_tokens"] += prompt_tokens
+        
+        cache_key = None
+        if self.response_cache is not None:
+            # The persona is part of the key, so edited prompts do not reuse old answers
+            persona = "\0".join(str(getattr(agent, field, "")) for field in ("role", "goal", "backstory", "system_message"))
+            cache_key = prompt_fingerprint(self.model_name, persona + "\0" + task.description,
+                                           self._data_version_token())
+            with metrics.span("response_cache.get"):
+                cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                metrics.increment(f"{stage}.cache_hits")
+                self._record_usage(cached=True)
+                return cached
+        
+        crew = Crew(
+            agents=[agent],
+            tasks=[task],
+            process=Process.sequential,
+            verbose=True
+        )
+        
+        with metrics.span(stage):
+            result = str(crew.kickoff())
+        self._record_usage(usage_metrics=getattr(crew, "usage_metrics", None))
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+        return result
+    
+    def _record_usage(self, cached: bool = False, usage_metrics: dict = None):
+        """Add one task run to the usage being collected by _run_chat_with_usage() on this thread."""
+        usage = getattr(self._usage, "current", None)
+        if usage is None:
+            return
+        if cached:
+            usage["cached_calls"] += 1
+            return
+        usage["llm_calls"] += 1
+        if usage_metrics:
+            # CrewAI reports cumulative totals for the agent, and each chat here uses a fresh agent
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                usage[key] = usage_metrics.get(key, 0)
+    
+    @timed("prompt.render")
+    def _render_experiments(self, coffees: list, columns=EXPERIMENT_COLUMNS) -> str:
+        """Render coffees (most relevant first) as a compact table within the prompt token budget."""
+        table = render_table(coffees, columns, token_budget=self.prompt_token_budget)
+        if table["dropped"]:
+            print(f"Prompt token budget: kept {table['rows']} of {len(coffees)} experiments ({table['tokens']} tokens)")
+            with self._prompt_stats_lock:
+                self._prompt_stats["rows_dropped"] += table["dropped"]
+        return table["text"]
+    
+    def _data_version_token(self) -> str:
+        """Token that changes when the coffee collection changes, used in response cache keys."""
+        return str(self.coffee_manager.data_version())
+    
+    @timed("recommendation")
     def get_coffee_recommendation(self, preferences: dict) -> str:
         """
         Get coffee recommendations based on user preferences.
@@ -261,38 +308,40 @@ class SammyTheSpartanBarista:
         Args:
             preferences: Dictionary with user preferences
                        Example: {"roasting_level": "Medium", "bitterness": "Low"}
+                       "ratio_min"/"ratio_max" (water per gram of coffee) and
+                       "brew_strength" ("Strong" or "Mild") are applied in the database
         
         Returns:
             String with coffee recommendations
         """
-        # Query the database for matching coffees
-        matching_coffees = self.coffee_manager.get_coffee_with_query(preferences)
+        # Split brew strength constraints from the field filters
+        field_filters = {
+            key: value for key, value in preferences.items()
+            if key not in ("ratio_min", "ratio_max", "brew_strength")
+        }
         
         # Get top 10 most similar experiments for detailed analysis
-        top_10_experiments = matching_coffees[:10]
+        top_10_experiments = self.coffee_manager.get_coffee_with_query(
+            field_filters,
+            ratio_min=preferences.get("ratio_min"),
+            ratio_max=preferences.get("ratio_max"),
+            sort=BREW_STRENGTH_SORT.get(preferences.get("brew_strength")),
+            projection=EXPERIMENT_PROJECTION,
+            limit=EXPERIMENT_LIMIT
+        )
         
         # Log only the 10 experiments being passed to the task
         self._log_matching_coffees("COFFEE_RECOMMENDATION", preferences, top_10_experiments)
         
         # Prepare detailed experimental data for the agent
-        experimental_data = []
-        for coffee in top_10_experiments:
-            experiment_info = {
-                "experiment_id": str(coffee.get('_id', 'Unknown')),
-                "coffee_name": coffee.get('coffee_name', 'Unknown'),
-                "brewing_ratio": coffee.get('brewing_ratio', 'Not specified'),
-                "tasting_notes": coffee.get('tasting_notes', 'Not specified'),
-                "roasting_level": coffee.get('roasting_level', 'Not specified'),
-                "grinding_level": coffee.get('grinding_level', 'Not specified')
-            }
-            experimental_data.append(experiment_info)
+        experimental_data = self._render_experiments(top_10_experiments)
         
         task = Task(
             description=f"""
             Based on the user preferences: {preferences}
             
-            Here are the TOP 10 MOST SIMILAR EXPERIMENTS from our database:
-            {experimental_data}
+            Here are the TOP 10 MOST SIMILAR EXPERIMENTS from our database (one per line, columns separated by |):
+{experimental_data}
             
             CRITICAL REQUIREMENTS:
             - ONLY use the experimental data provided above - do not reference any other data
@@ -316,16 +365,9 @@ class SammyTheSpartanBarista:
             agent=self.agent
         )
         
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        result = crew.kickoff()
-        return result
+        return self._kickoff(task, task.agent, "llm.recommendation")
     
+    @timed("analysis")
     def analyze_coffee_profile(self, coffee_name: str) -> str:
         """
         Analyze a specific coffee's profile and characteristics.
@@ -337,62 +379,46 @@ class SammyTheSpartanBarista:
             Detailed analysis of the coffee
         """
         # Find the coffee in the database
-        coffee = self.coffee_manager.get_coffee_by_name(coffee_name)
+        coffee = self.coffee_manager.get_coffee_by_name(coffee_name, projection=EXPERIMENT_PROJECTION)
         
         if not coffee:
             # Try to find similar coffees
-            similar_coffees = self.coffee_manager.get_coffee_with_query({"coffee_name": coffee_name.split()[0]})
+            similar_coffees = self.coffee_manager.get_coffee_with_query(
+                {"coffee_name": coffee_name.split()[0]}, match="prefix",
+                projection=EXPERIMENT_PROJECTION, limit=1
+            )
             coffee = similar_coffees[0] if similar_coffees else None
         
         # Get top 10 similar experiments for analysis
         similar_experiments = []
         if coffee:
             # Find similar coffees based on roasting level and other characteristics
-            similar_coffees = self.coffee_manager.get_coffee_with_query({
+            similar_experiments = self.coffee_manager.get_coffee_with_query({
                 "roasting_level": coffee.get('roasting_level', ''),
                 "grinding_level": coffee.get('grinding_level', '')
-            })
-            similar_experiments = similar_coffees[:10]
+            }, match="exact", projection=EXPERIMENT_PROJECTION, limit=EXPERIMENT_LIMIT)
         
-        # Prepare detailed experimental data for the agent
-        experimental_data = []
+        # The main coffee being analyzed comes first, followed by the similar experiments
+        analysis_coffees = []
         if coffee:
-            # Add the main coffee being analyzed
-            main_experiment = {
-                "experiment_id": str(coffee.get('_id', 'Unknown')),
-                "coffee_name": coffee.get('coffee_name', 'Unknown'),
-                "brewing_ratio": coffee.get('brewing_ratio', 'Not specified'),
-                "tasting_notes": coffee.get('tasting_notes', 'Not specified'),
-                "roasting_level": coffee.get('roasting_level', 'Not specified'),
-                "grinding_level": coffee.get('grinding_level', 'Not specified'),
-                "is_main_coffee": True
-            }
-            experimental_data.append(main_experiment)
-            
-            # Add similar experiments
-            for similar_coffee in similar_experiments:
-                if similar_coffee.get('_id') != coffee.get('_id'):  # Don't duplicate the main coffee
-                    similar_experiment = {
-                        "experiment_id": str(similar_coffee.get('_id', 'Unknown')),
-                        "coffee_name": similar_coffee.get('coffee_name', 'Unknown'),
-                        "brewing_ratio": similar_coffee.get('brewing_ratio', 'Not specified'),
-                        "tasting_notes": similar_coffee.get('tasting_notes', 'Not specified'),
-                        "roasting_level": similar_coffee.get('roasting_level', 'Not specified'),
-                        "grinding_level": similar_coffee.get('grinding_level', 'Not specified'),
-                        "is_main_coffee": False
-                    }
-                    experimental_data.append(similar_experiment)
+            analysis_coffees.append(coffee)
+            analysis_coffees.extend(similar_coffee for similar_coffee in similar_experiments
+                                    if similar_coffee.get('_id') != coffee.get('_id'))  # Don't duplicate the main coffee
         
         # Log only the experiments being passed to the task
-        if experimental_data:
-            self._log_matching_coffees("COFFEE_ANALYSIS", {"coffee_name": coffee_name}, experimental_data)
+        if analysis_coffees:
+            self._log_matching_coffees("COFFEE_ANALYSIS", {"coffee_name": coffee_name}, analysis_coffees)
+        
+        # Prepare detailed experimental data for the agent
+        experimental_data = self._render_experiments(analysis_coffees)
         
         task = Task(
             description=f"""
             Analyze the coffee profile for: {coffee_name}
             
-            Here are the EXPERIMENTAL DATA from our database:
-            {experimental_data}
+            Here are the EXPERIMENTAL DATA from our database (one per line, columns separated by |;
+            the first row is the coffee being analyzed, the rest are similar experiments):
+{experimental_data}
             
             CRITICAL REQUIREMENTS:
             - Base analysis ONLY on the experimental data provided above
@@ -417,16 +443,9 @@ class SammyTheSpartanBarista:
             agent=self.agent
         )
         
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        result = crew.kickoff()
-        return result
+        return self._kickoff(task, task.agent, "llm.analysis")
     
+    @timed("brewing_guide")
     def get_brewing_guide(self, brewing_method: str, coffee_type: str = None) -> str:
         """
         Get a detailed brewing guide for a specific method.
@@ -438,38 +457,27 @@ class SammyTheSpartanBarista:
         Returns:
             Detailed brewing guide
         """
-        # Get relevant coffees from database
-        relevant_coffees = []
+        # Get top 10 most relevant experiments for brewing guide
+        top_10_experiments = []
         if coffee_type:
-            relevant_coffees = self.coffee_manager.get_coffee_with_query({"coffee_name": coffee_type})
+            top_10_experiments = self.coffee_manager.get_coffee_with_query(
+                {"coffee_name": coffee_type}, projection=EXPERIMENT_PROJECTION, limit=EXPERIMENT_LIMIT
+            )
         
-        # Get top 10 most relevant experiments for brewing guide
-        top_10_experiments = relevant_coffees[:10]
+        # Log only the 10 experiments being passed to the task
+        if top_10_experiments:
+            self._log_matching_coffees("BREWING_GUIDE", {"coffee_type": coffee_type}, top_10_experiments)
         
         # Prepare detailed experimental data for the agent
-        experimental_data = []
-        for coffee in top_10_experiments:
-            experiment_info = {
-                "experiment_id": str(coffee.get('_id', 'Unknown')),
-                "coffee_name": coffee.get('coffee_name', 'Unknown'),
-                "brewing_ratio": coffee.get('brewing_ratio', 'Not specified'),
-                "tasting_notes": coffee.get('tasting_notes', 'Not specified'),
-                "roasting_level": coffee.get('roasting_level', 'Not specified'),
-                "grinding_level": coffee.get('grinding_level', 'Not specified')
-            }
-            experimental_data.append(experiment_info)
-        
-        # Log only the 10 experiments being passed to the task
-        if experimental_data:
-            self._log_matching_coffees("BREWING_GUIDE", {"coffee_type": coffee_type}, experimental_data)
+        experimental_data = self._render_experiments(top_10_experiments)
         
         task = Task(
             description=f"""
             Create a comprehensive brewing guide for: {brewing_method}
             {'Focusing on coffee type: ' + coffee_type if coffee_type else ''}
             
-            Here are the TOP 10 MOST RELEVANT EXPERIMENTS from our database:
-            {experimental_data}
+            Here are the TOP 10 MOST RELEVANT EXPERIMENTS from our database (one per line, columns separated by |):
+{experimental_data}
             
             CRITICAL REQUIREMENTS:
             - Reference ONLY the experimental data provided above
@@ -496,19 +504,16 @@ class SammyTheSpartanBarista:
             agent=self.agent
         )
         
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        result = crew.kickoff()
-        return result
+        return self._kickoff(task, task.agent, "llm.brewing_guide")
     
     def chat_with_sammy(self, message: str) -> str:
         """
-        Have a casual conversation with Sammy about coffee using a two-task approach.
+        Have a casual conversation with Sammy about coffee.
+        
+        Relevant experiments are picked by ranking the catalog locally against the
+        preferences extracted from the message (see coffee_ranker.py), topped up
+        with semantic_search() hits on the message text; the LLM then answers
+        using only those experiments.
         
         Args:
             message: User's message/question
@@ -516,29 +521,179 @@ class SammyTheSpartanBarista:
         Returns:
             Sammy's response
         """
-        # Get all coffee data for the first task
-        all_coffees = self.coffee_manager.get_all_coffees()
+        return self._run_chat(message, self.agent)
+    
+    async def achat_with_sammy(self, message: str) -> str:
+        """
+        Coroutine version of chat_with_sammy() for use inside an event loop.
         
-        # Prepare coffee list with IDs and names for first task
-        coffee_list = []
-        for coffee in all_coffees:
-            coffee_list.append({
-                "database_id": str(coffee.get('_id', 'Unknown')),
-                "coffee_name": coffee.get('coffee_name', 'Unknown'),
-                "roasting_level": coffee.get('roasting_level', 'Unknown'),
-                "grinding_level": coffee.get('grinding_level', 'Unknown')
-            })
+        The blocking pipeline (Mongo reads, both Crew.kickoff() calls and log
+        writes) runs on this instance's worker pool, so many questions can be in
+        flight at once while sharing one LLM client and database pool. At most
+        max_concurrent_chats run at a time; the rest wait their turn.
+        
+        Args:
+            message: User's message/question
+        
+        Returns:
+            Sammy's response
+        """
+        # Each chat gets its own Agent (sharing self.llm) since CrewAI agents keep per-run state.
+        # _run_chat builds it on the worker thread: the prompt-config check and Agent
+        # construction would otherwise block the event loop.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._chat_executor, self._run_chat, message)
+    
+    async def achat_many(self, messages: List[str]) -> List[str]:
+        """
+        Answer several questions concurrently.
+        
+        Args:
+            messages: User messages/questions
+        
+        Returns:
+            Sammy's responses, in the same order as messages
+        """
+        return await asyncio.gather(*(self.achat_with_sammy(message) for message in messages))
+    
+    def chat_with_usage(self, message: str) -> dict:
+        """
+        Answer a question like chat_with_sammy(), reporting latency and token usage.
+        
+        Args:
+            message: User's message/question
+        
+        Returns:
+            Dictionary with "response", "latency_seconds", "usage" (prompt, completion
+            and total tokens, plus the number of LLM calls and cached responses) and
+            "timings" (calls and seconds per stage, e.g. "db.semantic_search", "llm.chat")
+        """
+        return self._run_chat_with_usage(message)
+    
+    async def achat_with_usage(self, message: str) -> dict:
+        """
+        Coroutine version of chat_with_usage(), run on the worker pool like achat_with_sammy().
+        
+        Args:
+            message: User's message/question
+        
+        Returns:
+            Dictionary with "response", "latency_seconds" and "usage"
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._chat_executor, self._run_chat_with_usage, message)
+    
+    def _run_chat_with_usage(self, message: str, agent: Optional[Agent] = None) -> dict:
+        """Run the chat pipeline with a fresh agent, collecting timing, per-stage timings and token usage."""
+        self._usage.current = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                               "llm_calls": 0, "cached_calls": 0, "rendered_prompt_tokens": 0}
+        start_time = time.perf_counter()
+        try:
+            with metrics.trace() as spans:
+                response = self._run_chat(message, agent)
+            return {
+                "response": str(response),
+                "latency_seconds": time.perf_counter() - start_time,
+                "usage": self._usage.current,
+                "timings": {stage: {"count": entry["count"], "seconds": round(entry["seconds"], 6)}
+                            for stage, entry in summarize_spans(spans).items()}
+            }
+        finally:
+            self._usage.current = None
+    
+    @timed("chat")
+    def _run_chat(self, message: str, agent: Optional[Agent] = None) -> str:
+        """Run the chat pipeline for message using the given agent, or a fresh one built on this thread."""
+        if agent is None:
+            agent = self._create_agent()
+        with metrics.span("chat.preferences"):
+            extracted_preferences, _ = self._extract_preferences_from_query(message)
         
         # Log the user query and extract preferences
         self._log_matching_coffees("CHAT_QUERY", {}, [], user_query=message)
         
+        # Rank the in-memory catalog against the extracted preferences, without an LLM round trip
+        catalog = self.coffee_manager.get_catalog(projection=CATALOG_CACHE_PROJECTION)
+        start_time = time.perf_counter()
+        ranked = rank_coffees(extracted_preferences, catalog, k=EXPERIMENT_LIMIT)
+        ranking_ms = (time.perf_counter() - start_time) * 1000
+        metrics.observe("chat.ranking", ranking_ms / 1000)
+        selected_coffees = [coffee for _, coffee in ranked]
+        
+        # Fill the remaining slots with coffees whose notes read like the question
+        selected_ids = {coffee["_id"] for coffee in selected_coffees}
+        similar_coffees = self.coffee_manager.semantic_search(
+            message, k=EXPERIMENT_LIMIT, projection=EXPERIMENT_PROJECTION, min_score=SEMANTIC_MIN_SIMILARITY
+        )
+        for coffee in similar_coffees:
+            if len(selected_coffees) >= EXPERIMENT_LIMIT:
+                break
+            if coffee["_id"] not in selected_ids:
+                selected_coffees.append(coffee)
+                selected_ids.add(coffee["_id"])
+        
+        self._log_matching_coffees("LOCAL_SELECTION", {
+            "scores": {coffee["_id"]: score for score, coffee in ranked},
+            "similarities": {coffee["_id"]: round(coffee["similarity"], 3) for coffee in similar_coffees},
+            "ranking_ms": round(ranking_ms, 2)
+        }, selected_coffees, user_query=message)
+        
+        if not selected_coffees and self.llm_selection_fallback:
+            selected_coffees = self._select_coffees_with_llm(message, agent, extracted_preferences)
+        
+        # TASK 2: Provide reasoned response using selected coffee data
+        task2 = Task(
+            description=f"""
+            User query: {message}
+            
+            Selected relevant coffee experiments from database (one per line, columns separated by |):
+{self._render_experiments(selected_coffees, SELECTED_COLUMNS)}
+            
+            Your task is to provide a helpful and educational response to the user's query using 
+            ONLY the experimental data provided above. 
+            
+            CRITICAL REQUIREMENTS:
+            - Base your response ONLY on the selected coffee experiments provided
+            - ALWAYS include specific database IDs when referencing experiments
+            - Use the brewing_ratio and tasting_notes from the experimental data
+            - Provide reasoning based on the actual experimental results
+            - Be friendly, knowledgeable, and helpful
+            - NEVER make up or fabricate coffee data, experiment IDs, or brewing results
+            
+            Format your response to be engaging and educational while staying grounded in the 
+            real experimental data provided.
+            """,
+            expected_output="A helpful and educational response about coffee using the selected experimental data",
+            agent=agent
+        )
+        
+        # Execute second task
+        result2 = self._kickoff(task2, agent, "llm.chat")
+        
+        # Log the second task result
+        self._log_matching_coffees("TASK2_RESPONSE", {"selected_coffees": len(selected_coffees)}, selected_coffees, user_query=message)
+        
+        return result2
+    
+    def _select_coffees_with_llm(self, message: str, agent: Agent, extracted_preferences: dict) -> list:
+        """Ask the LLM to pick relevant experiments from the catalog summary (fallback selection)."""
+        # A requested brew strength becomes a sort on the numeric ratio
+        catalog = self.coffee_manager.get_catalog(
+            projection=CATALOG_PROJECTION,
+            limit=CATALOG_LIMIT,
+            sort=BREW_STRENGTH_SORT.get(extracted_preferences.get("brew_strength"))
+        )
+        
+        # Prepare coffee list with IDs and names for first task
+        coffee_list = self._render_experiments(catalog, CATALOG_COLUMNS)
+        
         # TASK 1: Select relevant database IDs based on user query
         task1 = Task(
             description=f"""
             User query: {message}
             
-            Available coffee experiments from database:
-            {coffee_list[:100]}  # Show first 100 for better coverage
+            Available coffee experiments from database (one per line, columns separated by |):
+{coffee_list}
             
             Your task is to analyze the user query and select up to 10 most relevant database IDs 
             that would help answer their question. Consider:
@@ -555,21 +710,14 @@ class SammyTheSpartanBarista:
             If no specific coffees are relevant, return an empty list: []
             """,
             expected_output="A list of up to 10 relevant database IDs for the user's query",
-            agent=self.agent
+            agent=agent
         )
         
         # Execute first task
-        crew1 = Crew(
-            agents=[self.agent],
-            tasks=[task1],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        result1 = crew1.kickoff()
+        result1 = self._kickoff(task1, agent, "llm.chat_selection")
         
         # Log the first task result
-        self._log_matching_coffees("TASK1_SELECTION", {"selected_ids": str(result1)}, [], user_query=f"Task 1: {message}")
+        self._log_matching_coffees("TASK1_SELECTION", {"selected_ids": str(result1)}, [], user_query=message)
         
         # Parse the selected IDs from the first task
         selected_ids = []
@@ -586,62 +734,38 @@ class SammyTheSpartanBarista:
             selected_ids = []
         
         # Get detailed information for selected coffees
-        selected_coffees = []
-        for coffee in all_coffees:
-            if str(coffee.get('_id', '')) in selected_ids:
-                selected_coffees.append(coffee)
-        
-        # TASK 2: Provide reasoned response using selected coffee data
-        task2 = Task(
-            description=f"""
-            User query: {message}
-            
-            Selected relevant coffee experiments from database:
-            {[{
-                "database_id": str(coffee.get('_id', 'Unknown')),
-                "coffee_name": coffee.get('coffee_name', 'Unknown'),
-                "roasting_level": coffee.get('roasting_level', 'Unknown'),
-                "grinding_level": coffee.get('grinding_level', 'Unknown'),
-                "brewing_ratio": coffee.get('brewing_ratio', 'Unknown'),
-                "tasting_notes": coffee.get('tasting_notes', 'Unknown')
-            } for coffee in selected_coffees]}
-            
-            Your task is to provide a helpful and educational response to the user's query using 
-            ONLY the experimental data provided above. 
-            
-            CRITICAL REQUIREMENTS:
-            - Base your response ONLY on the selected coffee experiments provided
-            - ALWAYS include specific database IDs when referencing experiments
-            - Use the brewing_ratio and tasting_notes from the experimental data
-            - Provide reasoning based on the actual experimental results
-            - Be friendly, knowledgeable, and helpful
-            - NEVER make up or fabricate coffee data, experiment IDs, or brewing results
-            
-            Format your response to be engaging and educational while staying grounded in the 
-            real experimental data provided.
-            """,
-            expected_output="A helpful and educational response about coffee using the selected experimental data",
-            agent=self.agent
-        )
-        
-        # Execute second task
-        crew2 = Crew(
-            agents=[self.agent],
-            tasks=[task2],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        result2 = crew2.kickoff()
-        
-        # Log the second task result
-        self._log_matching_coffees("TASK2_RESPONSE", {"selected_coffees": len(selected_coffees)}, selected_coffees, user_query=f"Task 2: {message}")
+        selected_coffees = self.coffee_manager.get_coffees_by_ids(selected_ids, projection=EXPERIMENT_PROJECTION)
+        return selected_coffees
+    
+    def get_stats(self) -> dict:
+        """
+        Report database and cache statistics for monitoring.
         
-        return result2
+        Returns:
+            Dictionary with the collection stats, the response cache and catalog
+            cache counters (None when disabled), prompt loader and rendered prompt token
+            counters, per-stage latency metrics and the model in use
+        """
+        catalog_cache = self.coffee_manager.catalog_cache
+        return {
+            "model": self.model_name,
+            "coffees": self.coffee_manager.get_stats(),
+            "response_cache": self.response_cache.stats() if self.response_cache is not None else None,
+            "catalog_cache": catalog_cache.stats() if catalog_cache is not None else None,
+            "prompts": prompt_loader.stats(),
+            "prompt_tokens": dict(self._prompt_stats, token_budget=self.prompt_token_budget),
+            "metrics": metrics.to_json()
+        }
     
     def close(self):
         """Close the coffee database connection."""
-        print(f"Session ended. Log saved to: {self.log_filename}")
+        self._chat_executor.shutdown(wait=True)
+        self.query_logger.close()
+        print(f"Session ended. Log saved to: {self.log_filename} ({self.query_logger.stats()})")
+        if self.response_cache is not None:
+            print(f"Response cache: {self.response_cache.stats()}")
+            if hasattr(self.response_cache, "close"):
+                self.response_cache.close()
         self.coffee_manager.close()
 
 
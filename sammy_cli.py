@@ -2,15 +2,133 @@
 """
 SammyTheSpartanBarista CLI - Interactive coffee expert agent
 Usage: python3 sammy_cli.py --coffee-question "Your coffee question here"
+       python3 sammy_cli.py --questions-file questions.jsonl --output answers.jsonl
+       python3 sammy_cli.py serve --port 8080
+       python3 sammy_cli.py stats | find | export   (database only, no LLM)
+
+The agent stack (CrewAI, LangChain, NumPy) and the database driver are imported
+only by the commands that use them, so `--help` and the database-only
+subcommands start quickly and need no API key (asyncio is likewise only
+imported for concurrent questions). See benchmark_startup.py.
 """
 
 import argparse
+import contextlib
+import json
+import statistics
 import sys
-from sammy_agent import SammyTheSpartanBarista
+
+from prompt_renderer import DEFAULT_TABLE_TOKEN_BUDGET
+from sammy_metrics import metrics, format_breakdown
+
+
+# Subcommands answered from MongoDB alone, without the agent or an API key
+DB_COMMANDS = {
+    "stats": "Show coffee counts and value distributions",
+    "find": "Look up coffees by field values, ID or ranked text search",
+    "export": "Write coffees as JSON lines (or one JSON array) for backups and analysis"
+}
+
+# Fields printed for each coffee by `find` (without --json)
+FIND_FIELDS = ("coffee_name", "roasting_level", "grinding_level", "brewing_ratio", "tasting_notes")
+
+
+def iter_questions(lines):
+    """
+    Parse batch input, one question per line.
+    
+    A line is either plain text or a JSON object with a "question" and an optional
+    "id". Blank lines are skipped; questions without an id are numbered by line.
+    
+    Yields:
+        Dictionaries with "id" and "question"
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+                yield {"id": record.get("id", line_number), "question": record["question"]}
+                continue
+            except (ValueError, KeyError) as e:
+                print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+                continue
+        yield {"id": line_number, "question": line}
+
+
+async def run_batch(sammy, questions, output, concurrency):
+    """
+    Answer questions with at most concurrency in flight, writing one JSON line per answer.
+    
+    Input is read lazily (so stdin can be streamed) and answers are written as they
+    complete, tagged with the question's id.
+    
+    Args:
+        sammy: Initialized SammyTheSpartanBarista, shared by every question
+        questions: Iterator of {"id", "question"} dictionaries
+        output: Text stream for the JSONL answers
+        concurrency: Maximum number of questions answered at once
+    
+    Returns:
+        Summary dictionary with counts, latency percentiles and total tokens
+    """
+    import asyncio
+    
+    loop = asyncio.get_running_loop()
+    latencies = []
+    summary = {"answered": 0, "failed": 0, "total_tokens": 0, "llm_calls": 0, "cached_calls": 0}
+    
+    async def answer(item):
+        try:
+            return {**item, **await sammy.achat_with_usage(item["question"])}
+        except Exception as e:
+            return {**item, "error": str(e)}
+    
+    def write(done):
+        for future in done:
+            record = future.result()
+            if "error" in record:
+                summary["failed"] += 1
+            else:
+                summary["answered"] += 1
+                latencies.append(record["latency_seconds"])
+                for key in ("total_tokens", "llm_calls", "cached_calls"):
+                    summary[key] += record["usage"][key]
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+    
+    pending = set()
+    while True:
+        # Read the next question off the event loop, since stdin reads block
+        item = await loop.run_in_executor(None, next, questions, None)
+        if item is None:
+            break
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write(done)
+        pending.add(asyncio.ensure_future(answer(item)))
+    
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        write(done)
+    
+    if latencies:
+        summary["latency_p50_seconds"] = statistics.median(latencies)
+        # Interpolated between the observed latencies; quantiles() needs two points
+        summary["latency_p95_seconds"] = statistics.quantiles(latencies, n=20, method="inclusive")[-1] \
+            if len(latencies) > 1 else latencies[0]
+    return summary
 
 
 def main():
     """Main CLI function for SammyTheSpartanBarista."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] in DB_COMMANDS:
+        sys.exit(db_main(sys.argv[1], sys.argv[2:]))
     
     # Set up argument parser
     parser = argparse.ArgumentParser(
@@ -22,13 +140,71 @@ Examples:
   python3 sammy_cli.py --coffee-question "What's the best brewing method for Colombian coffee?"
   python3 sammy_cli.py --coffee-question "My coffee is too sour, how can I fix it?"
   python3 sammy_cli.py --coffee-question "Analyze the profile of Ethiopian Yirgacheffe"
+  python3 sammy_cli.py --coffee-question "Best light roast?" --coffee-question "How fine for V60?"
+  python3 sammy_cli.py --questions-file eval_set.jsonl --output answers.jsonl --concurrency 8
+  python3 sammy_cli.py --coffee-question "Best light roast?" --timings
+  cat questions.txt | python3 sammy_cli.py --stdin > answers.jsonl
+  python3 sammy_cli.py serve --port 8080   (see sammy_server.py for the endpoints)
+  python3 sammy_cli.py stats --group-by profile.sourness
+  python3 sammy_cli.py find --roasting-level light --name ethiopian
+  python3 sammy_cli.py export --output coffees.jsonl
         """
     )
     
-    parser.add_argument(
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
         '--coffee-question',
-        required=True,
-        help='Your coffee question or request for Sammy to answer'
+        action='append',
+        help='Your coffee question or request for Sammy to answer (repeat to ask several concurrently)'
+    )
+    source.add_argument(
+        '--questions-file',
+        help='Batch mode: answer every question in a file (JSONL with "question"/"id", or one per line)'
+    )
+    source.add_argument(
+        '--stdin',
+        action='store_true',
+        help='Batch mode: stream questions from standard input, in the same format as --questions-file'
+    )
+    
+    parser.add_argument(
+        '--output',
+        default='-',
+        help='Batch mode: JSONL file for answers with latency and token usage (default: stdout)'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Maximum number of questions answered at once when several are given (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--response-cache',
+        choices=['memory', 'sqlite', 'none'],
+        default='memory',
+        help='Where to cache LLM responses for repeated questions (default: memory)'
+    )
+    
+    parser.add_argument(
+        '--llm-selection-fallback',
+        action='store_true',
+        help='Let the LLM pick experiments when local ranking finds no match for a question'
+    )
+    
+    parser.add_argument(
+        '--prompt-token-budget',
+        type=int,
+        default=DEFAULT_TABLE_TOKEN_BUDGET,
+        help='Maximum tokens for the experiments table in each task prompt; less relevant rows are left out '
+             f'(default: {DEFAULT_TABLE_TOKEN_BUDGET})'
+    )
+    
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print a per-stage latency breakdown (database, prompt rendering, LLM calls, logging) at the end'
     )
     
     parser.add_argument(
@@ -40,15 +216,20 @@ Examples:
     # Parse arguments
     args = parser.parse_args()
     
+    if args.questions_file or args.stdin:
+        run_batch_mode(args)
+        return
+    
     print("🤖 SammyTheSpartanBarista - AI Coffee Expert")
     print("=" * 60)
-    print(f"📝 Your Question: {args.coffee_question}")
+    for question in args.coffee_question:
+        print(f"📝 Your Question: {question}")
     print("=" * 60)
     
     try:
         # Initialize Sammy
         print("🔧 Initializing Sammy...")
-        sammy = SammyTheSpartanBarista()
+        sammy = create_sammy(args)
         
         if args.verbose:
             print("✅ Sammy initialized successfully!")
@@ -56,18 +237,28 @@ Examples:
         
         print("\n🤔 Processing your question...")
         
-        # Process the question using chat_with_sammy
-        response = sammy.chat_with_sammy(args.coffee_question)
+        # Process the question using chat_with_sammy, or several concurrently
+        if len(args.coffee_question) == 1:
+            responses = [sammy.chat_with_sammy(args.coffee_question[0])]
+        else:
+            import asyncio
+            responses = asyncio.run(sammy.achat_many(args.coffee_question))
         
-        print("\n" + "=" * 60)
-        print("☕ SAMMY'S RESPONSE:")
-        print("=" * 60)
-        print(response)
-        print("=" * 60)
+        for question, response in zip(args.coffee_question, responses):
+            print("\n" + "=" * 60)
+            print("☕ SAMMY'S RESPONSE:")
+            if len(args.coffee_question) > 1:
+                print(f"📝 {question}")
+            print("=" * 60)
+            print(response)
+            print("=" * 60)
         
         if args.verbose:
             print(f"\n📁 Log saved to: {sammy.log_filename}")
         
+        if args.timings:
+            print_timings()
+        
     except KeyboardInterrupt:
         print("\n\n⏹️  Interrupted by user")
         sys.exit(1)
@@ -85,5 +276,243 @@ Examples:
             print("\n👋 Sammy session ended. Thanks for chatting!")
 
 
+def create_sammy(args):
+    """Initialize Sammy from the CLI options."""
+    # Imported here: loading the agent stack takes seconds
+    from sammy_agent import SammyTheSpartanBarista
+    from response_cache import create_response_cache
+    
+    response_cache = create_response_cache(args.response_cache)
+    return SammyTheSpartanBarista(
+        max_concurrent_chats=args.concurrency,
+        response_cache=response_cache,
+        cache_responses=response_cache is not None,
+        llm_selection_fallback=args.llm_selection_fallback,
+        prompt_token_budget=args.prompt_token_budget
+    )
+
+
+def print_timings():
+    """Print the per-stage latency breakdown recorded in this process."""
+    print("\n⏱️  Per-stage timings (nested stages are also counted in the stage around them):")
+    print(format_breakdown(metrics.to_json()["stages"]))
+
+
+def run_batch_mode(args):
+    """Answer a questions file or stdin with one shared Sammy, writing JSONL answers."""
+    import asyncio
+    
+    with contextlib.ExitStack() as files:
+        # Open both files before the slow agent start-up, so a bad path fails at once
+        try:
+            questions = sys.stdin if args.stdin else files.enter_context(
+                open(args.questions_file, 'r', encoding='utf-8'))
+            output = sys.stdout if args.output == '-' else files.enter_context(
+                open(args.output, 'w', encoding='utf-8'))
+        except OSError as e:
+            print(f"❌ Error: cannot open {e.filename}: {e.strerror}", file=sys.stderr)
+            sys.exit(1)
+        
+        # Status and CrewAI output go to stderr so stdout carries only JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                print("🔧 Initializing Sammy...")
+                sammy = create_sammy(args)
+                
+                summary = asyncio.run(run_batch(sammy, iter_questions(questions), output, args.concurrency))
+                
+                print(f"\n📊 Batch summary: {json.dumps(summary)}")
+                if args.timings:
+                    print_timings()
+                if summary["failed"]:
+                    sys.exit(1)
+            
+            except KeyboardInterrupt:
+                print("\n\n⏹️  Interrupted by user")
+                sys.exit(1)
+            
+            finally:
+                if 'sammy' in locals():
+                    sammy.close()
+
+
+def serve_main(argv):
+    """Run Sammy as a resident HTTP server (the `serve` subcommand)."""
+    from sammy_server import SammyServer, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_QUEUE
+    
+    parser = argparse.ArgumentParser(
+        prog="sammy_cli.py serve",
+        description="Serve SammyTheSpartanBarista over a local HTTP JSON API"
+    )
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Interface to bind (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to bind (default: {DEFAULT_PORT})')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum number of requests answered at once (default: 8)')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help=f'Requests allowed to wait for a free slot before 503s (default: {DEFAULT_MAX_QUEUE})')
+    parser.add_argument('--response-cache', choices=['memory', 'sqlite', 'none'], default='memory',
+                        help='Where to cache LLM responses for repeated questions (default: memory)')
+    parser.add_argument('--llm-selection-fallback', action='store_true',
+                        help='Let the LLM pick experiments when local ranking finds no match for a question')
+    parser.add_argument('--prompt-token-budget', type=int, default=DEFAULT_TABLE_TOKEN_BUDGET,
+                        help=f'Maximum tokens for the experiments table in each task prompt (default: {DEFAULT_TABLE_TOKEN_BUDGET})')
+    args = parser.parse_args(argv)
+    
+    server = SammyServer(lambda: create_sammy(args), host=args.host, port=args.port,
+                         workers=args.concurrency, max_queue=args.max_queue)
+    server.serve()
+
+
+def _query_from_args(args):
+    """Build a get_coffee_with_query() filter dictionary from the filter options."""
+    query = {
+        "coffee_name": args.name,
+        "roasting_level": args.roasting_level,
+        "grinding_level": args.grinding_level,
+        "tasting_notes": args.notes
+    }
+    return {field: value for field, value in query.items() if value}
+
+
+def db_main(command, argv):
+    """
+    Run a database-only subcommand (stats, find or export).
+    
+    Only coffee_manager is imported: no agent, no LLM client and no API key. Status
+    messages go to stderr so stdout carries only the results.
+    
+    Args:
+        command: One of DB_COMMANDS
+        argv: Arguments following the subcommand
+    
+    Returns:
+        Process exit code
+    """
+    # Same connection settings the agent uses, so these commands inspect the database chats read
+    from coffee_manager import database_settings
+    settings = database_settings()
+    url, database, collection = settings["connection_string"], settings["database_name"], settings["collection_name"]
+    parser = argparse.ArgumentParser(prog=f"sammy_cli.py {command}", description=DB_COMMANDS[command])
+    parser.add_argument('--mongodb-url', default=url, help=f'MongoDB connection string (default: {url})')
+    parser.add_argument('--database', default=database, help=f'Database name (default: {database})')
+    parser.add_argument('--collection', default=collection, help=f'Collection name (default: {collection})')
+    
+    filters = parser.add_argument_group('filters', 'Case-insensitive; see --match')
+    filters.add_argument('--name', help='Coffee name')
+    filters.add_argument('--roasting-level', help='Roasting level, e.g. Light')
+    filters.add_argument('--grinding-level', help='Grinding level, e.g. Fine')
+    filters.add_argument('--notes', help='Text in the tasting notes')
+    filters.add_argument('--match', choices=['exact', 'prefix', 'contains'], default='contains',
+                         help='How filter values are matched (default: contains)')
+    if command != 'stats':
+        filters.add_argument('--ratio-min', type=float, help='Minimum grams of water per gram of coffee')
+        filters.add_argument('--ratio-max', type=float, help='Maximum grams of water per gram of coffee')
+    
+    if command == 'stats':
+        parser.add_argument('--group-by', action='append', metavar='FIELD',
+                            help='Field to count values of, e.g. profile.sourness (repeatable; '
+                                 'default: roasting and grinding levels)')
+    if command == 'find':
+        lookup = parser.add_mutually_exclusive_group()
+        lookup.add_argument('--id', help='Fetch one coffee by its ID')
+        lookup.add_argument('--text', help='Ranked keyword search over names and tasting notes')
+        parser.add_argument('--limit', type=int, default=20, help='Maximum number of coffees shown (default: 20)')
+        parser.add_argument('--json', action='store_true', help='Print one JSON object per line')
+    if command == 'export':
+        parser.add_argument('--output', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--format', choices=['jsonl', 'json'], default='jsonl',
+                            help='One document per line, or a single JSON array (default: jsonl)')
+        parser.add_argument('--fields', help='Comma-separated fields to export (default: all)')
+    
+    args = parser.parse_args(argv)
+    query = _query_from_args(args)
+    has_filters = bool(query) or getattr(args, 'ratio_min', None) is not None \
+        or getattr(args, 'ratio_max', None) is not None
+    if command == 'find' and (args.id or args.text) and has_filters:
+        parser.error("--id and --text cannot be combined with filters")
+    
+    output = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        from coffee_manager import CoffeeDataManager
+        
+        try:
+            manager = CoffeeDataManager(args.mongodb_url, args.database, args.collection)
+            if command == 'stats':
+                if args.group_by or has_filters:
+                    stats = manager.aggregate_stats(query, group_by=args.group_by or ["roasting_level", "grinding_level"],
+                                                    match=args.match, include_total=True)
+                else:
+                    stats = manager.get_stats()
+                output.write(json.dumps(stats, indent=2, ensure_ascii=False, default=str) + "\n")
+            elif command == 'find':
+                if args.id:
+                    coffee = manager.get_coffee_by_id(args.id)
+                    coffees = [coffee] if coffee else []
+                elif args.text:
+                    coffees = manager.text_search(args.text, limit=args.limit)
+                else:
+                    coffees = manager.iter_query(query, match=args.match, ratio_min=args.ratio_min,
+                                                 ratio_max=args.ratio_max, limit=args.limit,
+                                                 sort=[("coffee_name", 1)])
+                found = _write_coffees(coffees, output, args.json)
+                print(f"{found} coffee(s) found")
+            else:
+                projection = {field.strip(): 1 for field in args.fields.split(',')} if args.fields else None
+                coffees = manager.iter_query(query, match=args.match, ratio_min=args.ratio_min,
+                                             ratio_max=args.ratio_max, projection=projection)
+                if args.output != '-':
+                    output = open(args.output, 'w', encoding='utf-8')
+                try:
+                    exported = _export_coffees(coffees, output, args.format)
+                finally:
+                    if args.output != '-':
+                        output.close()
+                print(f"Exported {exported} coffee(s)" + (f" to {args.output}" if args.output != '-' else ""))
+            return 0
+        
+        except KeyboardInterrupt:
+            print("\n\n⏹️  Interrupted by user")
+            return 1
+        
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return 1
+        
+        finally:
+            if 'manager' in locals():
+                manager.close()
+
+
+def _write_coffees(coffees, output, as_json):
+    """Print coffees for `find`, as JSON lines or one readable block each; return the count."""
+    count = 0
+    for count, coffee in enumerate(coffees, 1):
+        if as_json:
+            output.write(json.dumps(coffee, ensure_ascii=False, default=str) + "\n")
+            continue
+        output.write(f"{coffee['_id']}\n")
+        for field in FIND_FIELDS:
+            output.write(f"  {field}: {coffee.get(field, 'N/A')}\n")
+        if "score" in coffee:
+            output.write(f"  score: {coffee['score']:.2f}\n")
+    return count
+
+
+def _export_coffees(coffees, output, output_format):
+    """Stream coffees to output as JSON lines or a JSON array; return the count."""
+    count = 0
+    if output_format == 'json':
+        output.write("[")
+    for count, coffee in enumerate(coffees, 1):
+        document = json.dumps(coffee, ensure_ascii=False, default=str)
+        if output_format == 'json':
+            output.write(("," if count > 1 else "") + "\n  " + document)
+        else:
+            output.write(document + "\n")
+    if output_format == 'json':
+        output.write("\n]\n")
+    return count
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,228 @@
+"""
+Sammy Metrics - Per-stage latency spans, counters and histograms for Sammy and the coffee database.
+
+Code marks a stage with `with metrics.span("llm.chat"):` or decorates a method with
+`@timed("db.text_search")`. Every span is added to a latency histogram for its
+stage in the process-wide `metrics` registry, which exports Prometheus text
+format (to_prometheus()) and JSON (to_json()). A thread can also collect its own
+spans with `metrics.trace()`, giving a per-request breakdown.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Tuple
+
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "sammy"
+
+
+class _Histogram:
+    """Latency histogram for one stage."""
+
+    __slots__ = ("buckets", "count", "sum", "max")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket holding it (max if past the last bucket)."""
+        rank = q * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(LATENCY_BUCKETS[position], self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage latency histograms and event counters."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """
+        Time the enclosed block as one occurrence of stage.
+
+        The span is recorded even if the block raises, in which case the
+        "<stage>.errors" counter is incremented as well.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{stage}.errors")
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for stage, and in the current thread's trace if one is active."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.observe(seconds)
+        spans = getattr(self._local, "spans", None)
+        if spans is not None:
+            spans.append((stage, seconds))
+
+    def increment(self, event: str, amount: int = 1):
+        """Add amount to the counter for event."""
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + amount
+
+    @contextmanager
+    def trace(self) -> Iterator[List[Tuple[str, float]]]:
+        """
+        Collect the spans recorded on this thread inside the block.
+
+        Yields:
+            List that receives (stage, seconds) pairs in completion order; nested
+            spans appear before the span enclosing them
+        """
+        previous = getattr(self._local, "spans", None)
+        spans = []
+        self._local.spans = spans
+        try:
+            yield spans
+        finally:
+            self._local.spans = previous
+            if previous is not None:
+                previous.extend(spans)
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        Export counters and per-stage latency summaries.
+
+        Returns:
+            {"stages": {stage: {"count", "total_seconds", "mean_ms", "p50_ms",
+            "p95_ms", "max_ms", "buckets"}}, "counters": {event: count}}
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._histograms.items()):
+                stages[stage] = {
+                    "count": histogram.count,
+                    "total_seconds": round(histogram.sum, 6),
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 3),
+                    "p50_ms": round(histogram.quantile(0.5) * 1000, 3),
+                    "p95_ms": round(histogram.quantile(0.95) * 1000, 3),
+                    "max_ms": round(histogram.max * 1000, 3),
+                    "buckets": dict(zip((str(bound) for bound in LATENCY_BUCKETS), histogram.buckets))
+                }
+            return {"stages": stages, "counters": dict(sorted(self._counters.items()))}
+
+    def to_prometheus(self) -> str:
+        """Export counters and histograms in the Prometheus text exposition format."""
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each Sammy stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                label = _label_value(stage)
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.buckets):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{label}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{label}"}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{label}"}} {histogram.count}')
+
+            counter_name = f"{METRIC_PREFIX}_events_total"
+            lines += [f"# HELP {counter_name} Count of Sammy events.", f"# TYPE {counter_name} counter"]
+            for event, count in sorted(self._counters.items()):
+                lines.append(f'{counter_name}{{event="{_label_value(event)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Forget every recorded span and counter."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _label_value(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def summarize_spans(spans: List[Tuple[str, float]]) -> Dict[str, Dict[str, float]]:
+    """
+    Group a trace by stage.
+
+    Returns:
+        {stage: {"count": n, "seconds": total}} in order of first completion
+    """
+    summary = {}
+    for stage, seconds in spans:
+        entry = summary.setdefault(stage, {"count": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["seconds"] += seconds
+    return summary
+
+
+def format_breakdown(stages: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Render a per-stage table for people, slowest stages first.
+
+    Args:
+        stages: to_json()["stages"], or summarize_spans() output
+
+    Returns:
+        Text table with calls, total seconds and mean milliseconds per stage
+    """
+    rows = []
+    for stage, entry in stages.items():
+        total = entry.get("total_seconds", entry.get("seconds", 0.0))
+        rows.append((total, stage, entry["count"]))
+    lines = [f"{'stage':<32} {'calls':>6} {'total s':>9} {'mean ms':>9}"]
+    for total, stage, count in sorted(rows, reverse=True):
+        lines.append(f"{stage:<32} {count:>6} {total:>9.3f} {total / count * 1000:>9.1f}")
+    return "\n".join(lines)
+
+
+# Process-wide registry shared by the agent, the database manager and the server
+metrics = MetricsRegistry()
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording each call of the wrapped function (or coroutine function) as a span of stage."""
+    def decorator(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with metrics.span(stage):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with metrics.span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
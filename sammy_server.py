@@ -0,0 +1,324 @@
+"""
+Sammy Server - Serves SammyTheSpartanBarista over a local HTTP JSON API.
+
+One warm agent, database pool and set of caches serve every request, so a
+question no longer pays process start and agent construction. Start it with
+`python3 sammy_cli.py serve`.
+
+Endpoints:
+    GET  /health          Liveness: 200 while the process is up
+    GET  /ready           Readiness: 200 once the agent is built, 503 while warming up or draining
+    GET  /stats           Database and cache statistics
+    GET  /metrics         Per-stage latency histograms and counters in Prometheus text format
+                          (?format=json for JSON)
+    POST /chat            {"message": "..."}
+    POST /recommendation  {"preferences": {"roasting_level": "Medium", ...}}
+    POST /analysis        {"coffee_name": "..."}
+    POST /brewing-guide   {"brewing_method": "...", "coffee_type": "..."}
+"""
+
+import json
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+from coffee_manager import COFFEE_FIELDS, PROFILE_ATTRIBUTES
+from sammy_metrics import metrics
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# Requests answered at once, and requests allowed to wait for a free slot before 503s
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_QUEUE = 64
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 64 * 1024
+
+# Preference keys accepted by POST /recommendation and the value types allowed for each;
+# anything else is rejected before it can reach a MongoDB filter (e.g. "$where")
+RECOMMENDATION_PREFERENCES = {
+    **{field: (str,) for field in COFFEE_FIELDS + PROFILE_ATTRIBUTES},
+    "brew_strength": (str,),
+    "ratio_min": (int, float),
+    "ratio_max": (int, float)
+}
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class BadRequest(Exception):
+    """A request the client must fix; answered with 400 instead of 500."""
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # Non-daemon handler threads, so server_close() waits for in-flight requests
+    daemon_threads = False
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Decodes JSON requests, passes them to SammyServer.handle() and encodes the reply."""
+
+    def do_GET(self):
+        self._dispatch(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._reply(413, {"error": "Request body too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "Request body must be JSON"})
+            return
+        if not isinstance(body, dict):
+            self._reply(400, {"error": "Request body must be a JSON object"})
+            return
+        self._dispatch(body)
+
+    def _dispatch(self, body: Optional[Dict[str, Any]]):
+        status, payload = self.server.sammy_server.handle(self.command, self.path, body)
+        self._reply(status, payload)
+
+    def _reply(self, status: int, payload: Union[Dict[str, Any], str]):
+        if isinstance(payload, str):
+            data, content_type = payload.encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+        else:
+            data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.sammy_server.access_log:
+            super().log_message(format, *args)
+
+
+class SammyServer:
+    """
+    HTTP server around one long-lived SammyTheSpartanBarista.
+
+    The agent is built in the background after the port opens, so /health answers
+    at once and /ready turns 200 when the agent can take requests. At most
+    `workers` requests run at a time; up to `max_queue` more wait their turn and
+    the rest are turned away with 503.
+    """
+
+    def __init__(self, barista_factory: Callable[[], Any], host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE, access_log: bool = True):
+        """
+        Initialize the server. Nothing listens until start().
+
+        Args:
+            barista_factory: Callable returning a SammyTheSpartanBarista (or a stand-in
+                             with the same methods, e.g. one backed by a stub LLM)
+            host: Interface to bind; keep the default to only accept local connections
+            port: Port to bind (0 picks a free port, see address)
+            workers: Maximum number of requests answered at once
+            max_queue: Maximum number of requests waiting for a free worker
+            access_log: Set to False to silence per-request log lines
+        """
+        self.barista_factory = barista_factory
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.access_log = access_log
+        self.barista = None
+        self.startup_error = None
+        self._httpd = None
+        self._threads = []
+        self._draining = False
+        self._stopped = threading.Event()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._agent_lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._served = 0
+        self._started_at = None
+
+        self._routes = {
+            ("POST", "/chat"): self._chat,
+            ("POST", "/recommendation"): self._recommendation,
+            ("POST", "/analysis"): self._analysis,
+            ("POST", "/brewing-guide"): self._brewing_guide,
+            ("GET", "/stats"): self._stats,
+        }
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """(host, port) the server is listening on."""
+        return self._httpd.server_address[:2]
+
+    @property
+    def ready(self) -> bool:
+        return self.barista is not None and not self._draining
+
+    def start(self) -> "SammyServer":
+        """Open the port and build the agent, both in background threads."""
+        self._httpd = _HTTPServer((self.host, self.port), _RequestHandler)
+        self._httpd.sammy_server = self
+        self._started_at = time.time()
+
+        self._threads = [
+            threading.Thread(target=self._httpd.serve_forever, name="sammy-http"),
+            threading.Thread(target=self._warm_up, name="sammy-warm-up", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        host, port = self.address
+        print(f"Sammy server listening on http://{host}:{port}")
+        return self
+
+    def serve(self):
+        """Run until SIGINT or SIGTERM, then shut down gracefully."""
+        self.start()
+
+        def request_shutdown(signum, frame):
+            print(f"Received signal {signum}, draining requests...")
+            threading.Thread(target=self.shutdown, name="sammy-shutdown").start()
+
+        signal.signal(signal.SIGINT, request_shutdown)
+        signal.signal(signal.SIGTERM, request_shutdown)
+        while not self._stopped.wait(0.5):
+            pass
+
+    def shutdown(self):
+        """Stop accepting requests, wait for in-flight ones to finish, then close the agent."""
+        with self._lock:
+            if self._draining:
+                return
+            self._draining = True
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._threads[0].join()
+        if self.barista is not None:
+            self.barista.close()
+        print("Sammy server stopped")
+        self._stopped.set()
+
+    def _warm_up(self):
+        """Build the agent (connecting to MongoDB and loading caches)."""
+        try:
+            barista = self.barista_factory()
+        except Exception as e:
+            self.startup_error = str(e)
+            print(f"Sammy failed to start: {e}")
+            return
+        if self._draining:
+            barista.close()
+            return
+        self.barista = barista
+        print(f"Sammy ready after {time.time() - self._started_at:.1f}s")
+
+    def handle(self, method: str, path: str,
+               body: Optional[Dict[str, Any]]) -> Tuple[int, Union[Dict[str, Any], str]]:
+        """
+        Route one request.
+
+        Args:
+            method: HTTP method
+            path: Request path (the query string is only read by /metrics)
+            body: Decoded JSON body for POST requests
+
+        Returns:
+            (status code, JSON-serializable payload, or Prometheus text for /metrics)
+        """
+        path, _, query = path.partition("?")
+        path = path.rstrip("/") or "/"
+        if path == "/health":
+            return 200, {"status": "ok", **self._load()}
+        if path == "/ready":
+            if self.ready:
+                return 200, {"status": "ready", **self._load()}
+            status = "draining" if self._draining else ("failed" if self.startup_error else "starting")
+            return 503, {"status": status, "error": self.startup_error}
+        if path == "/metrics":
+            if parse_qs(query).get("format") == ["json"]:
+                return 200, {"server": self._load(), **metrics.to_json()}
+            return 200, metrics.to_prometheus()
+
+        route = self._routes.get((method, path))
+        if route is None:
+            if any(route_path == path for _, route_path in self._routes):
+                return 405, {"error": f"{method} not allowed on {path}"}
+            return 404, {"error": f"Unknown endpoint {path}"}
+        if not self.ready:
+            return 503, {"error": "Sammy is not ready"}
+
+        with self._lock:
+            if self._queued >= self.max_queue:
+                metrics.increment("http.rejected")
+                return 503, {"error": "Too many queued requests"}
+            self._queued += 1
+        self._slots.acquire()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        start_time = time.perf_counter()
+        try:
+            with metrics.span(f"http.{path.strip('/')}"):
+                payload = route(body or {})
+            return 200, {**payload, "elapsed_seconds": time.perf_counter() - start_time}
+        except BadRequest as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            print(f"Error handling {path}: {e}")
+            return 500, {"error": str(e)}
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._served += 1
+            self._slots.release()
+
+    def _load(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": self._active, "queued": self._queued, "served": self._served}
+
+    @staticmethod
+    def _required(body: Dict[str, Any], field: str, kind: type = str):
+        value = body.get(field)
+        if not isinstance(value, kind) or not value:
+            raise BadRequest(f"'{field}' is required")
+        return value
+
+    def _chat(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        # Each chat gets its own agent, so chats run concurrently
+        return self.barista.chat_with_usage(self._required(body, "message"))
+
+    # The remaining endpoints share the barista's single agent, so they run one at a time
+    def _recommendation(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        preferences = self._required(body, "preferences", dict)
+        for key, value in preferences.items():
+            if key not in RECOMMENDATION_PREFERENCES:
+                raise BadRequest(f"Unknown preference '{key}'; expected one of "
+                                 f"{', '.join(RECOMMENDATION_PREFERENCES)}")
+            kinds = RECOMMENDATION_PREFERENCES[key]
+            if isinstance(value, bool) or not isinstance(value, kinds):
+                raise BadRequest(f"Preference '{key}' must be a {' or '.join(kind.__name__ for kind in kinds)}")
+        with self._agent_lock:
+            return {"response": str(self.barista.get_coffee_recommendation(preferences))}
+
+    def _analysis(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        coffee_name = self._required(body, "coffee_name")
+        with self._agent_lock:
+            return {"response": str(self.barista.analyze_coffee_profile(coffee_name))}
+
+    def _brewing_guide(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        brewing_method = self._required(body, "brewing_method")
+        with self._agent_lock:
+            return {"response": str(self.barista.get_brewing_guide(brewing_method, body.get("coffee_type")))}
+
+    def _stats(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {"server": self._load(), **self.barista.get_stats()}
@@ -0,0 +1,358 @@
+"""
+Semantic Index - Top-k cosine similarity search over coffee names and tasting notes.
+
+Texts are embedded locally on the CPU with feature hashing (words, word pairs and
+character trigrams), so there is no model to download and a new coffee can be
+added without refitting anything. Vectors are kept in a memory-mapped NumPy
+matrix on disk, next to a memory-mapped array of fixed-width coffee IDs (one per
+matrix row) and a small JSON file holding the row count and data version, so a
+single-coffee write touches only its own rows on disk.
+
+Several processes may share one index directory: every change is made holding
+an exclusive lock on index.lock, after first reloading the files if another
+process changed them (tracked by a generation counter in index.json).
+"""
+
+import contextlib
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: changes are then only serialized within one process
+    fcntl = None
+
+
+# Directory holding the index files, resolved relative to this module so the CLI,
+# the server and scripts share one index whatever their working directory
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sammy_semantic_index")
+
+# Length of each vector; a power of two so hashed features spread evenly
+DEFAULT_DIMENSIONS = 1024
+
+# Minimum rows allocated when an index is created; the matrix doubles when full
+INITIAL_CAPACITY = 1024
+
+# Maximum length of a coffee ID (a MongoDB ObjectId is 24 hex characters)
+ID_WIDTH = 24
+
+# Coffee fields embedded into the index
+INDEXED_FIELDS = ("coffee_name", "tasting_notes")
+
+# Weight of a character trigram relative to a whole word or word pair
+TRIGRAM_WEIGHT = 0.3
+
+# Words carrying no meaning for similarity. The tasting profile words appear in
+# almost every record ("Bitterness: Low. Sourness: High."), so they are dropped too.
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "batch", "but", "by", "for", "from", "i", "in", "is", "it",
+    "like", "me", "my", "of", "on", "or", "something", "that", "the", "this", "to", "want", "with",
+    "bitterness", "sourness", "low", "medium", "high"
+})
+
+_TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+
+def coffee_text(coffee: Dict[str, Any]) -> str:
+    """Return the text of a coffee that is embedded into the index."""
+    return " ".join(coffee.get(field) or "" for field in INDEXED_FIELDS)
+
+
+def embed(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> np.ndarray:
+    """
+    Embed text as an L2-normalized hashed feature vector.
+
+    Args:
+        text: Text to embed
+        dimensions: Vector length
+
+    Returns:
+        float32 vector (all zeros if the text has no meaningful words)
+    """
+    words = [word for word in _TOKEN_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+    features = Counter(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    trigrams = Counter()
+    for word in words:
+        padded = f"#{word}#"
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for counts, weight in ((features, 1.0), (trigrams, TRIGRAM_WEIGHT)):
+        for feature, count in counts.items():
+            # crc32 is stable across processes, unlike hash(); its top bit picks the sign
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % dimensions] += sign * weight * (1.0 + math.log(count))
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class SemanticIndex:
+    """
+    A persistent vector index of coffees, searchable by cosine similarity.
+
+    The index remembers the data_version() it was last synchronized with, so a
+    stale index (for example after writes from another process) can be detected,
+    refreshed from disk and, if still stale, rebuilt.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, dimensions: int = DEFAULT_DIMENSIONS):
+        """
+        Open the index stored at path, creating an empty one if there is none.
+
+        Args:
+            path: Directory holding the index files
+            dimensions: Vector length (an existing index with another length is discarded)
+        """
+        self.path = path
+        self.dimensions = dimensions
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._ids_path = os.path.join(path, "ids.npy")
+        self._meta_path = os.path.join(path, "index.json")
+        self._lock_path = os.path.join(path, "index.lock")
+        self._lock = threading.RLock()
+        self._count = 0
+        self._rows: Dict[str, int] = {}
+        self.data_version: Optional[int] = None
+        # Number of changes written to index.json, compared to spot changes by other processes
+        self._generation = 0
+        self._matrix = None
+        self._ids = None
+
+        os.makedirs(path, exist_ok=True)
+        with self._file_lock():
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold the in-process lock and the exclusive cross-process lock on index.lock; not reentrant."""
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        """Return the contents of index.json, or None if it is missing or unreadable."""
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self):
+        """Open the existing index files, or allocate an empty matrix; called holding the file lock."""
+        meta = self._read_meta()
+        try:
+            matrix = np.load(self._vectors_path, mmap_mode="r+")
+            ids = np.load(self._ids_path, mmap_mode="r+")
+        except (OSError, ValueError):
+            meta, matrix, ids = None, None, None
+
+        # Indexes written in another layout (or with another length) are discarded and rebuilt
+        if (meta is None or meta.get("dimensions") != self.dimensions or "count" not in meta
+                or matrix.shape[1] != self.dimensions or ids.shape[0] != matrix.shape[0]
+                or meta["count"] > matrix.shape[0]):
+            self._count = 0
+            self._rows = {}
+            self.data_version = None
+            self._generation = meta.get("generation", 0) if meta else 0
+            self._allocate(INITIAL_CAPACITY)
+            self._flush()
+            return
+
+        self._matrix = matrix
+        self._ids = ids
+        self._count = meta["count"]
+        self._rows = {str(coffee_id): row for row, coffee_id in enumerate(ids[:self._count])}
+        self.data_version = meta.get("data_version")
+        self._generation = meta.get("generation", 0)
+
+    def _sync(self):
+        """Reload the files if another process changed them since we last did; called holding the file lock."""
+        meta = self._read_meta()
+        if meta is None or meta.get("generation", 0) != self._generation:
+            self._load()
+
+    def refresh(self):
+        """Pick up changes written to the index files by other processes."""
+        with self._file_lock():
+            self._sync()
+
+    def _allocate(self, capacity: int):
+        """Replace the matrix and ID files with ones of the given capacity, keeping the current rows."""
+        matrix = self._replace_file(self._vectors_path, self._matrix, np.float32, (capacity, self.dimensions))
+        self._matrix = None
+        ids = self._replace_file(self._ids_path, self._ids, f"<U{ID_WIDTH}", (capacity,))
+        self._ids = None
+        self._matrix, self._ids = matrix, ids
+
+    def _replace_file(self, path: str, current, dtype, shape: Tuple[int, ...]):
+        """Write a memory-mapped array of shape holding the first rows of current, and reopen it."""
+        # Named per process, so a crashed writer's leftover never clashes with another's
+        temp_path = f"{path}.{os.getpid()}.tmp.npy"
+        array = np.lib.format.open_memmap(temp_path, mode="w+", dtype=dtype, shape=shape)
+        if current is not None and self._count:
+            array[:self._count] = current[:self._count]
+        array.flush()
+        del array
+        os.replace(temp_path, path)
+        return np.load(path, mmap_mode="r+")
+
+    def rebuild(self, coffees: Iterable[Tuple[str, str]], data_version: Optional[int] = None,
+                capacity: int = 0):
+        """
+        Replace the index contents.
+
+        Args:
+            coffees: (coffee_id, text) pairs
+            data_version: data_version() the coffees were read at
+            capacity: Expected number of coffees, so the files are allocated once
+                      instead of doubling from INITIAL_CAPACITY
+        """
+        with self._file_lock():
+            meta = self._read_meta()
+            self._generation = meta.get("generation", 0) if meta else 0
+            self._count = 0
+            self._rows = {}
+            self._allocate(max(capacity, INITIAL_CAPACITY))
+            for coffee_id, text in coffees:
+                self._upsert(coffee_id, text)
+            self.data_version = data_version
+            self._flush()
+
+    def upsert_many(self, coffees: Iterable[Tuple[str, str]], data_version: Optional[int] = None):
+        """
+        Add or replace the vectors of several coffees.
+
+        Args:
+            coffees: (coffee_id, text) pairs
+            data_version: Version returned by the write that produced these coffees
+        """
+        with self._file_lock():
+            self._sync()
+            for coffee_id, text in coffees:
+                self._upsert(coffee_id, text)
+            self._record_version(data_version)
+            self._flush()
+
+    def remove(self, coffee_id: str, data_version: Optional[int] = None):
+        """
+        Remove a coffee from the index.
+
+        Args:
+            coffee_id: The coffee's ID
+            data_version: Version returned by the delete
+        """
+        with self._file_lock():
+            self._sync()
+            row = self._rows.pop(coffee_id, None)
+            if row is not None:
+                # Move the last row into the gap so rows stay contiguous
+                last = self._count - 1
+                if row != last:
+                    moved_id = str(self._ids[last])
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = moved_id
+                    self._rows[moved_id] = row
+                self._matrix[last] = 0.0
+                self._ids[last] = ""
+                self._count = last
+            self._record_version(data_version)
+            self._flush()
+
+    def record_version(self, data_version: Optional[int]):
+        """
+        Record that the index now reflects data_version.
+
+        The version only advances when it directly follows the one the index
+        was synchronized with; otherwise some write was missed and the index is
+        marked stale.
+        """
+        with self._file_lock():
+            self._sync()
+            self._record_version(data_version)
+            self._flush()
+
+    def _record_version(self, data_version: Optional[int]):
+        if data_version is not None and self.data_version is not None and data_version == self.data_version + 1:
+            self.data_version = data_version
+        else:
+            self.data_version = None
+
+    def _upsert(self, coffee_id: str, text: str):
+        """Write one coffee's vector, growing the matrix if needed."""
+        row = self._rows.get(coffee_id)
+        if row is None:
+            if len(coffee_id) > ID_WIDTH:
+                raise ValueError(f"Coffee ID longer than {ID_WIDTH} characters: {coffee_id}")
+            if self._count == self._matrix.shape[0]:
+                self._allocate(self._matrix.shape[0] * 2)
+            row = self._count
+            self._ids[row] = coffee_id
+            self._rows[coffee_id] = row
+            self._count += 1
+        self._matrix[row] = embed(text, self.dimensions)
+
+    def search(self, text: str, k: int = 10, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Find the coffees most similar to text.
+
+        Searches the rows this instance last loaded or wrote; call refresh() first
+        to see changes made by other processes.
+
+        Args:
+            text: Free-text description, e.g. "something like a jammy berry cup"
+            k: Maximum number of results
+            min_score: Only return coffees with a cosine similarity above this
+
+        Returns:
+            List of (coffee_id, similarity) pairs, most similar first
+        """
+        query = embed(text, self.dimensions)
+        with self._lock:
+            count = self._count
+            if not count or k < 1 or not query.any():
+                return []
+            scores = self._matrix[:count] @ query
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(str(self._ids[row]), float(scores[row])) for row in top if scores[row] > min_score]
+
+    def flush(self):
+        """
+        Write pending vector and ID changes and the row count to disk.
+
+        Every change already flushes itself; this is for callers that want to be
+        sure. Only changed pages of the memory-mapped files are written, and the
+        JSON file holds a few numbers, so the cost does not grow with the index.
+        """
+        with self._file_lock():
+            self._sync()
+            self._flush()
+
+    def _flush(self):
+        """flush() for callers already holding the file lock; bumps the generation other processes compare."""
+        self._matrix.flush()
+        self._ids.flush()
+        self._generation += 1
+        temp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as meta_file:
+            json.dump({"dimensions": self.dimensions, "data_version": self.data_version,
+                       "count": self._count, "generation": self._generation}, meta_file)
+        os.replace(temp_path, self._meta_path)
@@ -0,0 +1,138 @@
+"""
+Tests for AsyncCoffeeDataManager.
+
+Runs against a local mongod when one is reachable, otherwise against the in-process
+mongomock_motor stand-in. Skipped when neither is available.
+"""
+
+import asyncio
+
+import pytest
+
+motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+
+from bson import ObjectId
+
+from async_coffee_manager import AsyncCoffeeDataManager
+from sammy_metrics import metrics
+
+
+TEST_DATABASE = "coffee_db_async_test"
+
+SAMPLE_COFFEES = [
+    {"coffee_name": "Ethiopian Yirgacheffe - Batch 001", "roasting_level": "Light", "grinding_level": "Fine",
+     "brewing_ratio": "1:16", "tasting_notes": "Floral and bright. Bitterness: Low. Sourness: High."},
+    {"coffee_name": "Colombian Supremo - Batch 001", "roasting_level": "Medium", "grinding_level": "Medium",
+     "brewing_ratio": "1:15", "tasting_notes": "Chocolate and nuts. Bitterness: Medium. Sourness: Medium."},
+    {"coffee_name": "Sumatra Mandheling - Batch 001", "roasting_level": "Dark", "grinding_level": "Coarse",
+     "brewing_ratio": "1:14", "tasting_notes": "Earthy and herbal. Bitterness: High. Sourness: Low."},
+]
+
+
+async def _make_client():
+    """Return a client for a local mongod, or the in-process stand-in."""
+    client = motor_asyncio.AsyncIOMotorClient("mongodb://localhost:27017/", serverSelectionTimeoutMS=500)
+    try:
+        await client.admin.command("ping")
+        return client
+    except Exception:
+        client.close()
+
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()
+
+
+async def _with_manager(test):
+    """Run test(manager) against a fresh scratch collection."""
+    client = await _make_client()
+    manager = AsyncCoffeeDataManager(database_name=TEST_DATABASE, client=client)
+    try:
+        await manager.collection.drop()
+        await manager.meta_collection.drop()
+        await test(manager)
+    finally:
+        await manager.collection.drop()
+        await manager.meta_collection.drop()
+        client.close()
+
+
+def test_bulk_add_and_query():
+    """Bulk-inserted coffees can be queried, streamed and counted."""
+    async def test(manager):
+        result = await manager.bulk_add_coffees(SAMPLE_COFFEES, batch_size=2)
+        assert result["inserted_count"] == 3
+        assert result["batches"] == 2
+
+        medium = await manager.get_coffee_with_query({"roasting_level": "medium"}, match="exact")
+        assert [coffee["coffee_name"] for coffee in medium] == ["Colombian Supremo - Batch 001"]
+
+        low_sour = await manager.get_coffee_with_query({"sourness": "Low"}, match="exact")
+        assert [coffee["coffee_name"] for coffee in low_sour] == ["Sumatra Mandheling - Batch 001"]
+
+        streamed = [coffee async for coffee in manager.iter_coffees(sort=[("ratio_water_per_gram", 1)])]
+        assert [coffee["brewing_ratio"] for coffee in streamed] == ["1:14", "1:15", "1:16"]
+
+        stats = await manager.get_stats()
+        assert stats["total_coffees"] == 3
+        assert sorted(stats["roasting_levels"]) == ["Dark", "Light", "Medium"]
+
+    asyncio.run(_with_manager(test))
+
+
+def test_add_update_delete():
+    """Single-document writes keep derived fields current."""
+    async def test(manager):
+        coffee_id = await manager.add_coffee(**SAMPLE_COFFEES[0])
+        version = await manager.data_version()
+        assert await manager.update_coffee(coffee_id, tasting_notes="Now mellow. Bitterness: Low. Sourness: Low.")
+        assert await manager.data_version() == version + 1
+
+        coffee = await manager.get_coffee_by_id(coffee_id)
+        assert coffee["profile"]["sourness"] == "low"
+
+        assert await manager.delete_coffee(coffee_id)
+        assert await manager.get_coffee_by_id(coffee_id) is None
+
+    asyncio.run(_with_manager(test))
+
+
+def test_writes_bump_version_and_are_timed():
+    """Async writes advance data_version(), backfills move updated_at, and calls record db.* spans."""
+    async def test(manager):
+        spans_before = metrics.to_json()["stages"].get("db.add_coffee", {"count": 0})["count"]
+        version = await manager.data_version()
+        coffee_id = await manager.add_coffee(**SAMPLE_COFFEES[1])
+        assert await manager.data_version() == version + 1
+        assert metrics.to_json()["stages"]["db.add_coffee"]["count"] == spans_before + 1
+
+        stored = await manager.get_coffee_by_id(coffee_id)
+        await manager.collection.update_one({"_id": ObjectId(coffee_id)}, {"$unset": {"normalized": ""}})
+        assert await manager.backfill_derived_fields() == 1
+        assert await manager.backfill_derived_fields() == 0
+        assert await manager.data_version() == version + 2
+        backfilled = await manager.get_coffee_by_id(coffee_id)
+        assert backfilled["normalized"]["coffee_name"] == "colombian supremo - batch 001"
+        assert backfilled["updated_at"] > stored["updated_at"]
+
+    asyncio.run(_with_manager(test))
+
+
+def test_concurrent_queries():
+    """Many queries can be in flight at once on one manager."""
+    async def test(manager):
+        await manager.bulk_add_coffees(SAMPLE_COFFEES)
+        results = await asyncio.gather(*(
+            manager.get_coffee_with_query({"coffee_name": "colombian"}, match="prefix")
+            for _ in range(200)
+        ))
+        assert all(len(result) == 1 for result in results)
+
+    asyncio.run(_with_manager(test))
+
+
+if __name__ == "__main__":
+    test_bulk_add_and_query()
+    test_add_update_delete()
+    test_writes_bump_version_and_are_timed()
+    test_concurrent_queries()
+    print("All async manager tests passed")
@@ -0,0 +1,116 @@
+"""
+Tests for the in-memory catalog cache, run against the in-process mongomock stand-in.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from catalog_cache import CatalogCache
+
+
+PROJECTION = {"coffee_name": 1, "ratio_water_per_gram": 1}
+
+
+@pytest.fixture
+def collection():
+    """A scratch collection holding three coffees."""
+    collection = mongomock.MongoClient().coffee_db.coffees
+    now = datetime.now()
+    collection.insert_many([
+        {"coffee_name": "Ethiopian", "ratio_water_per_gram": 16.0, "tasting_notes": "Floral", "updated_at": now},
+        {"coffee_name": "Colombian", "ratio_water_per_gram": 15.0, "tasting_notes": "Nutty", "updated_at": now},
+        {"coffee_name": "Sumatra", "ratio_water_per_gram": 14.0, "tasting_notes": "Earthy", "updated_at": now},
+    ])
+    return collection
+
+
+def test_reads_are_projected_and_sorted(collection):
+    """The snapshot keeps only projected fields and sorts in memory."""
+    cache = CatalogCache(collection, PROJECTION, use_change_stream=False)
+    cache.reload()
+
+    strongest = cache.get(limit=2, sort=[("ratio_water_per_gram", 1)])
+    assert [coffee["coffee_name"] for coffee in strongest] == ["Sumatra", "Colombian"]
+    assert all(isinstance(coffee["_id"], str) and "tasting_notes" not in coffee for coffee in strongest)
+
+    names_only = cache.get(projection={"coffee_name": 1})
+    assert all(set(coffee) == {"_id", "coffee_name"} for coffee in names_only)
+
+    # Callers get copies
+    strongest[0]["coffee_name"] = "Changed"
+    assert cache.get(limit=1, sort=[("ratio_water_per_gram", 1)])[0]["coffee_name"] == "Sumatra"
+
+
+def test_projections_and_deep_copies(collection):
+    """get() honours _id exclusion and exclusion projections, and never shares nested values."""
+    collection.update_many({}, {"$set": {"profile": {"sourness": "low"}}})
+    cache = CatalogCache(collection, {**PROJECTION, "profile": 1}, use_change_stream=False)
+    cache.reload()
+
+    assert all(set(coffee) == {"coffee_name"} for coffee in cache.get(projection={"_id": 0, "coffee_name": 1}))
+    assert all(set(coffee) == {"_id", "coffee_name", "profile"}
+               for coffee in cache.get(projection={"ratio_water_per_gram": 0}))
+    assert all(set(coffee) == {"coffee_name", "ratio_water_per_gram", "profile"}
+               for coffee in cache.get(projection={"_id": 0}))
+    with pytest.raises(ValueError):
+        cache.get(projection={"coffee_name": 1, "profile": 0})
+
+    for projection in (None, {"profile": 1}):
+        cache.get(projection=projection)[0]["profile"]["sourness"] = "changed"
+        assert all(coffee["profile"]["sourness"] == "low" for coffee in cache.get())
+
+
+def test_polling_picks_up_inserts_updates_and_deletes(collection):
+    """Polling the updated_at watermark applies changes; deletions trigger a reload."""
+    cache = CatalogCache(collection, PROJECTION, use_change_stream=False)
+    cache.reload()
+    later = datetime.now() + timedelta(seconds=1)
+
+    collection.update_one({"coffee_name": "Sumatra"}, {"$set": {"ratio_water_per_gram": 17.0, "updated_at": later}})
+    collection.insert_one({"coffee_name": "Kenya", "ratio_water_per_gram": 13.0, "updated_at": later})
+    cache._poll()
+    assert [coffee["coffee_name"] for coffee in cache.get(sort=[("ratio_water_per_gram", 1)])] == \
+        ["Kenya", "Colombian", "Ethiopian", "Sumatra"]
+
+    collection.delete_one({"coffee_name": "Colombian"})
+    cache._poll()
+    assert sorted(coffee["coffee_name"] for coffee in cache.get()) == ["Ethiopian", "Kenya", "Sumatra"]
+    assert cache.stats()["reloads"] == 2
+
+
+def test_polling_sees_backfilled_fields(collection):
+    """backfill_derived_fields() bumps updated_at, so polled snapshots get the new fields."""
+    import coffee_manager
+
+    manager = coffee_manager.CoffeeDataManager.__new__(coffee_manager.CoffeeDataManager)
+    manager.collection = collection
+    manager.meta_collection = collection.database.coffee_meta
+    manager.semantic_index = None
+    collection.update_many({}, {"$set": {"updated_at": datetime.now() - timedelta(days=1)}})
+
+    cache = CatalogCache(collection, {"coffee_name": 1, "normalized": 1}, use_change_stream=False)
+    cache.reload()
+    assert manager.backfill_derived_fields() == 3
+    cache._poll()
+    assert sorted(coffee["normalized"]["coffee_name"] for coffee in cache.get()) == \
+        ["colombian", "ethiopian", "sumatra"]
+    assert manager.backfill_derived_fields() == 0
+
+
+def test_change_stream_events(collection):
+    """Change stream events update the snapshot; invalidating events request a reload."""
+    cache = CatalogCache(collection, PROJECTION)
+    cache.reload()
+    sumatra = collection.find_one({"coffee_name": "Sumatra"})
+
+    assert not cache._apply_change({"operationType": "update", "documentKey": {"_id": sumatra["_id"]},
+                                    "fullDocument": {**sumatra, "coffee_name": "Sumatra Gayo"}})
+    assert cache.get(limit=1, sort=[("ratio_water_per_gram", 1)])[0]["coffee_name"] == "Sumatra Gayo"
+
+    assert not cache._apply_change({"operationType": "delete", "documentKey": {"_id": sumatra["_id"]}})
+    assert len(cache.get()) == 2
+
+    assert cache._apply_change({"operationType": "drop"})
@@ -0,0 +1,310 @@
+"""
+Tests for CoffeeDataManager, run against the in-process mongomock stand-in.
+"""
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import coffee_manager
+from coffee_manager import CoffeeDataManager, MongoClientRegistry, parse_brewing_ratio, parse_tasting_profile
+
+
+SAMPLE_COFFEES = [
+    {"coffee_name": "Ethiopian Yirgacheffe", "roasting_level": "Light", "grinding_level": "Fine",
+     "brewing_ratio": "1:16", "tasting_notes": "Floral and bright. Bitterness: Low. Sourness: High."},
+    {"coffee_name": "Colombian Supremo", "roasting_level": "Medium", "grinding_level": "Medium",
+     "brewing_ratio": "1:15", "tasting_notes": "Caramel and nuts. Bitterness: Medium. Sourness: Medium."},
+    {"coffee_name": "Sumatra Mandheling", "roasting_level": "Dark", "grinding_level": "Coarse",
+     "brewing_ratio": "1:14", "tasting_notes": "Earthy and herbal. Bitterness: High. Sourness: Low."},
+]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh client registry handing out mongomock clients."""
+    registry = MongoClientRegistry()
+    monkeypatch.setattr(coffee_manager, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(coffee_manager, "client_registry", registry)
+    return registry
+
+
+@pytest.fixture
+def manager(registry):
+    """A manager on an empty scratch collection."""
+    manager = CoffeeDataManager(database_name="coffee_db_test")
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def stocked(manager):
+    """The manager holding SAMPLE_COFFEES."""
+    manager.bulk_add_coffees(SAMPLE_COFFEES)
+    return manager
+
+
+def names(coffees):
+    return sorted(coffee["coffee_name"] for coffee in coffees)
+
+
+def test_bulk_report_uses_chunk_positions(manager):
+    """Write errors are reported at the record's position in the chunk, not among the built documents."""
+    manager.collection.create_index("coffee_name", unique=True)
+    malformed = {"coffee_name": "Broken"}
+    duplicate = dict(SAMPLE_COFFEES[0])
+
+    report = manager.bulk_add_coffees([malformed, SAMPLE_COFFEES[0], duplicate, SAMPLE_COFFEES[1]])
+
+    assert report["inserted_count"] == 2
+    assert report["failed_count"] == 2
+    assert [(error["batch"], error["index"]) for error in report["errors"]] == [(1, 0), (1, 2)]
+    assert "positions" not in report
+
+
+def test_bulk_report_across_batches(manager):
+    """Each batch is inserted separately and the report totals all of them."""
+    report = manager.bulk_add_coffees(iter(SAMPLE_COFFEES), batch_size=2)
+
+    assert report["batches"] == 2
+    assert report["inserted_count"] == 3
+    assert report["failed_count"] == 0
+    assert set(report["inserted_ids"]) == {coffee["_id"] for coffee in manager.get_all_coffees()}
+
+    with pytest.raises(ValueError):
+        manager.bulk_add_coffees(SAMPLE_COFFEES, batch_size=0)
+
+
+def test_match_modes(stocked):
+    """exact and prefix match the normalized shadow fields; contains is an unanchored regex."""
+    assert names(stocked.get_coffee_with_query({"coffee_name": "ethiopian yirgacheffe"}, match="exact")) == \
+        ["Ethiopian Yirgacheffe"]
+    assert stocked.get_coffee_with_query({"coffee_name": "ethiopian"}, match="exact") == []
+    assert names(stocked.get_coffee_with_query({"coffee_name": "ETHIO"}, match="prefix")) == ["Ethiopian Yirgacheffe"]
+    assert names(stocked.get_coffee_with_query({"coffee_name": "supremo"})) == ["Colombian Supremo"]
+
+    # Modes per field
+    assert names(stocked.get_coffee_with_query({"coffee_name": "s", "roasting_level": "dark"},
+                                               match={"coffee_name": "prefix", "roasting_level": "exact"})) == \
+        ["Sumatra Mandheling"]
+
+    # Case-sensitive queries default to exact matching on the stored field
+    assert stocked.get_coffee_with_query({"roasting_level": "light"}, case_sensitive=True) == []
+    assert names(stocked.get_coffee_with_query({"roasting_level": "Light"}, case_sensitive=True)) == \
+        ["Ethiopian Yirgacheffe"]
+
+    query = stocked._build_query({"coffee_name": "ethio"}, match="prefix")
+    assert query == {"normalized.coffee_name": {"$regex": "^ethio"}}
+
+    with pytest.raises(ValueError):
+        stocked.get_coffee_with_query({"coffee_name": "x"}, match="fuzzy")
+
+
+def test_profile_parsing():
+    """Attribute levels are parsed out of free text and lowercased; missing ones are None."""
+    assert parse_tasting_profile("Smooth. Bitterness: Medium-Low. Sourness:  High.") == \
+        {"bitterness": "medium-low", "sourness": "high"}
+    assert parse_tasting_profile("bitterness : low, nutty") == {"bitterness": "low", "sourness": None}
+    assert parse_tasting_profile("Just chocolate") == {"bitterness": None, "sourness": None}
+
+
+def test_profile_queries(stocked):
+    """Profile attributes are stored on insert and queried on the indexed field in any case."""
+    stored = stocked.get_coffee_by_name("Sumatra Mandheling")
+    assert stored["profile"] == {"bitterness": "high", "sourness": "low"}
+    assert stored["normalized"]["coffee_name"] == "sumatra mandheling"
+
+    assert names(stocked.get_coffee_with_query({"sourness": "HIGH"}, match="exact")) == ["Ethiopian Yirgacheffe"]
+    assert names(stocked.get_coffee_with_query({"profile.bitterness": "Medium"}, match="exact")) == \
+        ["Colombian Supremo"]
+
+    coffee_id = stored["_id"]
+    assert stocked.update_coffee(coffee_id, tasting_notes="Now Sourness: Medium.")
+    assert stocked.get_coffee_by_id(coffee_id)["profile"] == {"bitterness": None, "sourness": "medium"}
+
+
+@pytest.mark.parametrize("ratio, expected", [
+    ("1:15", 15.0),
+    ("1:2.5", 2.5),
+    ("2:31", 15.5),
+    (" 1 : 16 ", 16.0),
+    ("0:15", None),
+    ("1/15", None),
+    ("strong", None),
+    (None, None),
+])
+def test_parse_brewing_ratio(ratio, expected):
+    """Ratios become water per gram of coffee; anything unparseable is None."""
+    assert parse_brewing_ratio(ratio) == expected
+
+
+def test_ratio_range_queries(stocked):
+    """ratio_min and ratio_max filter on the numeric ratio, inclusively."""
+    assert names(stocked.get_coffee_with_query({}, ratio_min=15)) == ["Colombian Supremo", "Ethiopian Yirgacheffe"]
+    assert names(stocked.get_coffee_with_query({}, ratio_max=15)) == ["Colombian Supremo", "Sumatra Mandheling"]
+    assert names(stocked.search_coffees(ratio_min=14.5, ratio_max=15.5)) == ["Colombian Supremo"]
+
+    strongest = stocked.get_coffee_with_query({}, sort=[("ratio_water_per_gram", 1)], limit=1)
+    assert strongest[0]["coffee_name"] == "Sumatra Mandheling"
+
+
+def test_aggregate_stats(stocked):
+    """Counts, distributions and percentages come from one aggregation."""
+    stocked.add_coffee("Ethiopian Sidamo", "Light", "Medium", "1:16", "Berry. Sourness: High.")
+
+    stats = stocked.aggregate_stats(group_by=["roasting_level", "profile.sourness"], include_total=True)
+    assert stats["matching_coffees"] == 4
+    assert stats["total_coffees"] == 4
+    assert stats["distributions"]["roasting_level"] == {"Light": 2, "Dark": 1, "Medium": 1}
+    assert list(stats["distributions"]["roasting_level"])[0] == "Light"
+    assert stats["percentages"]["profile.sourness"]["high"] == 50.0
+
+    filtered = stocked.aggregate_stats({"coffee_name": "ethiopian"}, group_by=["grinding_level"], match="prefix")
+    assert filtered["matching_coffees"] == 2
+    assert filtered["distributions"]["grinding_level"] == {"Fine": 1, "Medium": 1}
+
+    empty = stocked.aggregate_stats({"coffee_name": "kenya"}, group_by=["roasting_level"])
+    assert empty == {"matching_coffees": 0, "distributions": {"roasting_level": {}},
+                     "percentages": {"roasting_level": {}}}
+
+    summary = stocked.get_stats()
+    assert summary["total_coffees"] == 4
+    assert sorted(summary["roasting_levels"]) == ["Dark", "Light", "Medium"]
+
+
+def test_registry_refcounting(registry):
+    """Managers with the same settings share one client, closed with the last holder."""
+    first = CoffeeDataManager(database_name="coffee_db_test")
+    second = CoffeeDataManager(database_name="coffee_db_test")
+    other = CoffeeDataManager(database_name="coffee_db_test", pool_options={"maxPoolSize": 5})
+
+    assert first.client is second.client
+    assert other.client is not first.client
+    assert sorted(entry["refcount"] for entry in registry.stats()) == [1, 2]
+
+    first.close()
+    first.close()  # Closing twice releases once
+    assert sorted(entry["refcount"] for entry in registry.stats()) == [1, 1]
+    second.close()
+    other.close()
+    assert registry.stats() == []
+    assert registry.release(first.client) is False
+
+
+def test_data_version_bumps(manager):
+    """Every write that changes the collection advances data_version()."""
+    assert manager.data_version() == 0
+
+    coffee_id = manager.add_coffee(**SAMPLE_COFFEES[0])
+    assert manager.data_version() == 1
+
+    manager.bulk_add_coffees(SAMPLE_COFFEES[1:], batch_size=1)
+    assert manager.data_version() == 3
+
+    assert manager.update_coffee(coffee_id, roasting_level="Medium")
+    assert manager.data_version() == 4
+
+    # Writes that change nothing keep the version
+    assert not manager.update_coffee(str(coffee_manager.ObjectId()), roasting_level="Dark")
+    assert manager.bulk_add_coffees([{"coffee_name": "Broken"}])["failed_count"] == 1
+    assert manager.data_version() == 4
+
+    assert manager.delete_coffee(coffee_id)
+    assert not manager.delete_coffee(coffee_id)
+    assert manager.data_version() == 5
+
+
+class RecordingCursor:
+    """Stands in for a pymongo cursor, recording how it was shaped."""
+
+    def __init__(self, query, projection, documents):
+        self.calls = {"query": query, "projection": projection}
+        self.documents = documents
+
+    def batch_size(self, size):
+        return self
+
+    def sort(self, sort):
+        self.calls["sort"] = sort
+        return self
+
+    def limit(self, limit):
+        self.calls["limit"] = limit
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def close(self):
+        pass
+
+
+def test_text_search(manager, monkeypatch):
+    """text_search sends a $text query sorted by relevance and returns the scores."""
+    # mongomock does not implement $text, so record the cursor the query would run
+    cursors = []
+
+    def find(query, projection=None):
+        cursors.append(RecordingCursor(query, projection, [{"_id": coffee_manager.ObjectId(), "score": 1.5}]))
+        return cursors[-1]
+
+    monkeypatch.setattr(manager.collection, "find", find)
+
+    results = manager.text_search("caramel spice", limit=5, projection={"coffee_name": 1})
+
+    assert cursors[0].calls == {
+        "query": {"$text": {"$search": "caramel spice"}},
+        "projection": {"coffee_name": 1, "score": {"$meta": "textScore"}},
+        "sort": coffee_manager.TEXT_SCORE_SORT,
+        "limit": 5,
+    }
+    assert isinstance(results[0]["_id"], str)
+    assert results[0]["score"] == 1.5
+
+
+def test_registry_accepts_nested_options(registry):
+    """Options holding dicts still form a registry key; equal options share a client."""
+    options = {"driver": {"name": "sammy"}, "compressors": ["zlib"]}
+    client = registry.acquire("mongodb://localhost:27017/", options)
+    assert registry.acquire("mongodb://localhost:27017/", dict(options)) is client
+    assert registry.stats()[0]["options"]["driver"] == {"name": "sammy"}
+    assert "socketTimeoutMS" not in registry.stats()[0]["options"]
+
+
+def test_registry_pings_outside_the_lock(registry, monkeypatch):
+    """A new client is pinged without holding the registry lock."""
+    lock_held = []
+
+    class PingingClient(mongomock.MongoClient):
+        def __getitem__(self, name):
+            database = super().__getitem__(name)
+            if name == "admin":
+                monkeypatch.setattr(database, "command", lambda *args: lock_held.append(registry._lock.locked()))
+            return database
+
+    monkeypatch.setattr(coffee_manager, "MongoClient", PingingClient)
+    registry.acquire("mongodb://localhost:27017/")
+    assert lock_held == [False]
+
+
+def test_semantic_search_catches_up_with_other_writers(registry, tmp_path):
+    """A write made by another manager (or process) is found by the next semantic_search()."""
+    pytest.importorskip("numpy")
+    reader = CoffeeDataManager(database_name="coffee_db_test")
+    writer = CoffeeDataManager(database_name="coffee_db_test")
+    reader.bulk_add_coffees(SAMPLE_COFFEES)
+    reader.enable_semantic_index(path=str(tmp_path))
+
+    # The writer's own index is open on the same files
+    writer.enable_semantic_index(path=str(tmp_path))
+    writer.add_coffee("Panama Geisha", "Light", "Fine", "1:16", "Jasmine and bergamot")
+    assert reader.semantic_search("jasmine bergamot", k=1)[0]["coffee_name"] == "Panama Geisha"
+
+    # Without an index, the writer's change forces a rebuild on the reader's next search
+    writer.semantic_index = None
+    writer.add_coffee("Kenya AA", "Light", "Fine", "1:16", "Blackcurrant and tomato")
+    assert reader.semantic_search("blackcurrant tomato", k=1)[0]["coffee_name"] == "Kenya AA"
+    assert reader.semantic_index.data_version == reader.data_version()
+
+    reader.close()
+    writer.close()
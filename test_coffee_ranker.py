@@ -0,0 +1,58 @@
+"""
+Tests for local experiment ranking.
+"""
+
+from coffee_ranker import rank_coffees, score_coffee
+
+
+CATALOG = [
+    {"_id": "1", "coffee_name": "Ethiopian Yirgacheffe - Batch 001", "roasting_level": "Light",
+     "grinding_level": "Fine", "tasting_notes": "Floral and bright. Bitterness: Low. Sourness: High.",
+     "profile": {"bitterness": "low", "sourness": "high"}, "ratio_water_per_gram": 16.0},
+    {"_id": "2", "coffee_name": "Colombian Supremo - Batch 001", "roasting_level": "Medium",
+     "grinding_level": "Medium", "tasting_notes": "Chocolate and nuts. Bitterness: Medium. Sourness: Medium.",
+     "profile": {"bitterness": "medium", "sourness": "medium"}, "ratio_water_per_gram": 15.0},
+    {"_id": "3", "coffee_name": "Sumatra Mandheling - Batch 001", "roasting_level": "Medium-Dark",
+     "grinding_level": "Coarse", "tasting_notes": "Earthy and herbal. Bitterness: High. Sourness: Low.",
+     "profile": {"bitterness": "high", "sourness": "low"}, "ratio_water_per_gram": 14.0},
+]
+
+
+def _names(ranked):
+    return [coffee["coffee_name"].split(" ")[0] for _, coffee in ranked]
+
+
+def test_best_match_first():
+    """Matching more preferences ranks a coffee higher."""
+    ranked = rank_coffees({"origin": "Ethiopian", "roasting_level": "Light", "flavor_notes": "Floral"}, CATALOG)
+    assert _names(ranked) == ["Ethiopian"]
+
+    ranked = rank_coffees({"sourness": "Low", "roasting_level": "Dark"}, CATALOG)
+    assert _names(ranked) == ["Sumatra", "Colombian"]
+
+
+def test_partial_credit():
+    """Neighbouring profile levels and compound roast levels earn partial credit."""
+    assert score_coffee({"roasting_level": "Dark"}, CATALOG[2]) == 1.5
+    assert score_coffee({"bitterness": "High"}, CATALOG[1]) == 1.0
+    assert score_coffee({"bitterness": "High"}, CATALOG[0]) == 0.0
+
+
+def test_brew_strength_prefers_less_water():
+    """"Strong" favours the lowest water-per-gram ratio in the catalog."""
+    assert _names(rank_coffees({"brew_strength": "Strong"}, CATALOG, k=2)) == ["Sumatra", "Colombian"]
+    assert _names(rank_coffees({"brew_strength": "Mild"}, CATALOG, k=1)) == ["Ethiopian"]
+
+
+def test_no_preferences_or_matches():
+    """Nothing is selected without a matching preference."""
+    assert rank_coffees({}, CATALOG) == []
+    assert rank_coffees({"origin": "Kenyan"}, CATALOG) == []
+
+
+def test_ties_are_deterministic():
+    """Equal scores are ordered by name, regardless of catalog order."""
+    preferences = {"grinding_level": "Medium"}
+    catalog = CATALOG + [{**CATALOG[1], "_id": "4", "coffee_name": "Brazilian Santos - Batch 001"}]
+    assert _names(rank_coffees(preferences, catalog)) == _names(rank_coffees(preferences, catalog[::-1])) == \
+        ["Brazilian", "Colombian"]
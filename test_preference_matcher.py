@@ -0,0 +1,74 @@
+"""
+Tests for preference extraction.
+"""
+
+import pytest
+
+import preference_matcher
+from preference_matcher import extract_preferences
+
+
+def test_extracts_each_preference():
+    """Keywords map to preference values, with explanations."""
+    preferences, reasoning = extract_preferences("Any fruity Kenyan light roast for my V60? Not bitter")
+    assert preferences == {
+        "roasting_level": "Light",
+        "bitterness": "Low",
+        "brewing_method": "Pour Over",
+        "flavor_notes": "Fruity/Citrus",
+        "origin": "Kenyan"
+    }
+    assert len(reasoning) == len(preferences)
+
+
+def test_whole_words_only():
+    """Keywords no longer match inside other words."""
+    preferences, _ = extract_preferences("An espresso please")
+    assert preferences["brewing_method"] == "Espresso"
+    assert extract_preferences("Darkness in the highlights")[0] == {}
+
+
+@pytest.mark.parametrize("query, preference, value", [
+    ("something darker", "roasting_level", "Dark"),
+    ("a lighter roast", "roasting_level", "Light"),
+    ("a bolder cup", "roasting_level", "Dark"),
+    ("finer grind", "grinding_level", "Fine"),
+    ("coarsest setting", "grinding_level", "Coarse"),
+    ("more chocolatey", "flavor_notes", "Chocolate/Nutty"),
+    ("smoother please", "bitterness", "Low"),
+])
+def test_inflected_forms_match(query, preference, value):
+    """Comparatives, superlatives and -y adjectives count as their keyword."""
+    assert extract_preferences(query)[0][preference] == value
+
+
+def test_contained_keywords_still_match():
+    """A longer keyword also counts as the keywords inside it."""
+    preferences, _ = extract_preferences("My french press brew is too strong")
+    assert preferences["grinding_level"] == "Coarse"
+    assert preferences["brewing_method"] == "French Press"
+    assert preferences["brew_strength"] == "Mild"
+    assert preferences["bitterness"] == "High"
+
+
+def test_noun_forms_match():
+    """The nouns count like the substring scan made them count before whole-word matching."""
+    assert extract_preferences("bitterness is high")[0] == {"bitterness": "High"}
+    assert extract_preferences("low sourness please")[0] == {"sourness": "Low"}
+    assert extract_preferences("sourness matters most")[0] == {"sourness": "High"}
+
+
+def test_rule_priority():
+    """The first matching rule for a preference wins."""
+    assert extract_preferences("light or dark?")[0]["roasting_level"] == "Light"
+    assert extract_preferences("smooth but bitter")[0]["bitterness"] == "Low"
+
+
+def test_memoized_results_are_copies():
+    """Repeated queries hit the memo and callers cannot corrupt it."""
+    preference_matcher.clear_cache()
+    first, _ = extract_preferences("Medium roast")
+    first["roasting_level"] = "Changed"
+    second, _ = extract_preferences("MEDIUM ROAST")
+    assert second == {"roasting_level": "Medium"}
+    assert preference_matcher.cache_info().hits == 1
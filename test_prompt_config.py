@@ -0,0 +1,103 @@
+"""
+Tests for the cached, hot-reloading prompt configuration loader.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from prompt_config import DEFAULT_PROMPTS, PROMPTS_PATH, PromptConfigLoader
+
+
+def _write_prompts(path, role, bump=0):
+    """Write a prompt file and move its modification time forward by bump seconds."""
+    path.write_text(f'DEFAULT_MODEL = "test/model"\nSAMMY_PROMPTS = {{"role": "{role}", "max_iter": 2}}\n',
+                    encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+
+
+def test_loads_once_and_caches(tmp_path):
+    """The file is executed once; later calls return the same mapping."""
+    path = tmp_path / "prompts.py"
+    _write_prompts(path, "Barista")
+    loader = PromptConfigLoader(str(path))
+
+    config = loader.get()
+    assert config["role"] == "Barista"
+    assert config["DEFAULT_MODEL"] == "test/model"
+    assert config["goal"] == DEFAULT_PROMPTS["goal"]  # Not in the file, so the default applies
+    assert all(loader.get() is config for _ in range(100))
+    assert loader.stats()["loads"] == 1
+
+
+def test_reloads_when_file_changes(tmp_path):
+    """An edit is picked up on the next call; the cached mapping is read-only."""
+    path = tmp_path / "prompts.py"
+    _write_prompts(path, "Barista")
+    loader = PromptConfigLoader(str(path))
+    first = loader.get()
+
+    _write_prompts(path, "Roaster", bump=5)
+    second = loader.get()
+    assert second is not first and second["role"] == "Roaster"
+    assert loader.stats()["loads"] == 2
+
+    with pytest.raises(TypeError):
+        second["role"] = "Changed"
+    assert loader.get()["role"] == "Roaster"
+
+
+def test_broken_edit_keeps_previous_prompts(tmp_path):
+    """A file that fails to execute does not replace the working configuration."""
+    path = tmp_path / "prompts.py"
+    _write_prompts(path, "Barista")
+    loader = PromptConfigLoader(str(path))
+    config = loader.get()
+
+    path.write_text("SAMMY_PROMPTS = {", encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 * 1_000_000_000))
+    assert loader.get() is config
+    assert loader.get() is config
+    assert loader.stats()["errors"] == 1
+
+
+def test_missing_file_uses_defaults(tmp_path):
+    assert dict(PromptConfigLoader(str(tmp_path / "missing.py")).get()) == DEFAULT_PROMPTS
+
+
+def test_concurrent_callers_share_one_load(tmp_path):
+    """Threads racing on a changed file execute it once between them."""
+    path = tmp_path / "prompts.py"
+    _write_prompts(path, "Barista")
+    loader = PromptConfigLoader(str(path))
+    loader.get()
+    _write_prompts(path, "Roaster", bump=5)
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append(loader.get())
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result is results[0] for result in results)
+    assert loader.stats()["loads"] == 2
+
+
+def test_prompt_file_found_from_any_directory(tmp_path):
+    """The default path is next to the module, not in the working directory."""
+    code = "from prompt_config import prompt_loader; print(prompt_loader.get()['DEFAULT_MODEL'])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path), capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": os.path.dirname(PROMPTS_PATH)})
+    assert result.returncode == 0
+    assert "not found" not in result.stdout
+    assert result.stdout.strip().splitlines()[-1]
@@ -0,0 +1,73 @@
+"""
+Tests for the compact prompt table renderer.
+"""
+
+from prompt_renderer import CATALOG_COLUMNS, count_tokens, level_codes, render_table
+
+
+COFFEES = [
+    {"_id": "a1", "coffee_name": "Ethiopian Yirgacheffe", "roasting_level": "Light", "grinding_level": "Fine",
+     "brewing_ratio": "1:16", "tasting_notes": "Jasmine | lemon\nSourness: High"},
+    {"_id": "b2", "coffee_name": "Colombian Supremo", "roasting_level": "Medium", "grinding_level": "Medium",
+     "brewing_ratio": "1:15", "tasting_notes": "Chocolate and caramel"},
+    {"_id": "c3", "coffee_name": "Sumatra Mandheling", "roasting_level": "Medium-Dark", "grinding_level": None,
+     "brewing_ratio": "1:14", "tasting_notes": "Earthy cedar"},
+]
+
+
+def _words(text):
+    return len(text.split())
+
+
+def test_renders_header_legend_and_rows():
+    """One line per coffee, field names once, levels replaced by codes."""
+    table = render_table(COFFEES, token_budget=None)
+    assert table["text"].splitlines() == [
+        "roasting_level codes: L=Light, M=Medium, MD=Medium-Dark",
+        "grinding_level codes: F=Fine, M=Medium",
+        "experiment_id | coffee_name | roasting_level | grinding_level | brewing_ratio | tasting_notes",
+        "a1 | Ethiopian Yirgacheffe | L | F | 1:16 | Jasmine / lemon Sourness: High",
+        "b2 | Colombian Supremo | M | M | 1:15 | Chocolate and caramel",
+        "c3 | Sumatra Mandheling | MD | - | 1:14 | Earthy cedar",
+    ]
+    assert (table["rows"], table["dropped"]) == (3, 0)
+
+
+def test_smaller_than_repr():
+    """The table costs far fewer tokens than the list of dicts it replaces."""
+    rows = [dict(coffee, _id=f"65a1b2c3d4e5f6a7b8c9d0{i:02d}") for i, coffee in enumerate(COFFEES * 10)]
+    verbose = [{"experiment_id": row["_id"], **{key: value for key, value in row.items() if key != "_id"}}
+               for row in rows]
+    assert render_table(rows, token_budget=None)["tokens"] < count_tokens(str(verbose)) * 0.7
+
+
+def test_budget_drops_last_rows():
+    """Rows past the budget are dropped from the end and the count stays within it."""
+    full = render_table(COFFEES, CATALOG_COLUMNS, token_budget=None, counter=_words)
+    trimmed = render_table(COFFEES, CATALOG_COLUMNS, token_budget=full["tokens"] - 1, counter=_words)
+    assert trimmed["rows"] == 2 and trimmed["dropped"] == 1
+    assert trimmed["tokens"] <= full["tokens"] - 1
+    assert "Sumatra" not in trimmed["text"]
+    assert render_table(COFFEES, CATALOG_COLUMNS, token_budget=1, counter=_words)["rows"] == 0
+
+
+def test_legend_covers_included_rows_only():
+    """Codes used only by dropped rows are left out of the legend and the token count."""
+    full = render_table(COFFEES, CATALOG_COLUMNS, token_budget=None, counter=_words)
+    two_rows = render_table(COFFEES[:2], CATALOG_COLUMNS, token_budget=None, counter=_words)
+    trimmed = render_table(COFFEES, CATALOG_COLUMNS, token_budget=two_rows["tokens"], counter=_words)
+
+    assert trimmed["rows"] == 2
+    assert "MD=Medium-Dark" in full["text"] and "MD=" not in trimmed["text"]
+    assert trimmed["tokens"] == _words(trimmed["text"]) <= two_rows["tokens"]
+
+
+def test_level_codes_are_unique():
+    codes = level_codes(["Medium", "Mild", "Medium-Dark", "Light"])
+    assert len(set(codes.values())) == 4
+    assert codes["Light"] == "L" and codes["Medium-Dark"] == "MD"
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("Colombian Supremo | M | 1:15") < 20
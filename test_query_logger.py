@@ -0,0 +1,132 @@
+"""
+Tests for the background JSONL query logger.
+"""
+
+import glob
+import gzip
+import json
+import os
+import threading
+
+import query_logger
+from query_logger import QueryLogger
+
+
+def _read_events(path):
+    with open(path, "r", encoding="utf-8") as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def test_close_writes_queued_events(tmp_path):
+    """Events are written in order, and close() flushes whatever is still queued."""
+    logger = QueryLogger(str(tmp_path), flush_interval=60)
+    for i in range(25):
+        assert logger.log({"query_type": "RANKING", "n": i})
+    logger.close()
+
+    assert [event["n"] for event in _read_events(logger.path)] == list(range(25))
+    assert logger.stats()["written"] == 25
+    assert not logger.log({"n": 25})
+
+
+def test_non_json_values_are_stringified(tmp_path):
+    """Values such as ObjectIds or datetimes do not break the writer."""
+    logger = QueryLogger(str(tmp_path))
+    logger.log({"database_id": object.__new__(type("Id", (), {"__str__": lambda self: "abc"}))})
+    logger.close()
+    assert _read_events(logger.path) == [{"database_id": "abc"}]
+
+
+def test_size_rotation_gzips_old_files(tmp_path):
+    """Once the active file is too large it is moved aside and compressed."""
+    logger = QueryLogger(str(tmp_path), max_bytes=200, batch_size=1, flush_interval=0.01)
+    for i in range(20):
+        logger.log({"user_query": f"query number {i}", "padding": "x" * 40})
+    logger.close()
+
+    rotated = sorted(glob.glob(os.path.join(str(tmp_path), "sammy_queries-*.jsonl.gz")))
+    assert rotated and logger.stats()["rotations"] == len(rotated)
+    events = []
+    for path in rotated:
+        with gzip.open(path, "rt", encoding="utf-8") as log_file:
+            events.extend(json.loads(line) for line in log_file)
+    events.extend(_read_events(logger.path))
+    assert sorted(event["user_query"] for event in events) == sorted(f"query number {i}" for i in range(20))
+
+
+def test_full_queue_drops_events(tmp_path):
+    """log() never waits on the writer: extra events are dropped and counted."""
+    logger = QueryLogger(str(tmp_path), queue_size=2, batch_size=1)
+    stalled = threading.Event()
+    original_write = logger._write
+    logger._write = lambda batch: (stalled.wait(5), original_write(batch))
+
+    results = [logger.log({"n": i}) for i in range(10)]
+    assert results.count(False) >= 7
+    assert logger.stats()["dropped"] == results.count(False)
+
+    stalled.set()
+    logger.close()
+    assert len(_read_events(logger.path)) == results.count(True)
+
+
+def _read_all_events(directory):
+    """Events from the rotated (gzip and plain) files and the active file of a log directory."""
+    events = []
+    for path in glob.glob(os.path.join(directory, "sammy_queries-*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as log_file:
+            events.extend(json.loads(line) for line in log_file)
+    for path in glob.glob(os.path.join(directory, "sammy_queries*.jsonl")):
+        events.extend(_read_events(path))
+    return events
+
+
+def test_rotation_failure_keeps_logging(tmp_path, monkeypatch):
+    """If compressing a rotated file fails, the logger reopens the active file and keeps writing."""
+    logger = QueryLogger(str(tmp_path), max_bytes=100, batch_size=1, flush_interval=0.01)
+    failures = []
+
+    def failing_gzip_open(*args, **kwargs):
+        failures.append(args[0])
+        raise OSError("disk full")
+
+    monkeypatch.setattr(query_logger.gzip, "open", failing_gzip_open)
+    for i in range(10):
+        logger.log({"n": i, "padding": "x" * 40})
+    logger.close()
+
+    assert failures
+    assert logger.stats()["errors"] == len(failures)
+    assert logger.stats()["written"] == 10
+    assert sorted(event["n"] for event in _read_all_events(str(tmp_path))) == list(range(10))
+
+
+def test_loggers_share_a_directory(tmp_path):
+    """Two loggers on one file (as two processes would be) lose no events when either rotates."""
+    loggers = [QueryLogger(str(tmp_path), max_bytes=500, batch_size=1, flush_interval=0.01) for _ in range(2)]
+    for i in range(50):
+        for number, logger in enumerate(loggers):
+            logger.log({"logger": number, "n": i, "padding": "x" * 20})
+    for logger in loggers:
+        logger.close()
+
+    assert sum(logger.stats()["rotations"] for logger in loggers) > 1
+    events = _read_all_events(str(tmp_path))
+    assert sorted((event["logger"], event["n"]) for event in events) == \
+        sorted((number, i) for number in range(2) for i in range(50))
+
+
+def test_age_rotation_survives_restarts(tmp_path):
+    """The active file's age is kept in the lock file, so a restarted logger still rotates it."""
+    logger = QueryLogger(str(tmp_path), rotate_seconds=60)
+    logger.log({"n": 0})
+    logger.close()
+    started = os.stat(logger.lock_path).st_mtime
+    os.utime(logger.lock_path, (started - 120, started - 120))
+
+    restarted = QueryLogger(str(tmp_path), rotate_seconds=60)
+    restarted.log({"n": 1})
+    restarted.close()
+
+    assert restarted.stats()["rotations"] == 1
+    assert _read_events(restarted.path) == [{"n": 1}]
@@ -0,0 +1,94 @@
+"""
+Tests for the LLM response cache backends.
+"""
+
+import time
+
+import pytest
+
+from response_cache import MemoryResponseCache, SQLiteResponseCache, prompt_fingerprint
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    """Factory for each cache backend."""
+    def make(**options):
+        if request.param == "memory":
+            return MemoryResponseCache(**options)
+        return SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), **options)
+    return make
+
+
+def test_fingerprint_depends_on_every_input():
+    """Changing the model, prompt or data version changes the key."""
+    base = prompt_fingerprint("model", "prompt", "1")
+    assert base == prompt_fingerprint("model", "prompt", "1")
+    assert base != prompt_fingerprint("other-model", "prompt", "1")
+    assert base != prompt_fingerprint("model", "other prompt", "1")
+    assert base != prompt_fingerprint("model", "prompt", "2")
+
+
+def test_hits_misses_and_lru_eviction(make_cache):
+    """The least recently used entry is evicted once the cache is full."""
+    cache = make_cache(max_entries=2, ttl_seconds=None)
+    cache.set("a", "A")
+    time.sleep(0.01)
+    cache.set("b", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"
+    time.sleep(0.01)
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_entries_expire_after_ttl(make_cache):
+    """Entries older than the TTL are treated as misses."""
+    cache = make_cache(ttl_seconds=0.05)
+    cache.set("a", "A")
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sqlite_inserts_do_not_count_the_table(tmp_path):
+    """Eviction uses the tracked row count; replacing a key does not evict anything."""
+    cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=10, ttl_seconds=None)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+
+    for i in range(30):
+        cache.set(f"key{i}", "value")
+    cache.set("key29", "new value")
+    assert not any("COUNT" in statement for statement in statements)
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (10, 20)
+    assert cache.get("key29") == "new value"
+
+
+def test_sqlite_hits_do_not_write(tmp_path):
+    """Hits are read-only; their recency is saved with the next insert and still drives eviction."""
+    cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl_seconds=None)
+    cache.set("a", "A")
+    time.sleep(0.01)
+    cache.set("b", "B")
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+
+    time.sleep(0.01)
+    assert cache.get("a") == "A"
+    assert not any(statement.startswith(("UPDATE", "COMMIT")) for statement in statements)
+
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
@@ -0,0 +1,225 @@
+"""
+Tests for SammyTheSpartanBarista's chat pipeline, with CrewAI and the LLM client
+replaced by stubs and MongoDB by the in-process mongomock stand-in.
+"""
+
+import asyncio
+import importlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+from pymongo.errors import OperationFailure
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+
+import coffee_manager
+import semantic_index
+
+
+COFFEES = [
+    {"coffee_name": "Ethiopian Yirgacheffe", "roasting_level": "Light", "grinding_level": "Fine",
+     "brewing_ratio": "1:16", "tasting_notes": "Jasmine and lemon. Bitterness: Low. Sourness: High."},
+    {"coffee_name": "Colombian Supremo", "roasting_level": "Medium", "grinding_level": "Medium",
+     "brewing_ratio": "1:15", "tasting_notes": "Chocolate and caramel. Bitterness: Medium. Sourness: Low."},
+    {"coffee_name": "Sumatra Mandheling", "roasting_level": "Dark", "grinding_level": "Coarse",
+     "brewing_ratio": "1:14", "tasting_notes": "Earthy cedar. Bitterness: High. Sourness: Low."},
+]
+
+# Token usage every stub crew reports for its run
+USAGE_METRICS = {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150}
+
+
+class StubAgent:
+    """Records its settings and the thread it was built on."""
+
+    def __init__(self, **settings):
+        self.__dict__.update(settings)
+        self.thread_name = threading.current_thread().name
+
+
+class StubTask:
+    def __init__(self, description, expected_output, agent):
+        self.description = description
+        self.expected_output = expected_output
+        self.agent = agent
+
+
+class StubCrew:
+    """Answers each task with StubCrew.answer(task), recording the calls and how many run at once."""
+
+    answer = staticmethod(lambda task: "Stub answer")
+    delay = 0.0
+    tasks = []
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def __init__(self, agents, tasks, process, verbose):
+        self.task = tasks[0]
+        self.usage_metrics = None
+
+    def kickoff(self):
+        with StubCrew.lock:
+            StubCrew.tasks.append(self.task)
+            StubCrew.in_flight += 1
+            StubCrew.max_in_flight = max(StubCrew.max_in_flight, StubCrew.in_flight)
+        try:
+            time.sleep(StubCrew.delay)
+            self.usage_metrics = dict(USAGE_METRICS)
+            return StubCrew.answer(self.task)
+        finally:
+            with StubCrew.lock:
+                StubCrew.in_flight -= 1
+
+
+def _no_change_streams(collection, *args, **kwargs):
+    raise OperationFailure("The $changeStream stage is only supported on replica sets")
+
+
+@pytest.fixture
+def sammy_agent(monkeypatch, tmp_path):
+    """sammy_agent imported against stub crewai/langchain_openai modules and a seeded mongomock database."""
+    crewai = types.ModuleType("crewai")
+    crewai.Agent, crewai.Task, crewai.Crew = StubAgent, StubTask, StubCrew
+    crewai.Process = types.SimpleNamespace(sequential="sequential")
+    langchain_openai = types.ModuleType("langchain_openai")
+    langchain_openai.ChatOpenAI = lambda **settings: types.SimpleNamespace(**settings)
+    monkeypatch.setitem(sys.modules, "crewai", crewai)
+    monkeypatch.setitem(sys.modules, "langchain_openai", langchain_openai)
+    monkeypatch.delitem(sys.modules, "sammy_agent", raising=False)
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(coffee_manager, "MongoClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(coffee_manager, "client_registry", coffee_manager.MongoClientRegistry())
+    monkeypatch.setattr(coffee_manager, "database_settings",
+                        lambda: {"connection_string": "mongodb://stub", "database_name": "agent_test",
+                                 "collection_name": "coffees"})
+    # mongomock implements neither collStats (read by ensure_indexes()) nor change streams, so
+    # report no index sizes and refuse streams as a standalone mongod does (the catalog cache polls)
+    monkeypatch.setattr(coffee_manager.CoffeeDataManager, "_get_index_sizes", lambda self: {})
+    monkeypatch.setattr(mongomock.collection.Collection, "watch", _no_change_streams, raising=False)
+    monkeypatch.setattr(semantic_index, "DEFAULT_INDEX_PATH", str(tmp_path / "semantic_index"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(StubCrew, "answer", staticmethod(lambda task: "Stub answer"))
+    monkeypatch.setattr(StubCrew, "tasks", [])
+    monkeypatch.setattr(StubCrew, "max_in_flight", 0)
+
+    seed = coffee_manager.CoffeeDataManager(database_name="agent_test")
+    seed.bulk_add_coffees(COFFEES)
+    seed.close()
+
+    module = importlib.import_module("sammy_agent")
+    yield module
+    sys.modules.pop("sammy_agent", None)
+
+
+@pytest.fixture
+def make_sammy(sammy_agent):
+    """Build agents on the stubs, closing them after the test."""
+    created = []
+
+    def make(**options):
+        sammy = sammy_agent.SammyTheSpartanBarista(openrouter_api_key="test-key", model_name="test/model",
+                                                   **options)
+        created.append(sammy)
+        return sammy
+
+    yield make
+    for sammy in created:
+        sammy.close()
+
+
+def _prompt_rows(task):
+    """Coffee names listed in a task prompt's experiments table, in prompt order."""
+    names = [coffee["coffee_name"] for coffee in COFFEES if coffee["coffee_name"] in task.description]
+    return sorted(names, key=task.description.index)
+
+
+def test_chat_ranks_experiments_locally(make_sammy):
+    """A chat makes one LLM call, with the locally ranked best match first in the prompt."""
+    sammy = make_sammy(cache_responses=False)
+
+    assert sammy.chat_with_sammy("A light roast with high sourness, please") == "Stub answer"
+    assert sammy.chat_with_sammy("Dark roast, coarse grind for my french press") == "Stub answer"
+
+    light, dark = StubCrew.tasks
+    assert _prompt_rows(light)[0] == "Ethiopian Yirgacheffe"
+    assert _prompt_rows(dark)[0] == "Sumatra Mandheling"
+    assert light.agent is dark.agent  # The sync methods share one agent
+
+
+def test_usage_accounting(make_sammy):
+    """chat_with_usage() reports the crew's tokens; a repeated question is served from the cache."""
+    sammy = make_sammy()
+
+    first = sammy.chat_with_usage("Something dark and earthy")
+    assert first["response"] == "Stub answer"
+    assert first["usage"]["llm_calls"] == 1 and first["usage"]["cached_calls"] == 0
+    assert first["usage"]["total_tokens"] == USAGE_METRICS["total_tokens"]
+    assert first["usage"]["rendered_prompt_tokens"] > 0
+    assert "llm.chat" in first["timings"]
+
+    second = sammy.chat_with_usage("Something dark and earthy")
+    assert second["usage"]["llm_calls"] == 0 and second["usage"]["cached_calls"] == 1
+    assert second["usage"]["total_tokens"] == 0
+    assert len(StubCrew.tasks) == 1
+    assert sammy.response_cache.stats()["hits"] == 1
+
+
+def test_async_chats_are_capped_and_get_their_own_agent(make_sammy, monkeypatch):
+    """At most max_concurrent_chats run at once, each with an agent built on its worker thread."""
+    monkeypatch.setattr(StubCrew, "delay", 0.05)
+    sammy = make_sammy(max_concurrent_chats=2, cache_responses=False)
+    questions = [f"Question {i} about a medium roast" for i in range(6)]
+
+    answers = asyncio.run(sammy.achat_many(questions))
+
+    assert answers == ["Stub answer"] * 6
+    assert StubCrew.max_in_flight == 2
+    agents = {id(task.agent) for task in StubCrew.tasks}
+    assert len(agents) == 6
+    assert all(task.agent.thread_name.startswith("sammy-chat") for task in StubCrew.tasks)
+    assert sammy._agent is None  # The shared agent is only built by the sync methods
+
+
+def test_async_usage_is_per_chat(make_sammy):
+    """Concurrent achat_with_usage() calls each report their own usage."""
+    sammy = make_sammy(max_concurrent_chats=4, cache_responses=False)
+
+    async def ask_all():
+        return await asyncio.gather(*(sammy.achat_with_usage(f"Dark roast question {i}") for i in range(4)))
+
+    for result in asyncio.run(ask_all()):
+        assert result["usage"]["llm_calls"] == 1
+        assert result["usage"]["total_tokens"] == USAGE_METRICS["total_tokens"]
+
+
+def test_llm_selection_fallback(make_sammy, monkeypatch):
+    """With no local match, the LLM picks experiments by ID when the fallback is enabled."""
+    sammy = make_sammy(llm_selection_fallback=True, cache_responses=False)
+    sumatra = sammy.coffee_manager.get_coffee_by_name("Sumatra Mandheling")
+    monkeypatch.setattr(StubCrew, "answer", staticmethod(
+        lambda task: f'["{sumatra["_id"]}"]' if "select up to 10" in task.description else "Stub answer"))
+    # Nothing ranks or reads like this question
+    monkeypatch.setattr(sammy.coffee_manager, "semantic_search", lambda *args, **kwargs: [])
+
+    assert sammy.chat_with_sammy("Tell me something") == "Stub answer"
+
+    selection, answer = StubCrew.tasks
+    assert "select up to 10" in selection.description
+    assert _prompt_rows(answer) == ["Sumatra Mandheling"]
+
+
+def test_no_fallback_without_the_option(make_sammy, monkeypatch):
+    """Without the fallback, an unmatched chat still makes only the answering call."""
+    sammy = make_sammy(cache_responses=False)
+    monkeypatch.setattr(sammy.coffee_manager, "semantic_search", lambda *args, **kwargs: [])
+
+    sammy.chat_with_sammy("Tell me something")
+
+    assert len(StubCrew.tasks) == 1
+    assert _prompt_rows(StubCrew.tasks[0]) == []
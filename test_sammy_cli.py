@@ -0,0 +1,167 @@
+"""
+Tests for the CLI's fast startup, its batch mode (with a stub Sammy) and its
+database-only subcommands (stats, find, export), run against the in-process
+mongomock stand-in.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import coffee_manager
+import sammy_cli
+from benchmark_startup import SCENARIOS, loaded_modules
+
+
+COFFEES = [
+    {"coffee_name": "Ethiopian Yirgacheffe", "roasting_level": "Light", "grinding_level": "Fine",
+     "brewing_ratio": "1:16", "tasting_notes": "Jasmine and lemon. Sourness: High"},
+    {"coffee_name": "Colombian Supremo", "roasting_level": "Medium", "grinding_level": "Medium",
+     "brewing_ratio": "1:15", "tasting_notes": "Chocolate and caramel. Bitterness: Low"},
+    {"coffee_name": "Sumatra Mandheling", "roasting_level": "Dark", "grinding_level": "Coarse",
+     "brewing_ratio": "1:14", "tasting_notes": "Earthy cedar. Bitterness: High"},
+]
+
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_startup_skips_heavy_imports(scenario):
+    """The CLI and the database commands never load the agent stack."""
+    statement, forbidden = SCENARIOS[scenario]
+    assert not [module for module in loaded_modules(statement) if module.split(".")[0] in forbidden]
+
+
+def test_help_runs_without_agent_stack():
+    """--help works even where CrewAI is not installed."""
+    result = subprocess.run([sys.executable, "sammy_cli.py", "find", "--help"], capture_output=True, text=True)
+    assert result.returncode == 0
+    assert "--text" in result.stdout
+
+
+@pytest.fixture
+def run_cli(monkeypatch, capsys):
+    """Run a subcommand against a seeded mongomock database and return (exit code, stdout)."""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(coffee_manager, "MongoClient", lambda *args, **kwargs: client)
+    manager = coffee_manager.CoffeeDataManager(database_name="cli_test")
+    manager.bulk_add_coffees(COFFEES)
+    manager.close()
+    capsys.readouterr()
+
+    def run(*argv):
+        code = sammy_cli.db_main(argv[0], ["--database", "cli_test", *argv[1:]])
+        return code, capsys.readouterr().out
+
+    return run
+
+
+def test_stats(run_cli):
+    code, out = run_cli("stats")
+    assert code == 0
+    stats = json.loads(out)
+    assert stats["total_coffees"] == 3
+    assert set(stats["roasting_levels"]) == {"Light", "Medium", "Dark"}
+
+
+def test_find_with_filters(run_cli):
+    code, out = run_cli("find", "--roasting-level", "light", "--json")
+    assert code == 0
+    assert [json.loads(line)["coffee_name"] for line in out.splitlines()] == ["Ethiopian Yirgacheffe"]
+
+    code, out = run_cli("find", "--ratio-min", "15")
+    assert "Colombian Supremo" in out and "Ethiopian Yirgacheffe" in out and "Sumatra" not in out
+
+
+def test_export_streams_every_coffee(run_cli, tmp_path):
+    path = tmp_path / "coffees.json"
+    code, _ = run_cli("export", "--output", str(path), "--format", "json", "--fields", "coffee_name,brewing_ratio")
+    assert code == 0
+    exported = json.loads(path.read_text(encoding="utf-8"))
+    assert sorted(coffee["coffee_name"] for coffee in exported) == sorted(c["coffee_name"] for c in COFFEES)
+    assert set(exported[0]) == {"_id", "coffee_name", "brewing_ratio"}
+
+    code, out = run_cli("export", "--grinding-level", "coarse")
+    assert [json.loads(line)["coffee_name"] for line in out.splitlines()] == ["Sumatra Mandheling"]
+
+
+def test_iter_questions_ids_and_skipped_lines(capsys):
+    """Plain and JSON lines become questions; blank and malformed lines are skipped."""
+    lines = [
+        "Best light roast?\n",
+        "\n",
+        '{"id": "q-7", "question": "How fine for V60?"}\n',
+        '{"question": "Too sour?"}\n',
+        '{"id": "q-9"}\n',
+        "{not json\n",
+        "  Dark roast tips  \n",
+    ]
+    assert list(sammy_cli.iter_questions(lines)) == [
+        {"id": 1, "question": "Best light roast?"},
+        {"id": "q-7", "question": "How fine for V60?"},
+        {"id": 4, "question": "Too sour?"},
+        {"id": 7, "question": "Dark roast tips"},
+    ]
+    skipped = capsys.readouterr().err
+    assert "Skipping line 5" in skipped and "Skipping line 6" in skipped
+
+
+class StubSammy:
+    """Answers after a short delay, recording how many answers were in flight at once."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def achat_with_usage(self, question):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if question == "fail":
+                raise RuntimeError("LLM unavailable")
+            latency = float(question.split()[-1])
+            return {"response": f"Answer to {question}", "latency_seconds": latency,
+                    "usage": {"total_tokens": 10, "llm_calls": 1, "cached_calls": 0}}
+        finally:
+            self.in_flight -= 1
+
+
+def test_run_batch_caps_concurrency_and_summarizes():
+    """At most concurrency answers run at once; every answer is written and counted."""
+    sammy = StubSammy()
+    questions = [{"id": i, "question": f"question {i}"} for i in range(1, 21)] + [{"id": "bad", "question": "fail"}]
+    output = io.StringIO()
+
+    summary = asyncio.run(sammy_cli.run_batch(sammy, iter(questions), output, concurrency=3))
+
+    assert sammy.max_in_flight == 3
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(record["id"] for record in records if "error" not in record) == list(range(1, 21))
+    assert [record for record in records if "error" in record] == \
+        [{"id": "bad", "question": "fail", "error": "LLM unavailable"}]
+    assert summary["answered"] == 20
+    assert summary["failed"] == 1
+    assert summary["total_tokens"] == 200
+    assert summary["llm_calls"] == 20
+    assert summary["latency_p50_seconds"] == 10.5
+    assert summary["latency_p95_seconds"] == pytest.approx(19.05)
+
+
+def test_batch_mode_rejects_missing_file_before_starting_sammy(monkeypatch, capsys, tmp_path):
+    """A questions file that cannot be opened fails with a clean message and no agent start-up."""
+    monkeypatch.setattr(sammy_cli, "create_sammy", lambda args: pytest.fail("Sammy was started"))
+    args = argparse.Namespace(stdin=False, questions_file=str(tmp_path / "missing.jsonl"), output="-",
+                              concurrency=4, timings=False)
+
+    with pytest.raises(SystemExit) as exit_info:
+        sammy_cli.run_batch_mode(args)
+
+    assert exit_info.value.code == 1
+    error = capsys.readouterr().err
+    assert "cannot open" in error and "missing.jsonl" in error
@@ -0,0 +1,80 @@
+"""
+Tests for per-stage latency metrics.
+"""
+
+import threading
+
+import pytest
+
+from sammy_metrics import MetricsRegistry, format_breakdown, metrics, summarize_spans
+
+
+def test_spans_feed_histograms_and_counters():
+    """Every span lands in its stage histogram; failing spans also count an error."""
+    registry = MetricsRegistry()
+    for seconds in (0.002, 0.003, 0.2):
+        registry.observe("db.get_catalog", seconds)
+    with pytest.raises(ValueError):
+        with registry.span("llm.chat"):
+            raise ValueError("boom")
+    registry.increment("llm.chat.cache_hits", 2)
+
+    exported = registry.to_json()
+    catalog = exported["stages"]["db.get_catalog"]
+    assert catalog["count"] == 3
+    assert catalog["total_seconds"] == pytest.approx(0.205)
+    assert catalog["p50_ms"] == 5.0
+    assert catalog["max_ms"] == pytest.approx(200.0)
+    assert exported["stages"]["llm.chat"]["count"] == 1
+    assert exported["counters"] == {"llm.chat.cache_hits": 2, "llm.chat.errors": 1}
+
+
+def test_prometheus_export():
+    """Buckets are cumulative and +Inf equals the count."""
+    registry = MetricsRegistry()
+    registry.observe("chat", 0.004)
+    registry.observe("chat", 90.0)
+    registry.increment('odd"event')
+    text = registry.to_prometheus()
+
+    assert "# TYPE sammy_stage_duration_seconds histogram" in text
+    assert 'sammy_stage_duration_seconds_bucket{stage="chat",le="0.005"} 1' in text
+    assert 'sammy_stage_duration_seconds_bucket{stage="chat",le="60.0"} 1' in text
+    assert 'sammy_stage_duration_seconds_bucket{stage="chat",le="+Inf"} 2' in text
+    assert 'sammy_stage_duration_seconds_count{stage="chat"} 2' in text
+    assert 'sammy_events_total{event="odd\\"event"} 1' in text
+    assert text.endswith("\n")
+
+
+def test_trace_collects_this_threads_spans():
+    """A trace sees nested spans from its own thread only, innermost first."""
+    registry = MetricsRegistry()
+    with registry.trace() as spans:
+        with registry.span("chat"):
+            with registry.span("db.semantic_search"):
+                pass
+            other = threading.Thread(target=registry.observe, args=("log.write", 0.1))
+            other.start()
+            other.join()
+
+    assert [stage for stage, _ in spans] == ["db.semantic_search", "chat"]
+    summary = summarize_spans(spans)
+    assert summary["chat"]["count"] == 1
+    assert "chat" in format_breakdown(summary)
+    assert registry.to_json()["stages"]["log.write"]["count"] == 1
+
+
+def test_database_operations_are_timed():
+    """CoffeeDataManager methods record db.<method> spans."""
+    mongomock = pytest.importorskip("mongomock")
+    import coffee_manager
+
+    manager = coffee_manager.CoffeeDataManager.__new__(coffee_manager.CoffeeDataManager)
+    manager.collection = mongomock.MongoClient().coffee_db.coffees
+    manager.collection.insert_one({"coffee_name": "Kenya AA", "roasting_level": "Light"})
+
+    before = metrics.to_json()["stages"].get("db.get_coffee_with_query", {"count": 0})["count"]
+    with metrics.trace() as spans:
+        assert manager.get_coffee_with_query({"roasting_level": "light"})[0]["coffee_name"] == "Kenya AA"
+    assert metrics.to_json()["stages"]["db.get_coffee_with_query"]["count"] == before + 1
+    assert "db.get_coffee_with_query" in summarize_spans(spans)
@@ -0,0 +1,212 @@
+"""
+Tests for the Sammy HTTP server, run on localhost against a stub barista (no LLM or MongoDB).
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from sammy_server import SammyServer
+
+
+class StubBarista:
+    """Stands in for SammyTheSpartanBarista with canned, optionally slow, answers."""
+
+    def __init__(self, delay=0.0, release=None):
+        self.delay = delay
+        self.release = release
+        self.closed = False
+
+    def chat_with_usage(self, message):
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay)
+        return {"response": f"Stub answer to: {message}", "latency_seconds": self.delay,
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                          "llm_calls": 1, "cached_calls": 0}}
+
+    def get_coffee_recommendation(self, preferences):
+        return f"Try a {preferences.get('roasting_level', 'medium')} roast"
+
+    def analyze_coffee_profile(self, coffee_name):
+        return f"{coffee_name} is balanced"
+
+    def get_brewing_guide(self, brewing_method, coffee_type=None):
+        return f"Guide for {brewing_method}"
+
+    def get_stats(self):
+        return {"coffees": {"total_coffees": 3}}
+
+    def close(self):
+        self.closed = True
+
+
+def _request(server, method, path, body=None):
+    """Send a request and return (status, decoded JSON)."""
+    host, port = server.address
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _wait_ready(server):
+    for _ in range(100):
+        if server.ready:
+            return
+        time.sleep(0.01)
+    raise AssertionError("server did not become ready")
+
+
+@pytest.fixture
+def make_server():
+    """Start servers on free localhost ports and shut them down after the test."""
+    servers = []
+
+    def make(barista=None, **options):
+        server = SammyServer(lambda: barista or StubBarista(), host="127.0.0.1", port=0,
+                             access_log=False, **options).start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.shutdown()
+
+
+def test_endpoints(make_server):
+    """Every endpoint answers through the warm barista."""
+    server = make_server()
+    _wait_ready(server)
+
+    assert _request(server, "GET", "/health")[0] == 200
+    assert _request(server, "GET", "/ready")[1]["status"] == "ready"
+
+    status, payload = _request(server, "POST", "/chat", {"message": "Best light roast?"})
+    assert status == 200
+    assert payload["response"] == "Stub answer to: Best light roast?"
+    assert payload["usage"]["llm_calls"] == 1
+
+    assert _request(server, "POST", "/recommendation", {"preferences": {"roasting_level": "Dark"}})[1]["response"] \
+        == "Try a Dark roast"
+    assert _request(server, "POST", "/analysis", {"coffee_name": "Kenya AA"})[1]["response"] == "Kenya AA is balanced"
+    assert _request(server, "POST", "/brewing-guide", {"brewing_method": "V60"})[1]["response"] == "Guide for V60"
+
+    status, payload = _request(server, "GET", "/stats")
+    assert payload["coffees"]["total_coffees"] == 3
+    assert payload["server"]["served"] == 4
+
+
+def test_errors(make_server):
+    """Bad requests get 4xx responses with an error message."""
+    server = make_server()
+    _wait_ready(server)
+
+    assert _request(server, "POST", "/chat", {})[0] == 400
+    assert _request(server, "POST", "/recommendation", {"preferences": "dark"})[0] == 400
+    assert _request(server, "POST", "/recommendation", {"preferences": {"$where": "sleep(1000)"}})[0] == 400
+    assert _request(server, "POST", "/recommendation", {"preferences": {"roasting_level": {"$ne": ""}}})[0] == 400
+    assert _request(server, "POST", "/recommendation", {"preferences": {"ratio_min": "15"}})[0] == 400
+    assert _request(server, "POST", "/recommendation", {"preferences": {"ratio_max": True}})[0] == 400
+    assert _request(server, "POST", "/recommendation",
+                    {"preferences": {"sourness": "Low", "ratio_min": 15, "ratio_max": 16.5}})[0] == 200
+    assert _request(server, "GET", "/chat")[0] == 405
+    assert _request(server, "GET", "/nope")[0] == 404
+
+
+def test_server_errors_are_not_bad_requests(make_server):
+    """A ValueError raised inside the barista is a server error, not a 400."""
+    class FailingBarista(StubBarista):
+        def chat_with_usage(self, message):
+            raise ValueError("invalid literal for int()")
+
+    server = make_server(FailingBarista())
+    _wait_ready(server)
+    status, payload = _request(server, "POST", "/chat", {"message": "Best light roast?"})
+    assert status == 500 and "invalid literal" in payload["error"]
+
+
+def test_not_ready_until_warm():
+    """Requests are refused with 503 while the agent is being built."""
+    building = threading.Event()
+
+    def slow_factory():
+        building.wait(5)
+        return StubBarista()
+
+    server = SammyServer(slow_factory, host="127.0.0.1", port=0, access_log=False).start()
+    try:
+        assert _request(server, "GET", "/health")[0] == 200
+        assert _request(server, "GET", "/ready") == (503, {"status": "starting", "error": None})
+        assert _request(server, "POST", "/chat", {"message": "hi"})[0] == 503
+        building.set()
+        _wait_ready(server)
+        assert _request(server, "POST", "/chat", {"message": "hi"})[0] == 200
+    finally:
+        building.set()
+        server.shutdown()
+
+
+def test_queue_limit(make_server):
+    """Requests beyond the workers plus the queue are turned away."""
+    release = threading.Event()
+    server = make_server(StubBarista(release=release), workers=1, max_queue=1)
+    _wait_ready(server)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_request(server, "POST", "/chat", {"message": "q"})))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while server._load()["active"] + server._load()["queued"] < 2:
+        time.sleep(0.01)
+
+    status, payload = _request(server, "POST", "/chat", {"message": "one too many"})
+    assert status == 503
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert [status for status, _ in results] == [200, 200]
+
+
+def test_graceful_shutdown_finishes_in_flight_requests():
+    """shutdown() lets a running request complete, then closes the barista."""
+    barista = StubBarista(delay=0.3)
+    server = SammyServer(lambda: barista, host="127.0.0.1", port=0, access_log=False).start()
+    _wait_ready(server)
+
+    results = []
+    request = threading.Thread(target=lambda: results.append(_request(server, "POST", "/chat", {"message": "q"})))
+    request.start()
+    while server._load()["active"] == 0:
+        time.sleep(0.01)
+
+    server.shutdown()
+    request.join()
+    assert results[0][0] == 200
+    assert barista.closed
+
+
+def test_metrics_endpoint(make_server):
+    """Request latencies are exported in Prometheus text format and as JSON."""
+    server = make_server()
+    _wait_ready(server)
+    _request(server, "POST", "/chat", {"message": "hi"})
+
+    host, port = server.address
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=10) as response:
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        text = response.read().decode()
+    assert 'sammy_stage_duration_seconds_count{stage="http.chat"}' in text
+
+    status, payload = _request(server, "GET", "/metrics?format=json")
+    assert status == 200
+    assert payload["stages"]["http.chat"]["count"] >= 1
@@ -0,0 +1,104 @@
+"""
+Tests for the on-disk semantic index.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from semantic_index import SemanticIndex, embed
+
+
+COFFEES = [
+    ("1", "Ethiopian Guji Natural Blueberry jam, strawberry and winey sweetness"),
+    ("2", "Colombian Supremo Milk chocolate, roasted hazelnut and caramel"),
+    ("3", "Sumatra Mandheling Earthy, cedar and dark herbal tones"),
+]
+
+
+def test_embeddings_are_normalized_and_stable():
+    """The same text always gets the same unit-length vector."""
+    vector = embed("Blueberry jam")
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert np.array_equal(vector, embed("blueberry JAM!"))
+    assert not embed("the and with").any()
+
+
+def test_search_ranks_by_similarity(tmp_path):
+    """A description without exact field values finds the closest coffee."""
+    index = SemanticIndex(str(tmp_path))
+    index.rebuild(COFFEES, data_version=3)
+
+    hits = index.search("something like a jammy berry cup", k=2)
+    assert hits[0][0] == "1"
+    assert index.search("nutty chocolate", k=1)[0][0] == "2"
+    assert index.search("zzzz qqqq") == []
+
+
+def test_incremental_updates_and_persistence(tmp_path):
+    """Upserts, removals and the synced data version survive reopening the index."""
+    index = SemanticIndex(str(tmp_path))
+    index.rebuild(COFFEES, data_version=3)
+
+    index.upsert_many([("4", "Kenya AA Blackcurrant and tomato, juicy")], data_version=4)
+    index.upsert_many([("3", "Sumatra Mandheling Now bright lemon and lime")], data_version=5)
+    index.remove("1", data_version=6)
+
+    reopened = SemanticIndex(str(tmp_path))
+    assert len(reopened) == 3
+    assert reopened.data_version == 6
+    assert reopened.search("lemon", k=1)[0][0] == "3"
+    assert reopened.search("blackcurrant", k=1)[0][0] == "4"
+    assert "1" not in [coffee_id for coffee_id, _ in reopened.search("blueberry jam strawberry")]
+
+
+def test_missed_write_marks_index_stale(tmp_path):
+    """Skipping a data version leaves the index marked for rebuild."""
+    index = SemanticIndex(str(tmp_path))
+    index.rebuild(COFFEES, data_version=3)
+    index.upsert_many([("4", "Kenya AA")], data_version=5)
+    assert index.data_version is None
+
+
+def test_matrix_grows(tmp_path, monkeypatch):
+    """Adding more coffees than the allocated rows grows the matrix."""
+    monkeypatch.setattr("semantic_index.INITIAL_CAPACITY", 2)
+    index = SemanticIndex(str(tmp_path))
+    index.rebuild(COFFEES)
+    assert len(index) == 3
+    assert index.search("cedar herbal", k=1)[0][0] == "3"
+
+
+def test_single_writes_do_not_rewrite_the_id_map(tmp_path):
+    """IDs live in a fixed-width array; the JSON file only holds the count and version."""
+    index = SemanticIndex(str(tmp_path))
+    index.rebuild(((str(i), f"coffee number {i}") for i in range(500)), data_version=1, capacity=2000)
+    meta_size = (tmp_path / "index.json").stat().st_size
+
+    index.upsert_many([("65a1b2c3d4e5f6a7b8c9d0e1", "Kenya AA blackcurrant")], data_version=2)
+    assert (tmp_path / "index.json").stat().st_size == meta_size
+    assert len(np.load(str(tmp_path / "ids.npy"), mmap_mode="r")) == 2000
+    assert SemanticIndex(str(tmp_path)).search("blackcurrant", k=1)[0][0] == "65a1b2c3d4e5f6a7b8c9d0e1"
+
+
+def test_instances_sharing_a_directory(tmp_path, monkeypatch):
+    """Changes made through another instance (as another process would) are picked up, never overwritten."""
+    monkeypatch.setattr("semantic_index.INITIAL_CAPACITY", 4)
+    first = SemanticIndex(str(tmp_path))
+    first.rebuild(COFFEES, data_version=3)
+    second = SemanticIndex(str(tmp_path))
+
+    first.upsert_many([("4", "Kenya AA Blackcurrant and tomato, juicy")], data_version=4)
+    # Grows the matrix, replacing the files the first instance has mapped
+    second.upsert_many([("5", "Panama Geisha jasmine and bergamot")], data_version=5)
+    assert len(second) == 5 and second.data_version == 5
+
+    first.remove("2", data_version=6)
+    assert len(first) == 4 and first.data_version == 6
+
+    second.refresh()
+    assert second.search("jasmine bergamot", k=1)[0][0] == "5"
+    assert second.search("blackcurrant", k=1)[0][0] == "4"
+    assert "2" not in [coffee_id for coffee_id, _ in second.search("chocolate hazelnut caramel")]
+    assert len(SemanticIndex(str(tmp_path))) == 4
+    assert not list(tmp_path.glob("*.tmp*"))